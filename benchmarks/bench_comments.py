@@ -0,0 +1,137 @@
+"""Compare the column-wise comment post-processing with the original row-wise one.
+
+Synthetic comment threads (with watch links, other links and hashtag
+links in their HTML text) go through commentRows and commentFrames, and
+through the implementation they replaced. Both must give the same frames.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_comments [--comments 100000]
+"""
+import argparse
+import random
+import re
+import time
+
+import pandas as pd
+
+from src.process import commentFrames, commentRows
+
+
+def legacyCommentRows(page: list) -> list:
+    # Implementations before the column-wise path, kept here as the baseline.
+    return [{'commentId': comment.get('id'),
+             'videoId': comment['snippet']['videoId'],
+             'textDisplay': comment['snippet']['topLevelComment']['snippet']['textDisplay'],
+             'textOriginal': comment['snippet']['topLevelComment']['snippet']['textOriginal'],
+             'authorDisplayName': comment['snippet']['topLevelComment']['snippet']['authorDisplayName'],
+             'authorChannelId': comment['snippet']['topLevelComment']['snippet']['authorChannelId']['value'],
+             'likeCount': comment['snippet']['topLevelComment']['snippet'].get('likeCount'),
+             'publishedAt': comment['snippet']['topLevelComment']['snippet'].get('publishedAt'),
+             'updatedAt': comment['snippet']['topLevelComment']['snippet'].get('updatedAt')} for comment in page]
+
+
+def getLink(text: str):
+    raw_urls = re.findall(r'href=[\'"]?([^\'" >]+)', text)
+    return raw_urls
+
+
+def cleanLink(url: str):
+    hashtag = url.replace('http://www.youtube.com/results?search_query=%23', '')
+    cleaned_url = None
+    if(len(hashtag) == len(url)):
+        cleaned_url = url.replace('https://www.youtube.com/watch?v=', 'https://youtu.be/').split('&', 1)[0].split('?', 1)[0]
+        hashtag = None
+    return pd.Series([cleaned_url, hashtag])
+
+
+def legacyCommentFrames(commentsDf: pd.DataFrame, authorInfoDf: pd.DataFrame) -> dict:
+    resultsDfs = {}
+    commentsProcessedDf = pd.merge(commentsDf, authorInfoDf[[
+                                   'channelId', 'Creation Date']], left_on='authorChannelId', right_on='channelId').drop_duplicates(ignore_index=True)
+    commentsProcessedDf[['publishedAt', 'updatedAt', 'Creation Date']] = commentsProcessedDf[[
+        'publishedAt', 'updatedAt', 'Creation Date']].apply(pd.to_datetime).apply(lambda x: x.dt.tz_convert('Singapore')).apply(lambda x: x.dt.tz_localize(None))
+    commentsProcessedDf['Account age when commenting (days)'] = (
+        commentsProcessedDf['publishedAt'] - commentsProcessedDf['Creation Date']).dt.days
+    commentsProcessedDf = commentsProcessedDf.join(commentsProcessedDf[['authorChannelId', 'videoId', 'commentId', 'likeCount']].groupby(by='authorChannelId').agg(
+        No_Unique_Videos=('videoId', 'nunique'), No_Comments_Made=('commentId', 'count'), Total_Likes=('likeCount', 'sum')), on='authorChannelId')
+    commentsProcessedDf.drop(columns='channelId', inplace=True)
+    resultsDfs.update(
+        {'Comments': commentsProcessedDf,
+         'Comments Author': authorInfoDf})
+    linksDf = commentsDf[['commentId']].join(
+        commentsDf.textDisplay.apply(getLink).explode().rename('rawLink')).dropna()
+    if(len(linksDf) != 0):
+        linksDf = linksDf.join(linksDf.rawLink.apply(
+            cleanLink).rename({0: 'cleanLink', 1: 'hashtag'}, axis=1))
+        cleanLinksDf = linksDf.drop(
+            labels='hashtag', axis=1).dropna().drop_duplicates()
+        hashtagsDf = linksDf.drop(
+            labels='cleanLink', axis=1).dropna().drop_duplicates()
+        if(len(cleanLinksDf) != 0):
+            resultsDfs.update(
+                {'Comments Links': cleanLinksDf})
+        if(len(hashtagsDf) != 0):
+            resultsDfs.update(
+                {'Comments Hashtags': hashtagsDf})
+    return resultsDfs
+
+
+def synthetic_threads(count: int, seed: int = 0):
+    rng = random.Random(seed)
+    words = ['great', 'video', 'iphone', 'camera', 'battery', 'price', 'thanks', 'love', 'this']
+    links = ['<a href="https://www.youtube.com/watch?v={0:011d}&amp;t={0}s">0:{0}</a>',
+             '<a href="http://www.youtube.com/results?search_query=%23tag{0}">#tag{0}</a>',
+             '<a href="https://example.com/page{0}?ref=yt">example.com</a>']
+    authors = ['UC%022i' % i for i in range(count // 5 + 1)]
+    threads = []
+    for i in range(count):
+        parts = [rng.choice(words) for _ in range(rng.randint(3, 40))]
+        for _ in range(rng.choice([0, 0, 0, 1, 2])):
+            parts.append(rng.choice(links).format(rng.randrange(1000)))
+        published = '2022-09-%02iT%02i:%02i:00Z' % (
+            rng.randint(1, 28), rng.randrange(24), rng.randrange(60))
+        threads.append({'id': 'Ug%024i' % i, 'snippet': {
+            'videoId': 'v%010i' % rng.randrange(500),
+            'topLevelComment': {'snippet': {
+                'textDisplay': " ".join(parts), 'textOriginal': " ".join(parts),
+                'authorDisplayName': 'author', 'authorChannelId': {'value': rng.choice(authors)},
+                'likeCount': rng.randrange(100), 'publishedAt': published, 'updatedAt': published}}}})
+    authorInfoDf = pd.DataFrame({'channelId': authors,
+                                 'Channel Name': ['author %i' % i for i in range(len(authors))],
+                                 'Creation Date': ['20%02i-01-01T00:00:00Z' % rng.randrange(5, 22) for _ in authors]})
+    return threads, authorInfoDf
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--comments', type=int, default=100000)
+    args = parser.parse_args()
+    threads, authorInfoDf = synthetic_threads(args.comments)
+
+    legacyRowsSeconds, legacyRows = timed(legacyCommentRows, threads)
+    rowsSeconds, rows = timed(commentRows, threads)
+    assert legacyRows == rows
+    commentsDf = pd.DataFrame(rows)
+    legacySeconds, legacy = timed(legacyCommentFrames, commentsDf, authorInfoDf)
+    seconds, frames = timed(commentFrames, commentsDf, authorInfoDf)
+    assert list(legacy) == list(frames)
+    for name in legacy:
+        pd.testing.assert_frame_equal(legacy[name], frames[name], check_dtype=False)
+
+    print("%i comments, %i links, %i hashtags" % (
+        args.comments, len(frames.get('Comments Links', [])), len(frames.get('Comments Hashtags', []))))
+    print("commentRows   | legacy %7.3fs | new %7.3fs | %5.1fx" % (
+        legacyRowsSeconds, rowsSeconds, legacyRowsSeconds / rowsSeconds))
+    print("commentFrames | legacy %7.3fs | new %7.3fs | %5.1fx" % (
+        legacySeconds, seconds, legacySeconds / seconds))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""Measure near-duplicate caption grouping on synthetic captions with planted reuploads.
+
+Every fifth caption gets a reupload with a few words edited. The MinHash/LSH
+groups are checked against the planted pairs and against exact all-pairs
+Jaccard similarity of the same shingles, which is only run on the smaller
+counts since it grows with the square of the captions.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_dedup [--counts 200 1000 5000]
+"""
+import argparse
+import random
+import time
+
+import pandas as pd
+
+from src.dedup import (DEDUP_THRESHOLD, duplicateGroups, groupMembers,
+                       shingleHashes)
+
+EXACT_MAX_COUNT = 1000
+
+
+def synthetic_captions(count: int, rng: random.Random) -> pd.Series:
+    vocabulary = ['word%i' % i for i in range(5000)]
+    captions, planted = [], set()
+    while len(captions) < count:
+        words = [rng.choice(vocabulary) for _ in range(rng.randint(100, 1500))]
+        captions.append(" ".join(words))
+        if len(captions) % 5 == 0 and len(captions) < count:
+            for _ in range(rng.randint(0, 3)):
+                words[rng.randrange(len(words))] = rng.choice(vocabulary)
+            planted.add((len(captions) - 1, len(captions)))
+            captions.append(" ".join(words))
+    return pd.Series(captions, index=['video%i' % i for i in range(count)]), planted
+
+
+def exact_pairs(captions: pd.Series, threshold: float) -> set:
+    shingles = [set(shingleHashes(caption).tolist()) for caption in captions]
+    pairs = set()
+    for i in range(len(shingles)):
+        for j in range(i + 1, len(shingles)):
+            union = len(shingles[i] | shingles[j])
+            if union and len(shingles[i] & shingles[j]) / union >= threshold:
+                pairs.add((i, j))
+    return pairs
+
+
+def grouped_pairs(groups: pd.Series) -> set:
+    position = {videoId: i for i, videoId in enumerate(groups.index)}
+    pairs = set()
+    for members in groupMembers(groups):
+        members = sorted(position[videoId] for videoId in members)
+        pairs.update((i, j) for k, i in enumerate(members) for j in members[k + 1:])
+    return pairs
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--counts', type=int, nargs='+', default=[200, 1000, 5000])
+    args = parser.parse_args()
+    for count in args.counts:
+        captions, planted = synthetic_captions(count, random.Random(count))
+        start = time.perf_counter()
+        groups = duplicateGroups(captions)
+        lshSeconds = time.perf_counter() - start
+        found = grouped_pairs(groups)
+        line = "%6i captions | LSH %7.2fs | embedded %5i (%4.1f%% saved) | planted found %i/%i" % (
+            count, lshSeconds, groups.nunique(), 100 * (1 - groups.nunique() / count),
+            len(found & planted), len(planted))
+        if count <= EXACT_MAX_COUNT:
+            start = time.perf_counter()
+            exact = exact_pairs(captions, DEDUP_THRESHOLD)
+            line += " | exact all-pairs %7.2fs, recall %.3f, extra %i" % (
+                time.perf_counter() - start,
+                len(found & exact) / max(len(exact), 1), len(found - exact))
+        print(line)
+
+
+if __name__ == '__main__':
+    main()
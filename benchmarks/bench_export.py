@@ -0,0 +1,89 @@
+"""Compare the streaming export with the former in-memory pandas workbook.
+
+A synthetic run of 100k comments (plus their authors) is exported with
+pd.ExcelWriter into a BytesIO, as streamlit_app.to_excel did, and with
+export.exportRun in each format. Peak memory is tracemalloc's, over the
+export call only.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_export [--comments 100000]
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+from io import BytesIO
+
+import pandas as pd
+
+from src import export
+
+
+def synthetic_comments(count: int, seed: int = 0) -> dict:
+    rng = random.Random(seed)
+    words = ['great', 'video', 'iphone', 'camera', 'battery', 'price', 'review',
+             'thanks', 'https://apple.com', '#apple', 'love', 'this', 'worst', 'best']
+    authors = ['UC%022i' % i for i in range(count // 5 + 1)]
+    published = pd.Timestamp('2022-09-01', tz='UTC')
+    comments = pd.DataFrame({
+        'commentId': ['Ug%024i' % i for i in range(count)],
+        'videoId': ['v%010i' % rng.randrange(500) for _ in range(count)],
+        'authorChannelId': [rng.choice(authors) for _ in range(count)],
+        'textOriginal': [" ".join(rng.choice(words) for _ in range(rng.randint(3, 60)))
+                         for _ in range(count)],
+        'likeCount': [rng.randrange(1000) for _ in range(count)],
+        'publishedAt': [published + pd.Timedelta(minutes=rng.randrange(10**5)) for _ in range(count)]})
+    authorsDf = pd.DataFrame({'channelId': authors,
+                              'Channel Name': ['author %i' % i for i in range(len(authors))],
+                              'Subscribers': [rng.randrange(10**6) for _ in authors]})
+    return {'Comments': comments, 'Comments Author': authorsDf}
+
+
+def pandasWorkbook(sheets: dict) -> bytes:
+    output = BytesIO()
+    with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
+        for name, df in sheets.items():
+            # xlsxwriter refuses tz-aware datetimes; the app's frames are naive.
+            df = df.assign(**{column: df[column].dt.tz_localize(None)
+                              for column in df.select_dtypes('datetimetz')})
+            df.to_excel(writer, sheet_name=name)
+    return output.getvalue()
+
+
+def measured(fn):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn()
+    seconds = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return seconds, peak, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--comments', type=int, default=100000)
+    args = parser.parse_args()
+    sheets = synthetic_comments(args.comments)
+    tracemalloc.start()
+    frameBytes = sum(df.memory_usage(deep=True).sum() for df in sheets.values())
+    tracemalloc.stop()
+    print("%i comments, frames hold %.1f MiB" % (args.comments, frameBytes / 2**20))
+
+    seconds, peak, data = measured(lambda: pandasWorkbook(sheets))
+    print("%-22s %8.2fs %8.1f MiB peak %8.1f MiB file" % (
+        'pandas BytesIO xlsx', seconds, peak / 2**20, len(data) / 2**20))
+    del data
+    with tempfile.TemporaryDirectory() as exportDir:
+        for fmt in export.FORMATS:
+            seconds, peak, path = measured(
+                lambda: export.exportRun('bench', sheets, fmt, exportDir))
+            print("%-22s %8.2fs %8.1f MiB peak %8.1f MiB file" % (
+                'exportRun ' + fmt, seconds, peak / 2**20, os.path.getsize(path) / 2**20))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""Measure import time of the app modules, so startup regressions show up.
+
+Each module is imported in a fresh interpreter. Run from the repository root:
+
+    python -m benchmarks.bench_import_time [--max-seconds 3] [--models]
+
+With --max-seconds the script exits non-zero when any import is slower.
+With --models the background warm-up is also timed, per model.
+"""
+import argparse
+import subprocess
+import sys
+import time
+
+MODULES = ['src.ingestion',
+           'src.process',
+           'src.feature',
+           'src.semantic_similarity_lite',
+           'src.warmup']
+
+IMPORT_SNIPPET = """
+import time
+start = time.perf_counter()
+import {module}
+print(time.perf_counter() - start)
+"""
+
+WARMUP_SNIPPET = """
+import time
+import src.warmup as warmup
+warmup._warmup()
+for name, status in warmup.warmupStatus().items():
+    print('%s: %s' % (name, status))
+"""
+
+
+def import_seconds(module: str) -> float:
+    output = subprocess.run([sys.executable, '-c', IMPORT_SNIPPET.format(module=module)],
+                            check=True, capture_output=True, text=True).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--max-seconds', type=float, default=None)
+    parser.add_argument('--models', action='store_true')
+    args = parser.parse_args()
+
+    slow = []
+    for module in MODULES:
+        seconds = import_seconds(module)
+        print("%-32s %7.3fs" % (module, seconds))
+        if args.max_seconds is not None and seconds > args.max_seconds:
+            slow.append(module)
+
+    if args.models:
+        start = time.perf_counter()
+        print(subprocess.run([sys.executable, '-c', WARMUP_SNIPPET],
+                             check=True, capture_output=True, text=True).stdout, end='')
+        print("%-32s %7.3fs" % ('warm-up (total)', time.perf_counter() - start))
+
+    if slow:
+        print("Imports slower than %.1fs: %s" % (args.max_seconds, ", ".join(slow)))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
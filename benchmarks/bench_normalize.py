@@ -0,0 +1,128 @@
+"""Time the batch normalizers against the original caption and description code.
+
+The original implementations and the synthetic inputs are kept here as the
+golden reference of tests/test_normalize.py, which checks that
+normalizeCaption and normalizeDescription return exactly what they did.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_normalize [--count 20000] [--workers 4]
+"""
+import argparse
+import contextlib
+import io
+import os
+import random
+import re
+import time
+
+import pandas as pd
+
+from src.normalize import (normalizeCaption, normalizeCaptions,
+                           normalizeDescription, normalizeDescriptions)
+
+EXAMPLE_PATH = 'example/iphone14.xlsx'
+
+
+def legacy_process_captions(transcriptdict):
+    # Implementations before src.normalize, kept here as the golden reference.
+    preprocess_captions = ""
+    for line in transcriptdict:
+        preprocess_captions += " " + line['text']
+    removed_descriptive = re.sub(
+        " [\(\[].*?[\)\]]", "", preprocess_captions)
+    output = re.sub(r'\b(\w+) \1\b', r'\1',
+                    removed_descriptive, flags=re.IGNORECASE)
+    output = output.replace("\n", " ").replace(u'\xa0', u' ')
+    output = re.sub(' +', ' ', output)
+    return output[1:]
+
+
+def legacy_process_description(text):
+    if (text == ""):
+        return ""
+    sentences = re.sub(r'(\W)(?=\1)', '', text).split('\n')
+    processed = []
+    for index, sentence in enumerate(sentences):
+        url_search = re.search(r'http\S+', sentence)
+        at_search = re.search(r'@', sentence)
+        if(re.subn(r'\W', '', sentence)[1] == len(sentence) or not sentence[0].isalpha() or len(sentences[index-1]) == 0):
+            break
+        elif (url_search is None and at_search is None):
+            processed.append(sentence)
+        elif(len(processed) > 1 and (url_search is not None and len(url_search.span()) > 1 and (url_search.span()[1] - url_search.span()[0]) == len(sentence)) or sentences[index - 1][-1] in [':', '-']):
+            try:
+                processed.pop()
+            except:
+                print(processed)
+    return " ".join(processed)
+
+
+WORDS = ['the', 'The', 'new', 'iphone', 'camera', 'is', 'is', 'really', 'good', 'so', 'So',
+         '[Music]', '(laughs)', '[Applause]', 'i', 'I', 'think', 'uh', 'okay', 'Okay', '\xa0', 'phone']
+
+
+def synthetic_transcripts(count: int, rng: random.Random) -> list:
+    transcripts = []
+    for _ in range(count):
+        lines = []
+        for _ in range(rng.randint(0, 400)):
+            text = " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 10)))
+            if rng.random() < 0.1:
+                text += "\n" + rng.choice(WORDS)
+            lines.append({'text': text, 'start': 0.0, 'duration': 1.0})
+        transcripts.append(lines)
+    return transcripts
+
+
+DESCRIPTION_LINES = ['Check out the new iPhone 14 review!!', 'Follow me on Instagram @someone',
+                     'Links:', 'https://apple.com', 'Buy it here https://amzn.to/xyz', '',
+                     '---', '🔥🔥🔥', '#iphone14 #apple', 'Subscribe for more -', 'Music by someone',
+                     'Timestamps', '0:00 Intro', 'Thanks for watching...', 'Gear I use:',
+                     'http://bit.ly/abc', 'Camera: Sony A7', 'Business inquiries: me@example.com']
+
+
+def synthetic_descriptions(count: int, rng: random.Random) -> list:
+    return ["\n".join(rng.choice(DESCRIPTION_LINES) for _ in range(rng.randint(0, 25)))
+            for _ in range(count)]
+
+
+def example_descriptions() -> list:
+    if not os.path.exists(EXAMPLE_PATH):
+        return []
+    try:
+        stats = pd.read_excel(EXAMPLE_PATH, sheet_name='stats')
+    except (ImportError, ValueError):
+        return []
+    return stats['description'].fillna("").astype(str).tolist()
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--count', type=int, default=20000)
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    args = parser.parse_args()
+    rng = random.Random(0)
+    transcripts = synthetic_transcripts(args.count // 10, rng)
+    descriptions = synthetic_descriptions(args.count, rng) + example_descriptions()
+
+    for name, legacy, single, batch, texts in (
+            ('captions', legacy_process_captions, normalizeCaption, normalizeCaptions, transcripts),
+            ('descriptions', legacy_process_description, normalizeDescription, normalizeDescriptions, descriptions)):
+        # The original description code prints on some inputs; keep it quiet.
+        with contextlib.redirect_stdout(io.StringIO()):
+            legacySeconds, _ = timed(lambda: [legacy(text) for text in texts])
+            singleSeconds, _ = timed(lambda: [single(text) for text in texts])
+        poolSeconds, _ = timed(lambda: batch(pd.Series(texts), workers=args.workers))
+        print("%-12s %6i texts | legacy %7.3fs | batch %7.3fs | %i processes %7.3fs" % (
+            name, len(texts), legacySeconds, singleSeconds, args.workers, poolSeconds))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,155 @@
+"""Time the collection pipeline offline, against stubbed API and transcript responses.
+
+Every stage runs at each scale on stub responses (see
+benchmarks/stub_service.py), with a fresh response cache and channel
+registry, so the API-facing stages do their full cold-cache work without
+a key or network. A stage is run once for its wall time and once more
+under tracemalloc for its peak; tracemalloc sees Python objects but not
+buffers allocated by Arrow or TensorFlow.
+
+    search               queryKeyword, 50 ids per page
+    processVideoIds      details, transcripts and descriptions of the videos
+    videoDetails_df      frames of the video rows
+    processChannelIds    channels of the videos
+    processComments      COMMENTS_PER_VIDEO threads of scale / 100 videos, and their authors
+    summarisedComments   comment summary frames
+    embed                caption embeddings, skipped when TensorFlow or the model is missing
+    writeExcel           the app's workbook export (the to_excel it replaced)
+
+Run from the repository root:
+
+    python -m benchmarks.bench_pipeline [--scales 100 1000 10000] [--fixtures recorded.json]
+                                        [--json results.json] [--baseline results.json]
+
+With --baseline, the script exits non-zero when a stage's throughput fell
+by more than --tolerance against an earlier --json result.
+"""
+import argparse
+import contextlib
+import io
+import json
+import math
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import src.ingestion as ingestion
+import src.process as process
+from benchmarks.stub_service import COMMENTS_PER_VIDEO, Fixtures, stubbedApi
+from src.export import workbookSheets, writeExcel
+
+SCALES = [100, 1000, 10000]
+TOLERANCE = 0.25
+
+
+def measure(fn, workDir: str, fixtures: Fixtures, memory: bool = True):
+    """Run fn twice in fresh stub environments: (seconds, peak bytes or None, result)."""
+    with stubbedApi(fixtures, os.path.join(workDir, 'timed')), contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        result = fn()
+        seconds = time.perf_counter() - start
+    peak = None
+    if memory:
+        with stubbedApi(fixtures, os.path.join(workDir, 'traced')), contextlib.redirect_stdout(io.StringIO()):
+            tracemalloc.start()
+            fn()
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+    return seconds, peak, result
+
+
+def embedder(workDir: str):
+    """embed() with an empty cache under workDir and the model loaded, or None if it cannot load."""
+    try:
+        import src.semantic_similarity_lite as lite
+        from src.embedding_cache import EmbeddingCache
+        lite._cache = EmbeddingCache(lite.module_path, lite.EMBEDDING_DIM,
+                                     cache_dir=os.path.join(workDir, 'embeddings'))
+        lite.getEngine()
+    except (ImportError, OSError) as e:
+        print("embed skipped: %s" % e, file=sys.stderr)
+        return None
+    return lite.embed
+
+
+def runScale(scale: int, fixtures: Fixtures, workDir: str, memory: bool) -> list:
+    results = []
+
+    def stage(name: str, items: int, fn):
+        seconds, peak, result = measure(fn, os.path.join(workDir, name), fixtures, memory)
+        results.append({'scale': scale, 'stage': name, 'items': items, 'seconds': seconds,
+                        'itemsPerSecond': items / seconds if seconds else math.inf, 'peakBytes': peak})
+        return result
+
+    pages = math.ceil(scale / ingestion.RESULTS_PER_PAGE)
+    videoIds = stage('search', scale, lambda: ingestion.queryKeyword(
+        'benchmark', fixtures.videoIds[0], pageLimit=pages))
+    videoIds = sorted(videoIds)
+    videoLists = stage('processVideoIds', len(videoIds),
+                       lambda: process.processVideoIds(videoIds))
+    videoDfs = stage('videoDetails_df', len(videoIds),
+                     lambda: process.videoDetails_df(*videoLists))
+    channelIds = videoDfs['videoDf']['channelId'].unique()
+    channelDfs = stage('processChannelIds', len(channelIds),
+                       lambda: process.processChannelIds(channelIds))
+    commentVideoIds = videoIds[:max(1, scale // COMMENTS_PER_VIDEO)]
+    commentDfs = stage('processComments', len(commentVideoIds) * COMMENTS_PER_VIDEO,
+                       lambda: process.processVideosComments(commentVideoIds))
+    summaryDfs = stage('summarisedComments', len(commentDfs['Comments']),
+                       lambda: process.summarisedComments(commentDfs))
+    captionDf = videoDfs['videoCaptionDf']
+    embed = embedder(os.path.join(workDir, 'model'))
+    if embed is not None and len(captionDf) != 0:
+        texts = captionDf['embedding'].to_list()
+        stage('embed', len(texts), lambda: embed(texts))
+    sheets = workbookSheets(videoDfs, captionDf, channelDfDict=channelDfs,
+                            commentSummarisedDfDict=summaryDfs, commentsResultDfDict=commentDfs)
+    stage('writeExcel', sum(len(df) for df in sheets.values()),
+          lambda: writeExcel(sheets, os.path.join(workDir, 'export.xlsx')))
+    return results
+
+
+def regressions(results: list, baseline: list, tolerance: float) -> list:
+    before = {(row['scale'], row['stage']): row['itemsPerSecond'] for row in baseline}
+    return [row for row in results if (row['scale'], row['stage']) in before
+            and row['itemsPerSecond'] < before[(row['scale'], row['stage'])] * (1 - tolerance)]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--scales', type=int, nargs='+', default=SCALES)
+    parser.add_argument('--fixtures', default=None, help='recorded item templates, see stub_service')
+    parser.add_argument('--no-memory', action='store_true', help='skip the tracemalloc runs')
+    parser.add_argument('--json', default=None, help='write the results to this file')
+    parser.add_argument('--baseline', default=None, help='results of an earlier --json run to compare with')
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE,
+                        help='throughput drop against the baseline reported as a regression')
+    args = parser.parse_args()
+
+    results = []
+    print("%6s  %-20s %8s %10s %12s %10s" % ('scale', 'stage', 'items', 'seconds', 'items/s', 'peak MiB'))
+    for scale in args.scales:
+        fixtures = (Fixtures.load(args.fixtures, scale) if args.fixtures else Fixtures(scale))
+        with tempfile.TemporaryDirectory() as workDir:
+            for row in runScale(scale, fixtures, workDir, not args.no_memory):
+                results.append(row)
+                peak = '-' if row['peakBytes'] is None else '%.1f' % (row['peakBytes'] / 2 ** 20)
+                print("%6i  %-20s %8i %10.3f %12.0f %10s" % (
+                    scale, row['stage'], row['items'], row['seconds'], row['itemsPerSecond'], peak), flush=True)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=1)
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            slower = regressions(results, json.load(f), args.tolerance)
+        for row in slower:
+            print("regression: %s at %i, %.0f items/s" % (row['stage'], row['scale'], row['itemsPerSecond']))
+        return 1 if slower else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,71 @@
+"""Compare the NumPy sparse-format builder with the original list-based one.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_sparse_format
+"""
+import random
+import time
+
+import numpy as np
+import sentencepiece as spm
+
+from src.semantic_similarity_lite import ids_to_sparse_format
+
+SPM_PATH = './model/universal_encoder_8k_spm.model'
+
+
+def legacy_process_to_IDs_in_sparse_format(sp, sentences):
+    # Implementation before the NumPy builder, kept here as the baseline.
+    ids = [sp.EncodeAsIds(x) for x in sentences]
+    max_len = max(len(x) for x in ids)
+    dense_shape = (len(ids), max_len)
+    values = [item for sublist in ids for item in sublist]
+    indices = [[row, col]
+               for row in range(len(ids)) for col in range(len(ids[row]))]
+    return (values, indices, dense_shape)
+
+
+def synthetic_transcripts(sp, count: int, seed: int = 0) -> list:
+    # Transcript word counts are long-tailed: most videos run a few minutes,
+    # a handful run for hours (~150 spoken words per minute).
+    rng = random.Random(seed)
+    vocab = [sp.IdToPiece(i).lstrip('▁') for i in range(1000, 6000)]
+    vocab = [word for word in vocab if word.isalpha()]
+    transcripts = []
+    for _ in range(count):
+        minutes = min(rng.lognormvariate(2.2, 0.9), 180)
+        words = max(1, int(minutes * 150))
+        transcripts.append(" ".join(rng.choice(vocab) for _ in range(words)))
+    return transcripts
+
+
+def timed(fn, *args, repeat: int = 3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    sp = spm.SentencePieceProcessor()
+    sp.Load(SPM_PATH)
+    for count in (50, 250, 1000):
+        transcripts = synthetic_transcripts(sp, count)
+        encode_seconds, ids = timed(
+            lambda: sp.encode(transcripts, out_type=int))
+        legacy_seconds, legacy = timed(
+            legacy_process_to_IDs_in_sparse_format, sp, transcripts)
+        numpy_seconds, vectorised = timed(ids_to_sparse_format, ids)
+        assert legacy[2] == vectorised[2]
+        assert np.array_equal(np.asarray(legacy[0]), vectorised[0])
+        assert np.array_equal(np.asarray(legacy[1]), vectorised[1])
+        print("%5i transcripts, %9i tokens | legacy %7.3fs | encode %7.3fs + build %7.3fs | %5.1fx" % (
+            count, len(legacy[0]), legacy_seconds, encode_seconds, numpy_seconds,
+            legacy_seconds / (encode_seconds + numpy_seconds)))
+
+
+if __name__ == '__main__':
+    main()
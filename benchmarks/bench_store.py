@@ -0,0 +1,67 @@
+"""Compare reloading a run from the Parquet store with reading the Excel export.
+
+The example workbook is written to a temporary store, then reloaded whole,
+with one frame's columns projected, and with a row filter pushed down.
+Peak memory is tracemalloc's, which sees Python objects but not Arrow buffers.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_store
+"""
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+import pyarrow.dataset as ds
+
+from src.store import DatasetStore
+
+EXAMPLE_PATH = 'example/iphone14.xlsx'
+SEED = 'example'
+
+
+def measured(fn, repeat: int = 3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best, peak, result
+
+
+def main():
+    excelSeconds, excelPeak, frames = measured(
+        lambda: pd.read_excel(EXAMPLE_PATH, sheet_name=None), repeat=1)
+    rows = sum(len(df) for df in frames.values())
+    with tempfile.TemporaryDirectory() as root:
+        store = DatasetStore(root)
+        # Stand-in embeddings, so the fixed-size float32 column is exercised too.
+        frames['embeddings'] = pd.DataFrame({
+            'videoId': frames['similarity']['videoId'],
+            'embedding': list(np.random.default_rng(0).random(
+                (len(frames['similarity']), 512), dtype=np.float32))}).set_index('videoId')
+        runId = store.write(frames, SEED)
+        results = [('read_excel, all sheets', excelSeconds, excelPeak, rows)]
+        for label, fn in (
+                ('loadRun, all frames', lambda: store.loadRun(SEED, runId=runId)),
+                ('load similarity, 2 columns', lambda: store.load(
+                    'similarity', columns=['videoId', 'Similarity %'], seed=SEED)),
+                ('load similarity, filtered', lambda: store.load(
+                    'similarity', filter=ds.field('Similarity %') > 50, seed=SEED))):
+            seconds, peak, result = measured(fn)
+            count = sum(len(df) for df in result.values()) if isinstance(
+                result, dict) else len(result)
+            results.append((label, seconds, peak, count))
+    for label, seconds, peak, count in results:
+        print("%-28s %8.4fs %8.1f MiB Python heap peak %8i rows | %6.1fx" % (
+            label, seconds, peak / 2**20, count, excelSeconds / seconds))
+
+
+if __name__ == '__main__':
+    main()
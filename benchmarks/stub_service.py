@@ -0,0 +1,288 @@
+"""Offline stand-ins for the YouTube Data API service and YouTubeTranscriptApi.
+
+Fixtures generates videos().list, channels().list, commentThreads().list,
+search().list and transcript responses for any id, from synthetic item
+templates or from recorded ones. Recorded templates are a JSON file of
+real responses' items:
+
+    {"videos": [item, ...], "channels": [item, ...],
+     "commentThreads": [item, ...], "transcripts": [[line, ...], ...]}
+
+Every list may be left out, the synthetic templates are used instead.
+Templates are copied with the requested ids filled in, so a handful of
+recorded items is enough for any scale.
+
+stubbedApi() patches the pipeline modules to use them, with a fresh
+response cache, channel registry and quota ledger in a work directory, so
+nothing is read from or written to ./cache.
+"""
+import contextlib
+import copy
+import json
+import os
+import random
+import zlib
+
+from youtube_transcript_api import TranscriptsDisabled
+
+import src.ingestion as ingestion
+import src.process as process
+from src.channel_registry import ChannelRegistry
+from src.response_cache import ResponseCache
+
+COMMENTS_PER_VIDEO = 100
+# Share of videos whose transcript is not English (translated) or missing.
+TRANSLATED_SHARE = 0.1
+DISABLED_SHARE = 0.05
+
+WORDS = ['the', 'new', 'iphone', 'camera', 'is', 'really', 'good', 'so', 'battery', 'price',
+         'review', 'unboxing', 'i', 'think', 'uh', 'okay', 'phone', 'video', 'thanks', 'love']
+DESCRIPTION_LINES = ['Check out the new iPhone 14 review!!', 'Follow me on Instagram @someone',
+                     'Links:', 'https://apple.com', 'Buy it here https://amzn.to/xyz', '',
+                     '#iphone14 #apple #review', 'Subscribe for more -', 'Gear I use:',
+                     'Camera: Sony A7', 'Thanks for watching...']
+TOPICS = ['https://en.wikipedia.org/wiki/Technology', 'https://en.wikipedia.org/wiki/Lifestyle_(sociology)']
+
+
+def sentence(rng: random.Random, low: int, high: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(low, high)))
+
+
+class Fixtures:
+    """Deterministic API responses for a pool of videoCount videos.
+
+    Args:
+        videoCount (int): videos returned by searches
+        recorded (dict, optional): recorded item templates, see the module docstring. Defaults to None.
+        seed (int, optional): random seed of the synthetic templates. Defaults to 0.
+    """
+
+    def __init__(self, videoCount: int, recorded: dict = None, seed: int = 0):
+        rng = random.Random(seed)
+        self.videoIds = ['v%010i' % i for i in range(videoCount)]
+        self.channelIds = ['UCchannel%013i' % i for i in range(videoCount // 5 + 1)]
+        self.authorIds = ['UCauthor%014i' % i for i in range(videoCount + 1)]
+        recorded = recorded or {}
+        self.templates = {
+            'videos': recorded.get('videos') or [self.syntheticVideo(rng) for _ in range(50)],
+            'channels': recorded.get('channels') or [self.syntheticChannel(rng) for _ in range(20)],
+            'commentThreads': recorded.get('commentThreads') or [self.syntheticThread(rng) for _ in range(200)],
+            'transcripts': recorded.get('transcripts') or [self.syntheticTranscript(rng) for _ in range(20)]}
+
+    @classmethod
+    def load(cls, path: str, videoCount: int, seed: int = 0):
+        with open(path, 'r') as f:
+            return cls(videoCount, json.load(f), seed)
+
+    def save(self, path: str):
+        """Write the templates in the recorded fixture format."""
+        with open(path, 'w') as f:
+            json.dump(self.templates, f)
+
+    @staticmethod
+    def syntheticVideo(rng: random.Random) -> dict:
+        published = '2022-09-%02iT%02i:%02i:00Z' % (rng.randint(1, 28), rng.randrange(24), rng.randrange(60))
+        item = {'kind': 'youtube#video', 'id': None,
+                'contentDetails': {'duration': 'PT%iM%iS' % (rng.randrange(60), rng.randrange(60))},
+                'snippet': {'publishedAt': published, 'channelId': None, 'title': sentence(rng, 3, 12),
+                            'description': "\n".join(rng.choice(DESCRIPTION_LINES) for _ in range(rng.randint(0, 20))),
+                            'tags': [rng.choice(WORDS) for _ in range(rng.randrange(8))],
+                            'defaultAudioLanguage': 'en'},
+                'statistics': {'viewCount': str(rng.randrange(10 ** 7)), 'likeCount': str(rng.randrange(10 ** 5)),
+                               'favoriteCount': '0', 'commentCount': str(rng.randrange(10 ** 4))},
+                'topicDetails': {'topicCategories': rng.sample(TOPICS, rng.randint(1, 2))}}
+        if rng.random() < 0.2:
+            item['recordingDetails'] = {'recordingDate': published, 'locationDescription': 'Singapore'}
+        return item
+
+    @staticmethod
+    def syntheticChannel(rng: random.Random) -> dict:
+        item = {'kind': 'youtube#channel', 'id': None,
+                'snippet': {'title': sentence(rng, 1, 3), 'description': sentence(rng, 0, 40),
+                            'publishedAt': '20%02i-%02i-01T00:00:00Z' % (rng.randrange(5, 22), rng.randint(1, 12))},
+                'statistics': {'viewCount': str(rng.randrange(10 ** 9)), 'subscriberCount': str(rng.randrange(10 ** 7)),
+                               'videoCount': str(rng.randrange(10 ** 4))},
+                'brandingSettings': {'channel': {'country': rng.choice(['SG', 'US', 'MY'])}},
+                'topicDetails': {'topicCategories': rng.sample(TOPICS, 1)}}
+        if rng.random() < 0.2:
+            item['localizations'] = {'en': {'title': 'title', 'description': 'description'}}
+        return item
+
+    @staticmethod
+    def syntheticThread(rng: random.Random) -> dict:
+        links = ['<a href="https://www.youtube.com/watch?v={0:011d}&amp;t={0}s">0:{0}</a>',
+                 '<a href="http://www.youtube.com/results?search_query=%23tag{0}">#tag{0}</a>',
+                 '<a href="https://example.com/page{0}?ref=yt">example.com</a>']
+        parts = [sentence(rng, 3, 40)] + [rng.choice(links).format(rng.randrange(1000))
+                                          for _ in range(rng.choice([0, 0, 0, 1, 2]))]
+        published = '2022-09-%02iT%02i:%02i:00Z' % (rng.randint(1, 28), rng.randrange(24), rng.randrange(60))
+        return {'kind': 'youtube#commentThread', 'id': None, 'snippet': {
+            'videoId': None,
+            'topLevelComment': {'snippet': {
+                'textDisplay': " ".join(parts), 'textOriginal': " ".join(parts),
+                'authorDisplayName': 'author', 'authorChannelId': {'value': None},
+                'likeCount': rng.randrange(100), 'publishedAt': published, 'updatedAt': published}}}}
+
+    @staticmethod
+    def syntheticTranscript(rng: random.Random) -> list:
+        return [{'text': sentence(rng, 1, 10) + (' [Music]' if rng.random() < 0.05 else ''),
+                 'start': float(line), 'duration': 1.0} for line in range(rng.randint(50, 400))]
+
+    @staticmethod
+    def number(key: str) -> int:
+        # crc32 rather than hash(): the same id gets the same template in every process.
+        return zlib.crc32(key.encode('utf-8'))
+
+    def template(self, kind: str, key: str):
+        return copy.deepcopy(self.templates[kind][self.number(key) % len(self.templates[kind])])
+
+    def channelOf(self, videoId: str) -> str:
+        return self.channelIds[self.number(videoId) % len(self.channelIds)]
+
+    def video(self, videoId: str) -> dict:
+        item = self.template('videos', videoId)
+        item['id'] = videoId
+        item['snippet']['channelId'] = self.channelOf(videoId)
+        return item
+
+    def channel(self, channelId: str) -> dict:
+        item = self.template('channels', channelId)
+        item['id'] = channelId
+        return item
+
+    def commentPage(self, videoId: str, pageToken: str, maxResults: int) -> dict:
+        start = int(pageToken or 0)
+        stop = min(start + maxResults, COMMENTS_PER_VIDEO)
+        items = []
+        for number in range(start, stop):
+            item = self.template('commentThreads', '%s:%i' % (videoId, number))
+            item['id'] = 'Ug%s%06i' % (videoId, number)
+            item['snippet']['videoId'] = videoId
+            author = self.authorIds[(self.number(videoId) + number) % len(self.authorIds)]
+            item['snippet']['topLevelComment']['snippet']['authorChannelId']['value'] = author
+            items.append(item)
+        response = {'kind': 'youtube#commentThreadListResponse', 'items': items}
+        if stop < COMMENTS_PER_VIDEO:
+            response['nextPageToken'] = str(stop)
+        return response
+
+    def searchPage(self, pageToken: str, maxResults: int) -> dict:
+        start = int(pageToken or 0)
+        stop = min(start + maxResults, len(self.videoIds))
+        response = {'kind': 'youtube#searchListResponse',
+                    'items': [{'id': {'kind': 'youtube#video', 'videoId': videoId}}
+                              for videoId in self.videoIds[start:stop]]}
+        if stop < len(self.videoIds):
+            response['nextPageToken'] = str(stop)
+        return response
+
+    def transcript(self, videoId: str) -> list:
+        return self.template('transcripts', videoId)
+
+    def transcriptLanguage(self, videoId: str) -> str:
+        draw = (self.number(videoId) % 1000) / 1000
+        if draw < DISABLED_SHARE:
+            return None
+        return 'Indonesian' if draw < DISABLED_SHARE + TRANSLATED_SHARE else 'English'
+
+
+class StubRequest:
+    def __init__(self, response: dict):
+        self.response = response
+
+    def execute(self, **kwargs) -> dict:
+        return self.response
+
+
+class StubResource:
+    def __init__(self, handler):
+        self.handler = handler
+
+    def list(self, **kwargs) -> StubRequest:
+        return StubRequest(self.handler(**kwargs))
+
+
+class StubService:
+    """Replaces the API client of every key: each list call answers from fixtures and is counted."""
+
+    def __init__(self, fixtures: Fixtures):
+        self.fixtures = fixtures
+        self.calls = {}
+
+    def count(self, method: str):
+        self.calls[method] = self.calls.get(method, 0) + 1
+
+    def videos(self) -> StubResource:
+        def listVideos(id, part, **kwargs):
+            self.count('videos.list')
+            return {'items': [self.fixtures.video(videoId) for videoId in id.split(',')]}
+        return StubResource(listVideos)
+
+    def channels(self) -> StubResource:
+        def listChannels(id, part, **kwargs):
+            self.count('channels.list')
+            return {'items': [self.fixtures.channel(channelId) for channelId in id.split(',')]}
+        return StubResource(listChannels)
+
+    def commentThreads(self) -> StubResource:
+        def listCommentThreads(videoId, maxResults=20, pageToken='', **kwargs):
+            self.count('commentThreads.list')
+            return self.fixtures.commentPage(videoId, pageToken, maxResults)
+        return StubResource(listCommentThreads)
+
+    def search(self) -> StubResource:
+        def listSearch(maxResults=5, pageToken=None, **kwargs):
+            self.count('search.list')
+            return self.fixtures.searchPage(pageToken, maxResults)
+        return StubResource(listSearch)
+
+
+class StubTranscript:
+    def __init__(self, lines: list, language: str):
+        self.lines = lines
+        self.language = language
+
+    def fetch(self) -> list:
+        return self.lines
+
+    def translate(self, language: str):
+        return StubTranscript(self.lines, 'English')
+
+
+class StubTranscriptApi:
+    """Replaces YouTubeTranscriptApi in src.process."""
+
+    def __init__(self, fixtures: Fixtures):
+        self.fixtures = fixtures
+
+    def list_transcripts(self, videoId: str) -> list:
+        language = self.fixtures.transcriptLanguage(videoId)
+        if language is None:
+            raise TranscriptsDisabled(videoId)
+        return [StubTranscript(self.fixtures.transcript(videoId), language)]
+
+
+@contextlib.contextmanager
+def stubbedApi(fixtures: Fixtures, workDir: str):
+    """Point the pipeline at the stubs, with caches and the quota ledger under workDir.
+
+    Yields:
+        StubService: the service, whose calls counts the list calls made
+    """
+    os.makedirs(workDir, exist_ok=True)
+    service = StubService(fixtures)
+    # An empty API_KEY keeps any real client out of the run.
+    patches = {(ingestion, 'API_KEY'): '',
+               (ingestion, 'create_yt_service'): lambda apiKey: service,
+               (ingestion, 'responseCache'): ResponseCache(os.path.join(workDir, 'responses.sqlite')),
+               (ingestion, 'planner'): ingestion.QuotaPlanner(10 ** 9, os.path.join(workDir, 'quota')),
+               (process, 'channelRegistry'): ChannelRegistry(os.path.join(workDir, 'channels.sqlite')),
+               (process, 'YouTubeTranscriptApi'): StubTranscriptApi(fixtures)}
+    saved = {target: getattr(*target) for target in patches}
+    try:
+        for (module, name), value in patches.items():
+            setattr(module, name, value)
+        yield service
+    finally:
+        for (module, name), value in saved.items():
+            setattr(module, name, value)
@@ -0,0 +1,92 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import List
+
+from src.response_cache import PART_TTLS, chunked
+
+REGISTRY_PATH = './cache/channels.sqlite'
+MAX_MEMORY_RECORDS = 20000
+
+
+class ChannelRegistry:
+    """Persistent registry of processed channel records.
+
+    Video channels and comment authors are looked up here before any
+    channels().list call, so each channel is fetched once and shared by
+    every path and every run until its record goes stale. Records persist
+    in SQLite across processes; the most recently used are also kept in
+    memory, and a record that is stale there is looked up again in SQLite,
+    where another process may have refreshed it.
+
+    Args:
+        path (str, optional): SQLite database file. Defaults to REGISTRY_PATH.
+        ttl (float, optional): seconds a record stays fresh; it holds statistics, so it
+        follows their TTL. Defaults to PART_TTLS['statistics'].
+        maxRecords (int, optional): records kept in memory, least recently used dropped
+        first. Defaults to MAX_MEMORY_RECORDS.
+    """
+
+    def __init__(self, path: str = REGISTRY_PATH, ttl: float = PART_TTLS['statistics'], maxRecords: int = MAX_MEMORY_RECORDS):
+        self.path = path
+        self.ttl = ttl
+        self.maxRecords = maxRecords
+        self._lock = threading.Lock()
+        self._connection = None
+        self._records = OrderedDict()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            self._connection = sqlite3.connect(
+                self.path, check_same_thread=False)
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS channels ('
+                'channelId TEXT PRIMARY KEY, fetchedAt REAL, record TEXT)')
+        return self._connection
+
+    def _remember(self, channelId: str, entry: tuple):
+        self._records[channelId] = entry
+        self._records.move_to_end(channelId)
+        while len(self._records) > self.maxRecords:
+            self._records.popitem(last=False)
+
+    def lookup(self, channelIds: List[str], maxAge: float = None) -> dict:
+        """Return {channelId: record} for the channels with a fresh record."""
+        maxAge = self.ttl if maxAge is None else maxAge
+        now = time.time()
+        found = {}
+        with self._lock:
+            unknown = []
+            for channelId in channelIds:
+                entry = self._records.get(channelId)
+                if entry is not None and now - entry[0] < maxAge:
+                    self._records.move_to_end(channelId)
+                    found[channelId] = entry[1]
+                else:
+                    unknown.append(channelId)
+            connection = self._connect()
+            for idsChunk in chunked(unknown, 500):
+                rows = connection.execute(
+                    'SELECT channelId, fetchedAt, record FROM channels WHERE channelId IN (%s)' % ','.join(
+                        '?' * len(idsChunk)), idsChunk).fetchall()
+                for channelId, fetchedAt, record in rows:
+                    record = json.loads(record)
+                    self._remember(channelId, (fetchedAt, record))
+                    if now - fetchedAt < maxAge:
+                        found[channelId] = record
+        return found
+
+    def store(self, records: dict):
+        """Add or refresh {channelId: record}."""
+        now = time.time()
+        with self._lock:
+            for channelId, record in records.items():
+                self._remember(channelId, (now, record))
+            connection = self._connect()
+            connection.executemany('INSERT OR REPLACE INTO channels VALUES (?, ?, ?)', [
+                (channelId, now, json.dumps(record)) for channelId, record in records.items()])
+            connection.commit()
@@ -0,0 +1,127 @@
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import threading
+import time
+
+RUNS_DIR = './runs'
+# Unfinished runs older than this are started over rather than resumed, so
+# an abandoned run does not replay day-old search results.
+RUN_TTL = 24 * 3600
+
+
+class RunCheckpoint:
+    """Persists each completed chunk of a run so an interrupted run can resume.
+
+    Every stage ('videos', 'channels', 'comments', ...) is a directory of
+    pickled chunks under the run directory. A chunk is written to a temporary
+    file and renamed into place, so a crash never leaves half a chunk behind.
+
+    Args:
+        runDir (str): directory of this run
+    """
+
+    def __init__(self, runDir: str):
+        self.runDir = runDir
+        self._lock = threading.Lock()
+        self._counters = {}
+        os.makedirs(runDir, exist_ok=True)
+        startedPath = os.path.join(runDir, 'started')
+        if not os.path.exists(startedPath):
+            with open(startedPath, 'w') as f:
+                f.write(repr(time.time()))
+
+    @classmethod
+    def forRun(cls, *key, runsDir: str = RUNS_DIR, maxAge: float = RUN_TTL, fresh: bool = False):
+        """Checkpoint of the unfinished run with the same parameters, or of a new run.
+
+        Runs live in '<key[0]>-<digest>-<start time>' directories and finish()
+        removes a finished run's directory, so only interrupted runs resume.
+
+        Args:
+            *key: run parameters, the first naming the kind of run
+            runsDir (str, optional): directory of the run directories. Defaults to RUNS_DIR.
+            maxAge (float, optional): seconds an unfinished run stays resumable. Defaults to RUN_TTL.
+            fresh (bool, optional): discard any unfinished run and start over. Defaults to False.
+        """
+        digest = hashlib.sha1(json.dumps(
+            key, default=str).encode('utf-8')).hexdigest()[:12]
+        prefix = '%s-%s-' % (key[0], digest)
+        resumed = None
+        if os.path.isdir(runsDir):
+            for name in sorted(os.listdir(runsDir), reverse=True):
+                if not name.startswith(prefix):
+                    continue
+                checkpoint = cls(os.path.join(runsDir, name))
+                if resumed is None and not fresh and checkpoint.age() <= maxAge:
+                    resumed = checkpoint
+                else:
+                    checkpoint.clear()
+        if resumed is not None:
+            return resumed
+        return cls(os.path.join(runsDir, prefix + time.strftime('%Y%m%dT%H%M%S')))
+
+    def age(self) -> float:
+        """Seconds since the run started."""
+        try:
+            with open(os.path.join(self.runDir, 'started'), 'r') as f:
+                return time.time() - float(f.read())
+        except (OSError, ValueError):
+            return float('inf')
+
+    def clear(self):
+        """Delete every saved chunk of the run."""
+        with self._lock:
+            shutil.rmtree(self.runDir, ignore_errors=True)
+            self._counters = {}
+
+    def finish(self):
+        """Mark the run complete by removing its checkpoint, so the same parameters run afresh."""
+        self.clear()
+
+    def _stageDir(self, stage: str) -> str:
+        return os.path.join(self.runDir, stage)
+
+    def save(self, stage: str, payload, name: str = None):
+        """Persist one completed chunk of stage; a chunk saved under an existing name replaces it."""
+        stageDir = self._stageDir(stage)
+        with self._lock:
+            os.makedirs(stageDir, exist_ok=True)
+            if name is None:
+                count = self._counters.get(stage)
+                if count is None:
+                    count = len(os.listdir(stageDir))
+                self._counters[stage] = count + 1
+                name = '%06d' % count
+        path = os.path.join(stageDir, name + '.pkl')
+        tmpPath = path + '.tmp'
+        with open(tmpPath, 'wb') as f:
+            pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmpPath, path)
+
+    def chunks(self, stage: str) -> list:
+        """Return the payloads saved for stage, in the order they were written."""
+        stageDir = self._stageDir(stage)
+        if not os.path.isdir(stageDir):
+            return []
+        payloads = []
+        for fileName in sorted(os.listdir(stageDir)):
+            if fileName.endswith('.pkl'):
+                with open(os.path.join(stageDir, fileName), 'rb') as f:
+                    payloads.append(pickle.load(f))
+        return payloads
+
+    def doneIds(self, stage: str) -> set:
+        """Return the ids covered by the chunks of stage (payloads with an 'ids' list)."""
+        return {itemId for payload in self.chunks(stage) for itemId in payload['ids']}
+
+    def memo(self, stage: str, fn):
+        """Return the saved result of stage, or run fn and save its result."""
+        saved = self.chunks(stage)
+        if saved:
+            return saved[-1]
+        result = fn()
+        self.save(stage, result)
+        return result
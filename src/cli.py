@@ -0,0 +1,187 @@
+import argparse
+import logging
+import os
+import sys
+
+import src.ingestion as ingestion
+from src.tracing import configureLogging, currentTracer, startTracing
+
+
+def printProgress(done: int, total: int, stage: str):
+    print("[%s] %i / %i" % (stage, done, total), flush=True)
+
+
+def printSummary():
+    print(ingestion.planner.summary())
+    summary = currentTracer().summary()
+    if len(summary) != 0:
+        print(summary.round({'seconds': 3}).to_string())
+
+
+def readSeeds(path: str) -> list:
+    """Read one video id or watch URL per line, ignoring blank lines and # comments."""
+    seeds = []
+    with open(path, 'r') as f:
+        for line in f:
+            line = line.split('#', 1)[0].strip()
+            if line:
+                seeds.append(line.split('v=')[-1].split('&')[0])
+    return seeds
+
+
+def run(args):
+    from src.pipeline import runSeeds
+    from src.store import DatasetStore
+    ingestion.API_KEY = args.api_key
+    ingestion.planner.startRun(args.budget)
+    startTracing()
+    store = DatasetStore(args.store) if args.store else None
+    statuses = runSeeds(readSeeds(args.seeds), args.out, workers=args.workers, progress=printProgress, store=store,
+                        fresh=args.fresh, order=args.order, caption=args.captions, pages=args.pages,
+                        relatedPages=args.related_pages)
+    printSummary()
+    failed = [seedId for seedId, status in statuses.items() if status not in ('ok', 'done earlier')]
+    return 1 if failed else 0
+
+
+def refresh(args):
+    from src.metrics import refreshStatistics, statisticsHistory
+    from src.store import DatasetStore
+    ingestion.API_KEY = args.api_key
+    ingestion.planner.startRun(args.budget)
+    startTracing()
+    store = DatasetStore(args.store)
+    videoIds = readSeeds(args.ids) if args.ids else None
+    snapshot = refreshStatistics(videoIds, store=store, progress=printProgress)
+    history = statisticsHistory(list(snapshot['videoId']), store=store)
+    if len(history) != 0:
+        latest = history.groupby('videoId').tail(1).set_index('videoId')
+        print(latest[['viewCount', 'viewCountDelta', 'likeCountDelta', 'commentCountDelta', 'elapsedHours']]
+              .sort_values('viewCountDelta', ascending=False).head(args.top).to_string())
+    print("%i videos refreshed" % len(snapshot))
+    printSummary()
+    return 0
+
+
+def crawl(args):
+    from src.crawler import crawlRelated, estimateCrawlCost
+    ingestion.API_KEY = args.api_key
+    ingestion.planner.startRun(args.budget)
+    startTracing()
+    print("At most %i quota units" % estimateCrawlCost(args.nodes, args.pages))
+    graph = crawlRelated(readSeeds(args.seeds), maxDepth=args.depth, maxNodes=args.nodes,
+                         pagesPerNode=args.pages, workers=args.workers, progress=printProgress)
+    graph.save(args.out)
+    print("%i videos, %i edges written to %s" % (len(graph), len(graph.edges), args.out))
+    printSummary()
+    return 0
+
+
+def similar(args):
+    import src.similarity as similarity
+    os.makedirs(args.out, exist_ok=True)
+    seeds = similarity.indexVectors(readSeeds(args.seeds))
+    candidates = similarity.indexVectors(readSeeds(args.candidates)) if args.candidates else seeds
+    memoryCap = args.memory_mb * 2 ** 20
+    print("%i seeds and %i candidates found in the vector index" % (len(seeds), len(candidates)))
+    if args.candidates:
+        scores = similarity.similarityFrame(seeds, candidates, memoryCap)
+        scores.to_csv(os.path.join(args.out, 'scores.csv'))
+    neighbours = similarity.neighboursFrame(candidates, args.top, memoryCap)
+    neighbours.to_csv(os.path.join(args.out, 'neighbours.csv'), index=False)
+    clusters = similarity.clusterFrame(candidates, args.threshold, memoryCap)
+    clusters.to_csv(os.path.join(args.out, 'clusters.csv'))
+    print("%i clusters of more than one video written to %s" % (
+        clusters.loc[clusters['clusterSize'] > 1, 'cluster'].nunique(), args.out))
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m src.cli', description='Youtube+ headless collection pipeline')
+    parser.add_argument('--log', default=None,
+                        help='write JSON event logs to this file instead of stderr')
+    parser.add_argument('--log-level', default=None, choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'],
+                        help='lowest level logged. Defaults to INFO with --log, WARNING on stderr')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    runParser = subparsers.add_parser(
+        'run', help='seed -> query -> details -> transcripts -> embeddings -> similarity for every seed')
+    runParser.add_argument('--seeds', required=True,
+                           help='file with one video id or URL per line')
+    runParser.add_argument('--out', required=True, help='output directory')
+    runParser.add_argument('--api-key', default=os.environ.get('YOUTUBE_API_KEY', ''),
+                           help='YouTube Data API key (default: $YOUTUBE_API_KEY)')
+    runParser.add_argument('--workers', type=int, default=4,
+                           help='seeds processed concurrently')
+    runParser.add_argument('--pages', type=int, default=2,
+                           help='keyword search pages of 50 videos per seed')
+    runParser.add_argument('--related-pages', type=int, default=0,
+                           help='related-video search pages of 50 videos per seed')
+    runParser.add_argument('--order', default='relevance',
+                           choices=['relevance', 'date', 'rating', 'title', 'videoCount', 'viewCount'])
+    runParser.add_argument('--captions', default='Exclude', choices=['Include', 'Exclude'],
+                           help='include or exclude videos without captions')
+    runParser.add_argument('--budget', type=int, default=None,
+                           help='quota units this run may spend')
+    runParser.add_argument('--store', default=None,
+                           help='also write results to this Parquet dataset directory')
+    runParser.add_argument('--fresh', action='store_true',
+                           help='collect every seed again instead of resuming or skipping earlier runs')
+    runParser.set_defaults(func=run)
+
+    refreshParser = subparsers.add_parser(
+        'refresh', help='append a statistics-only snapshot of tracked videos to the store')
+    refreshParser.add_argument('--store', default='./data',
+                               help='Parquet dataset directory holding the collected videos')
+    refreshParser.add_argument('--ids', default=None,
+                               help='file with one video id or URL per line (default: every video in the store)')
+    refreshParser.add_argument('--api-key', default=os.environ.get('YOUTUBE_API_KEY', ''),
+                               help='YouTube Data API key (default: $YOUTUBE_API_KEY)')
+    refreshParser.add_argument('--budget', type=int, default=None,
+                               help='quota units this refresh may spend')
+    refreshParser.add_argument('--top', type=int, default=20,
+                               help='videos listed, largest view gain first')
+    refreshParser.set_defaults(func=refresh)
+
+    crawlParser = subparsers.add_parser(
+        'crawl', help='breadth-first related-video graph from the seeds, saved as .npz arrays')
+    crawlParser.add_argument('--seeds', required=True,
+                             help='file with one video id or URL per line')
+    crawlParser.add_argument('--out', required=True, help='.npz file of the graph')
+    crawlParser.add_argument('--api-key', default=os.environ.get('YOUTUBE_API_KEY', ''),
+                             help='YouTube Data API key (default: $YOUTUBE_API_KEY)')
+    crawlParser.add_argument('--depth', type=int, default=2,
+                             help='hops to expand from the seeds')
+    crawlParser.add_argument('--nodes', type=int, default=500,
+                             help='videos in the graph, seeds included')
+    crawlParser.add_argument('--pages', type=int, default=1,
+                             help='related search pages of 50 videos per video')
+    crawlParser.add_argument('--workers', type=int, default=4,
+                             help='concurrent searches')
+    crawlParser.add_argument('--budget', type=int, default=None,
+                             help='quota units this crawl may spend')
+    crawlParser.set_defaults(func=crawl)
+
+    similarParser = subparsers.add_parser(
+        'similar', help='compare indexed videos: seeds x candidates scores, neighbours and clusters')
+    similarParser.add_argument('--seeds', required=True,
+                               help='text file with one video id or URL per line, e.g. the videos of a channel')
+    similarParser.add_argument('--candidates', default=None,
+                               help='video ids to score the seeds against; neighbours and clusters of the seeds when omitted')
+    similarParser.add_argument('--out', required=True, help='output directory')
+    similarParser.add_argument('--top', type=int, default=10,
+                               help='neighbours per candidate')
+    similarParser.add_argument('--threshold', type=float, default=0.8,
+                               help='similarity linking two candidates into a cluster')
+    similarParser.add_argument('--memory-mb', type=int, default=256,
+                               help='memory cap of each block of scores')
+    similarParser.set_defaults(func=similar)
+
+    args = parser.parse_args(argv)
+    configureLogging(args.log, getattr(logging, args.log_level or ('INFO' if args.log else 'WARNING')))
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,154 @@
+import logging
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+from src.ingestion import (QUOTA_COSTS, getRelatedVideoIds, isQuotaError,
+                           workerPool)
+from src.process import ProgressCallback, noProgress
+from src.tracing import logEvent
+
+CRAWL_WORKERS = 4
+MAX_DEPTH = 2
+MAX_NODES = 500
+PAGES_PER_NODE = 1
+
+
+class RelatedGraph:
+    """Related-video graph stored as integer-indexed arrays.
+
+    Node i is the video ids[i], found at depth[i] hops from a seed; every
+    edge is a row (source, target) of node indices in edges, meaning target
+    was returned by the related search of source.
+
+    Args:
+        ids (List[str]): video id of every node
+        depth (np.ndarray): hops from the nearest seed of every node
+        edges (np.ndarray): (n, 2) int32 array of source and target node indices
+    """
+
+    def __init__(self, ids: List[str], depth: np.ndarray, edges: np.ndarray):
+        self.ids = list(ids)
+        self.depth = np.asarray(depth, dtype=np.int16)
+        self.edges = np.asarray(edges, dtype=np.int32).reshape(-1, 2)
+        self._index = None
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def index(self, videoId: str) -> int:
+        if self._index is None:
+            self._index = {videoId: i for i, videoId in enumerate(self.ids)}
+        return self._index[videoId]
+
+    def related(self, videoId: str) -> List[str]:
+        """Videos returned by the related search of videoId."""
+        targets = self.edges[self.edges[:, 0] == self.index(videoId), 1]
+        return [self.ids[i] for i in targets]
+
+    def inDegree(self) -> np.ndarray:
+        """Times each node was returned by a related search, a rough centrality."""
+        return np.bincount(self.edges[:, 1], minlength=len(self.ids))
+
+    def nodesFrame(self) -> pd.DataFrame:
+        return pd.DataFrame({'depth': self.depth, 'inDegree': self.inDegree()},
+                            index=pd.Index(self.ids, name='videoId'))
+
+    def save(self, path: str):
+        """Write the graph as a compressed .npz of the three arrays."""
+        np.savez_compressed(path, ids=np.array(self.ids, dtype=str),
+                            depth=self.depth, edges=self.edges)
+
+    @classmethod
+    def load(cls, path: str):
+        with np.load(path) as data:
+            return cls(data['ids'].tolist(), data['depth'], data['edges'])
+
+
+def estimateCrawlCost(maxNodes: int = MAX_NODES, pagesPerNode: int = PAGES_PER_NODE) -> int:
+    """Upper bound of the quota units of a crawl: each node is searched at most once."""
+    return maxNodes * pagesPerNode * QUOTA_COSTS['search.list']
+
+
+def crawlRelated(seeds: List[str], maxDepth: int = MAX_DEPTH, maxNodes: int = MAX_NODES, pagesPerNode: int = PAGES_PER_NODE, workers: int = CRAWL_WORKERS, progress: ProgressCallback = noProgress) -> RelatedGraph:
+    """Expand the related-video graph breadth-first from seeds.
+
+    Each level's frontier is searched on a thread pool, a batch of `workers`
+    searches at a time. A node is searched at most once, new nodes are only
+    added while the node budget allows, and nodes at maxDepth are not
+    searched, so the crawl never spends more than estimateCrawlCost(maxNodes,
+    pagesPerNode) units. Running out of quota ends the crawl with the graph
+    collected so far; a node whose search fails otherwise (a removed or
+    invalid video, a network error) is logged and left without edges.
+
+    Args:
+        seeds (List[str]): seed video ids, depth 0
+        maxDepth (int, optional): hops to expand from the seeds. Defaults to MAX_DEPTH.
+        maxNodes (int, optional): nodes in the graph, seeds included. Defaults to MAX_NODES.
+        pagesPerNode (int, optional): related search pages of 50 videos per node. Defaults to PAGES_PER_NODE.
+        workers (int, optional): concurrent searches. Defaults to CRAWL_WORKERS.
+        progress (ProgressCallback, optional): called after each batch as (nodes, maxNodes, 'crawl depth d'). Defaults to noProgress.
+
+    Returns:
+        RelatedGraph: nodes in discovery order and their edges
+    """
+    seen = {}
+    ids, depth, sources, targets = [], [], [], []
+
+    def addNode(videoId: str, nodeDepth: int) -> int:
+        seen[videoId] = len(ids)
+        ids.append(videoId)
+        depth.append(nodeDepth)
+        return seen[videoId]
+
+    for seedId in dict.fromkeys(seeds):
+        if len(ids) < maxNodes:
+            addNode(seedId, 0)
+    frontier = list(range(len(ids)))
+
+    def search(node: int) -> set:
+        try:
+            return getRelatedVideoIds(ids[node], pageLimit=pagesPerNode)
+        except Exception as e:
+            if isQuotaError(e):
+                raise
+            logEvent('crawlNodeFailed', logging.WARNING, videoId=ids[node], error=repr(e))
+            return set()
+
+    executor = workerPool(workers)
+    try:
+        for level in range(maxDepth):
+            nextFrontier = []
+            for start in range(0, len(frontier), workers):
+                if len(ids) >= maxNodes:
+                    break
+                batch = frontier[start:start + workers]
+                results = executor.map(search, batch)
+                try:
+                    # Results are merged in frontier order and sorted (the
+                    # search returns a set), so the graph does not depend on
+                    # which search returned first.
+                    for node, relatedIds in zip(batch, results):
+                        for videoId in sorted(relatedIds):
+                            target = seen.get(videoId)
+                            if target is None:
+                                if len(ids) >= maxNodes:
+                                    continue
+                                target = addNode(videoId, level + 1)
+                                nextFrontier.append(target)
+                            if target != node:
+                                sources.append(node)
+                                targets.append(target)
+                except Exception as e:
+                    if not isQuotaError(e):
+                        raise
+                    logEvent('crawlStopped', logging.WARNING, error=str(e), nodes=len(ids))
+                    return RelatedGraph(ids, depth, np.column_stack([sources, targets]))
+                progress(len(ids), maxNodes, 'crawl depth %i' % (level + 1))
+            frontier = nextFrontier
+            if not frontier:
+                break
+    finally:
+        executor.shutdown(wait=True)
+    return RelatedGraph(ids, depth, np.column_stack([sources, targets]))
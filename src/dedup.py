@@ -0,0 +1,165 @@
+import zlib
+from typing import Iterable, List
+
+import numpy as np
+import pandas as pd
+
+# Captions whose estimated Jaccard similarity of word 5-grams reaches the
+# threshold are treated as copies of each other (reuploads, mirror channels).
+DEDUP_THRESHOLD = 0.8
+SHINGLE_SIZE = 5
+NUM_PERM = 128
+# 16 bands of 8 rows: pairs at the threshold share a band with probability
+# 1 - (1 - 0.8 ** 8) ** 16 = 0.95, pairs at 0.5 with probability 0.06.
+LSH_BANDS = 16
+MINHASH_SEED = 1
+# Shingles hashed per permutation block, bounds the (NUM_PERM, block) matrix.
+SHINGLE_BLOCK = 4096
+
+MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+MAX_HASH = np.uint64((1 << 32) - 1)
+SHINGLE_BASE = np.uint64(1000003)
+
+
+def wordHash(word: str) -> int:
+    # crc32 rather than hash(): str hashes change from one process to the next.
+    return zlib.crc32(word.encode('utf-8'))
+
+
+def shingleHashes(text: str, size: int = SHINGLE_SIZE, wordHashes: dict = None) -> np.ndarray:
+    """Distinct 32-bit hashes of the lowercased word shingles of a text.
+
+    Args:
+        text (str): caption
+        size (int, optional): words per shingle. Defaults to SHINGLE_SIZE.
+        wordHashes (dict, optional): word hash memo shared across a batch. Defaults to None.
+
+    Returns:
+        np.ndarray: uint64 shingle hashes, empty when the text has no words
+    """
+    if wordHashes is None:
+        wordHashes = {}
+    words = text.lower().split() if isinstance(text, str) else []
+    if len(words) == 0:
+        return np.empty(0, dtype=np.uint64)
+    hashes = np.fromiter((wordHashes[word] if word in wordHashes else wordHashes.setdefault(word, wordHash(word))
+                          for word in words), dtype=np.uint64, count=len(words))
+    # A text shorter than one shingle is a single shingle of all its words.
+    size = min(size, len(hashes))
+    windows = len(hashes) - size + 1
+    shingles = np.zeros(windows, dtype=np.uint64)
+    for offset in range(size):
+        shingles = shingles * SHINGLE_BASE + hashes[offset:offset + windows]
+    return np.unique(shingles & MAX_HASH)
+
+
+def permutations(numPerm: int = NUM_PERM, seed: int = MINHASH_SEED):
+    """Coefficients (a, b) of the numPerm hash functions (a * x + b) mod prime."""
+    generator = np.random.RandomState(seed)
+    a = generator.randint(1, MERSENNE_PRIME, size=numPerm, dtype=np.uint64)
+    b = generator.randint(0, MERSENNE_PRIME, size=numPerm, dtype=np.uint64)
+    return a[:, None], b[:, None]
+
+
+def minhashSignatures(texts: Iterable, numPerm: int = NUM_PERM, size: int = SHINGLE_SIZE) -> np.ndarray:
+    """MinHash signature of every text, one row per text.
+
+    Rows of texts without words are left at MAX_HASH; duplicateRepresentatives
+    never groups them.
+
+    Args:
+        texts (Iterable): captions
+        numPerm (int, optional): hash functions per signature. Defaults to NUM_PERM.
+        size (int, optional): words per shingle. Defaults to SHINGLE_SIZE.
+
+    Returns:
+        np.ndarray: (len(texts), numPerm) uint64 signatures
+    """
+    texts = list(texts)
+    a, b = permutations(numPerm)
+    wordHashes = {}
+    signatures = np.full((len(texts), numPerm), MAX_HASH, dtype=np.uint64)
+    with np.errstate(over='ignore'):
+        for row, text in enumerate(texts):
+            shingles = shingleHashes(text, size, wordHashes)
+            for start in range(0, len(shingles), SHINGLE_BLOCK):
+                block = shingles[None, start:start + SHINGLE_BLOCK]
+                hashed = ((a * block + b) % MERSENNE_PRIME) & MAX_HASH
+                np.minimum(signatures[row], hashed.min(axis=1),
+                           out=signatures[row])
+    return signatures
+
+
+def duplicateRepresentatives(texts: Iterable, threshold: float = DEDUP_THRESHOLD, numPerm: int = NUM_PERM, bands: int = LSH_BANDS) -> np.ndarray:
+    """Group near-duplicate texts with MinHash and locality-sensitive hashing.
+
+    Signatures are cut into bands; texts sharing a band bucket are candidate
+    pairs, kept when the fraction of equal signature values, an estimate of
+    their shingle Jaccard similarity, reaches the threshold. Only bucket
+    mates are compared, so the cost grows with the number of texts rather
+    than the number of pairs. Groups are the connected components of the
+    kept pairs.
+
+    Args:
+        texts (Iterable): captions
+        threshold (float, optional): estimated Jaccard similarity of duplicates. Defaults to DEDUP_THRESHOLD.
+        numPerm (int, optional): hash functions per signature, a multiple of bands. Defaults to NUM_PERM.
+        bands (int, optional): LSH bands. Defaults to LSH_BANDS.
+
+    Returns:
+        np.ndarray: position of each text's representative, the first text of its group
+    """
+    signatures = minhashSignatures(texts, numPerm)
+    count = len(signatures)
+    parent = np.arange(count)
+
+    def root(node: int) -> int:
+        while parent[node] != node:
+            parent[node] = parent[parent[node]]
+            node = parent[node]
+        return node
+
+    hasWords = ~(signatures == MAX_HASH).all(axis=1)
+    candidates = np.flatnonzero(hasWords)
+    rows = numPerm // bands
+    for band in range(bands):
+        buckets = {}
+        for node in candidates:
+            key = signatures[node, band * rows:(band + 1) * rows].tobytes()
+            buckets.setdefault(key, []).append(node)
+        for members in buckets.values():
+            # Compare with the groups already in the bucket rather than with
+            # every member, so a bucket of n copies costs n comparisons.
+            roots = []
+            for node in members:
+                for other in roots:
+                    if root(node) == root(other):
+                        break
+                    if (signatures[node] == signatures[other]).mean() >= threshold:
+                        low, high = sorted((root(node), root(other)))
+                        parent[high] = low
+                        break
+                else:
+                    roots.append(node)
+    return np.array([root(node) for node in range(count)], dtype=np.int64)
+
+
+def duplicateGroups(texts: pd.Series, threshold: float = DEDUP_THRESHOLD) -> pd.Series:
+    """Label every text with the index label of its group's representative.
+
+    Args:
+        texts (pd.Series): captions, indexed by videoId
+        threshold (float, optional): see duplicateRepresentatives. Defaults to DEDUP_THRESHOLD.
+
+    Returns:
+        pd.Series: representative label of each text; a text without duplicates is its own
+    """
+    representatives = duplicateRepresentatives(texts.to_list(), threshold)
+    return pd.Series(np.asarray(texts.index)[representatives], index=texts.index, name='duplicateGroup')
+
+
+def groupMembers(groups: pd.Series) -> List[List[str]]:
+    """Groups of more than one text, e.g. a video and its reuploads."""
+    sizes = groups.map(groups.value_counts())
+    duplicated = groups[sizes > 1]
+    return [list(members) for _, members in duplicated.groupby(duplicated, sort=False).groups.items()]
@@ -0,0 +1,216 @@
+import contextlib
+import hashlib
+import os
+import sqlite3
+import threading
+import unicodedata
+from typing import Callable, List
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: the cache is only serialised within the process
+    fcntl = None
+
+CACHE_DIR = './cache/embeddings'
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+
+def normalize_text(text) -> str:
+    """Normalise a caption before hashing, so whitespace-only differences share an entry."""
+    if text is None:
+        return ""
+    return " ".join(unicodedata.normalize('NFC', str(text)).split())
+
+
+class EmbeddingCache:
+    """Content-addressed on-disk cache of embedding vectors.
+
+    Vectors live in a memory-mapped float32 matrix with one row per slot,
+    and a SQLite index maps each key (model id + hash of the normalised
+    text) to its slot and when it was last used, so a call only writes the
+    entries it touched. The least recently used entries are evicted once the
+    size budget is reached.
+
+    Processes sharing the cache directory (the app and a CLI run) take a
+    file lock around every lookup and allocation and read slots from the
+    index under it, so a slot reused by another process is never read under
+    its old key. A slot being refilled has no key until its vector is
+    written, so an interrupted write only leaves a free slot behind.
+
+    Args:
+        model_id (str): identifies the model that produced the vectors
+        dim (int): embedding dimension
+        cache_dir (str, optional): root directory of the cache. Defaults to CACHE_DIR.
+        max_bytes (int, optional): size budget of the vector matrix. Defaults to DEFAULT_MAX_BYTES.
+    """
+
+    def __init__(self, model_id: str, dim: int, cache_dir: str = CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.model_id = model_id
+        self.dim = dim
+        self.capacity = max(1, max_bytes // (dim * 4))
+        self.dir = os.path.join(cache_dir, hashlib.sha1(
+            model_id.encode('utf-8')).hexdigest()[:16])
+        self.vectors_path = os.path.join(self.dir, 'vectors.f32')
+        self.index_path = os.path.join(self.dir, 'index.sqlite')
+        self.lock_path = os.path.join(self.dir, 'lock')
+        self._lock = threading.Lock()
+        self._connection = None
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(self.dir, exist_ok=True)
+        with self._lock, self._file_lock():
+            self._load()
+
+    @contextlib.contextmanager
+    def _file_lock(self):
+        """Hold an exclusive lock on the cache files against other processes, where fcntl exists."""
+        if fcntl is None:
+            yield
+            return
+        with open(self.lock_path, 'a') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            self._connection = sqlite3.connect(
+                self.index_path, check_same_thread=False)
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)')
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS entries ('
+                'slot INTEGER PRIMARY KEY, key TEXT UNIQUE, used INTEGER)')
+            self._connection.execute(
+                'CREATE INDEX IF NOT EXISTS entries_used ON entries (used)')
+            self._connection.commit()
+        return self._connection
+
+    def _load(self):
+        connection = self._connect()
+        meta = dict(connection.execute('SELECT name, value FROM meta').fetchall())
+        old_capacity = 0
+        if (os.path.exists(self.vectors_path) and meta.get('model_id') == self.model_id
+                and meta.get('dim') == str(self.dim)):
+            old_capacity = int(meta.get('capacity', 0))
+
+        if old_capacity == self.capacity:
+            self.vectors = np.memmap(self.vectors_path, dtype=np.float32,
+                                     mode='r+', shape=(self.capacity, self.dim))
+            return
+        # Size budget changed (or no cache yet): keep the most recent
+        # entries that fit and compact them into a new matrix.
+        kept = []
+        if old_capacity:
+            kept = connection.execute(
+                'SELECT key, slot, used FROM entries WHERE key IS NOT NULL ORDER BY used DESC LIMIT ?',
+                (self.capacity,)).fetchall()[::-1]
+            old = np.memmap(self.vectors_path, dtype=np.float32,
+                            mode='r', shape=(old_capacity, self.dim))
+            kept = [(key, np.array(old[slot]), used) for key, slot, used in kept]
+            del old
+        self.vectors = np.memmap(self.vectors_path, dtype=np.float32,
+                                 mode='w+', shape=(self.capacity, self.dim))
+        for slot, (_, vector, _) in enumerate(kept):
+            self.vectors[slot] = vector
+        self.vectors.flush()
+        connection.execute('DELETE FROM entries')
+        connection.executemany('INSERT INTO entries VALUES (?, ?, ?)', [
+            (slot, key, used) for slot, (key, _, used) in enumerate(kept)])
+        connection.executemany('INSERT OR REPLACE INTO meta VALUES (?, ?)', [
+            ('model_id', self.model_id), ('dim', str(self.dim)), ('capacity', str(self.capacity))])
+        connection.commit()
+
+    def key(self, text) -> str:
+        digest = hashlib.sha1(normalize_text(text).encode('utf-8')).hexdigest()
+        return self.model_id + ':' + digest
+
+    def _slots(self, keys: List[str]) -> dict:
+        connection = self._connect()
+        slots = {}
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            slots.update(connection.execute(
+                'SELECT key, slot FROM entries WHERE key IN (%s)' % ','.join('?' * len(chunk)),
+                chunk).fetchall())
+        return slots
+
+    def _tick(self) -> int:
+        return self._connect().execute('SELECT COALESCE(MAX(used), 0) + 1 FROM entries').fetchone()[0]
+
+    def _allocate(self) -> int:
+        """Free a slot for a new entry: an unused or keyless slot, else the least recently used one."""
+        connection = self._connect()
+        count = connection.execute('SELECT COUNT(*) FROM entries').fetchone()[0]
+        if count < self.capacity:
+            connection.execute('INSERT INTO entries VALUES (?, NULL, 0)', (count,))
+            return count
+        slot = connection.execute(
+            'SELECT slot FROM entries ORDER BY key IS NOT NULL, used LIMIT 1').fetchone()[0]
+        connection.execute('UPDATE entries SET key = NULL, used = 0 WHERE slot = ?', (slot,))
+        return slot
+
+    def encode(self, texts, encoder: Callable[[List[str]], np.ndarray]) -> np.ndarray:
+        """Return embeddings for texts, only sending cache misses to encoder.
+
+        Args:
+            texts (iterable): texts to embed
+            encoder (Callable): embeds a list of texts, returning an (n, dim) array
+
+        Returns:
+            np.ndarray: float32 matrix of shape (len(texts), dim), in input order
+        """
+        texts = list(texts)
+        keys = [self.key(text) for text in texts]
+        result = np.zeros((len(texts), self.dim), dtype=np.float32)
+        missing = {}
+        with self._lock, self._file_lock():
+            slots = self._slots(list(dict.fromkeys(keys)))
+            for row, key in enumerate(keys):
+                slot = slots.get(key)
+                if slot is None:
+                    missing.setdefault(key, []).append(row)
+                else:
+                    result[row] = self.vectors[slot]
+            if slots:
+                tick = self._tick()
+                connection = self._connect()
+                connection.executemany('UPDATE entries SET used = ? WHERE key = ?',
+                                       [(tick, key) for key in slots])
+                connection.commit()
+            self.hits += len(texts) - sum(len(rows) for rows in missing.values())
+            self.misses += len(missing)
+
+        if missing:
+            computed = np.asarray(encoder(
+                [texts[rows[0]] for rows in missing.values()]), dtype=np.float32)
+            for rows, vector in zip(missing.values(), computed):
+                result[rows] = vector
+            with self._lock, self._file_lock():
+                # Another process may have added some of them meanwhile.
+                present = self._slots(list(missing))
+                added = {}
+                connection = self._connect()
+                for key, vector in zip(missing, computed):
+                    if key not in present:
+                        added[self._allocate()] = (key, vector)
+                # Slots are claimed without a key first, so a crash while
+                # their vectors are written leaves them free, not mislabelled.
+                connection.commit()
+                for slot, (_, vector) in added.items():
+                    self.vectors[slot] = vector
+                self.vectors.flush()
+                tick = self._tick()
+                connection.executemany('UPDATE entries SET key = ?, used = ? WHERE slot = ?', [
+                    (key, tick, slot) for slot, (key, _) in added.items()])
+                connection.commit()
+        return result
+
+    def __len__(self):
+        with self._lock:
+            return self._connect().execute(
+                'SELECT COUNT(*) FROM entries WHERE key IS NOT NULL').fetchone()[0]
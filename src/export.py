@@ -0,0 +1,234 @@
+import hashlib
+import math
+import os
+import shutil
+import tempfile
+import time
+import zipfile
+from datetime import date, datetime
+from typing import Iterator
+
+import numpy as np
+import pandas as pd
+
+from src.tracing import currentTracer
+
+EXPORT_DIR = './exports'
+# Exports of runs not exported or downloaded for this long are deleted.
+EXPORT_TTL = 7 * 24 * 3600
+EXCEL_MAX_ROWS = 1048576
+SHEET_NAME_LENGTH = 31
+WRITE_CHUNK_ROWS = 10000
+FORMATS = {'xlsx': 'xlsx', 'parquet': 'zip', 'csv': 'zip'}
+
+
+def workbookSheets(dfs: dict, captionDf: pd.DataFrame, processeddf: pd.DataFrame = None, channelDfDict: dict = {}, commentSummarisedDfDict: dict = {}, commentsResultDfDict: dict = {}) -> dict:
+    """Sheets of the app export, by sheet name, in workbook order; empty frames are left out."""
+    sheets = {'similarity': processeddf,
+              'stats': dfs.get('videoDf'),
+              'loc': dfs.get('videoLocDf'),
+              'hashtags': dfs.get('videoHashtagsDf'),
+              'topics': dfs.get('videoTopicsDf'),
+              'tags': dfs.get('videoTagsDf'),
+              'captions': captionDf}
+    sheets.update(channelDfDict)
+    sheets.update(commentSummarisedDfDict)
+    sheets.update(commentsResultDfDict)
+    return {name: df for name, df in sheets.items() if df is not None and len(df) != 0}
+
+
+def withIndex(df: pd.DataFrame) -> pd.DataFrame:
+    # A named index (videoId, channelId, ...) is data; a default range index is not.
+    if df.index.name is None and isinstance(df.index, pd.RangeIndex):
+        return df
+    return df.reset_index()
+
+
+def cellValue(value):
+    """Convert a frame value to one xlsxwriter writes, None for an empty cell."""
+    if value is None or value is pd.NaT:
+        return None
+    if isinstance(value, float):
+        return None if math.isnan(value) or math.isinf(value) else value
+    if isinstance(value, (str, bool, int)):
+        return value
+    if isinstance(value, np.generic):
+        return cellValue(value.item())
+    if isinstance(value, datetime):
+        # Excel has no time zones.
+        return value.replace(tzinfo=None)
+    if isinstance(value, date):
+        return value
+    if isinstance(value, np.ndarray):
+        return str(value.tolist())
+    return str(value)
+
+
+def iterRows(df: pd.DataFrame, chunkRows: int = WRITE_CHUNK_ROWS) -> Iterator[list]:
+    """Yield the rows of df as lists of cell values, converting one chunk at a time."""
+    for start in range(0, len(df), chunkRows):
+        chunk = df.iloc[start:start + chunkRows]
+        columns = [chunk.iloc[:, i].astype(object).tolist()
+                   for i in range(chunk.shape[1])]
+        for row in zip(*columns):
+            yield [cellValue(value) for value in row]
+
+
+def sheetParts(name: str, rows: int, maxRows: int = EXCEL_MAX_ROWS) -> list:
+    """Split a sheet of rows data rows into (sheetName, start, stop) parts that fit Excel."""
+    perSheet = maxRows - 1
+    count = max(1, math.ceil(rows / perSheet))
+    parts = []
+    for part in range(count):
+        suffix = '' if count == 1 else ' (%i)' % (part + 1)
+        parts.append((name[:SHEET_NAME_LENGTH - len(suffix)] + suffix,
+                      part * perSheet, min(rows, (part + 1) * perSheet)))
+    return parts
+
+
+def writeExcel(sheets: dict, path: str, maxRows: int = EXCEL_MAX_ROWS):
+    """Stream sheets into an xlsx workbook row by row.
+
+    The workbook is written in xlsxwriter's constant_memory mode, which
+    flushes every row to disk once the next one starts, so memory does not
+    grow with the number of rows. Sheets longer than Excel's row limit are
+    split over numbered sheets.
+
+    Args:
+        sheets (dict): sheet name -> DataFrame
+        path (str): xlsx file to write
+        maxRows (int, optional): rows per sheet, header included. Defaults to EXCEL_MAX_ROWS.
+    """
+    import xlsxwriter
+    workbook = xlsxwriter.Workbook(path, {'constant_memory': True,
+                                          'strings_to_urls': False,
+                                          'strings_to_formulas': False})
+    dateFormat = workbook.add_format({'num_format': 'yyyy-mm-dd hh:mm:ss'})
+    try:
+        for name, df in sheets.items():
+            df = withIndex(df)
+            header = [str(column) for column in df.columns]
+            for sheetName, start, stop in sheetParts(name, len(df), maxRows):
+                worksheet = workbook.add_worksheet(sheetName)
+                worksheet.write_row(0, 0, header)
+                for rowNumber, row in enumerate(iterRows(df.iloc[start:stop]), start=1):
+                    for columnNumber, value in enumerate(row):
+                        if value is None:
+                            continue
+                        if isinstance(value, (datetime, date)):
+                            worksheet.write_datetime(
+                                rowNumber, columnNumber, value, dateFormat)
+                        else:
+                            worksheet.write(rowNumber, columnNumber, value)
+    finally:
+        workbook.close()
+
+
+def archiveName(name: str) -> str:
+    return "".join(character if character.isalnum() or character in ' -_' else '_'
+                   for character in name).strip() or 'frame'
+
+
+def writeArchive(sheets: dict, path: str, fmt: str = 'parquet'):
+    """Write one Parquet or CSV file per sheet into a zip archive, a frame at a time.
+
+    Args:
+        sheets (dict): sheet name -> DataFrame
+        path (str): zip file to write
+        fmt (str, optional): 'parquet' or 'csv'. Defaults to 'parquet'.
+    """
+    with zipfile.ZipFile(path, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, df in sheets.items():
+            member = '%s.%s' % (archiveName(name), fmt)
+            if fmt == 'csv':
+                df = withIndex(df)
+                with archive.open(member, 'w', force_zip64=True) as f:
+                    for start in range(0, max(len(df), 1), WRITE_CHUNK_ROWS):
+                        f.write(df.iloc[start:start + WRITE_CHUNK_ROWS].to_csv(
+                            header=start == 0, index=False).encode('utf-8'))
+            else:
+                import pyarrow.parquet as pq
+
+                from src.store import frameToTable
+                with tempfile.TemporaryDirectory() as tmpDir:
+                    tmpPath = os.path.join(tmpDir, member)
+                    pq.write_table(frameToTable(df), tmpPath)
+                    archive.write(tmpPath, member)
+
+
+def sheetsFingerprint(sheets: dict) -> str:
+    """Digest of the sheets' names, shapes, columns, index and non-object values.
+
+    Object columns (text, embedding lists) are left out to keep it cheap;
+    a new run that changes them also changes the videos or counts.
+    """
+    digest = hashlib.sha1()
+    for name, df in sheets.items():
+        digest.update(repr((name, df.shape, [str(column) for column in df.columns])).encode('utf-8'))
+        digest.update(pd.util.hash_pandas_object(
+            df.select_dtypes(exclude='object'), index=True).values.tobytes())
+    return digest.hexdigest()[:12]
+
+
+def exportPath(runId: str, fmt: str = 'xlsx', exportDir: str = EXPORT_DIR, fingerprint: str = None) -> str:
+    """Path of the export of a run in a format, whether or not it was written yet.
+
+    Args:
+        fingerprint (str, optional): sheetsFingerprint of the exported sheets. Defaults to None.
+    """
+    if fmt not in FORMATS:
+        raise ValueError('Unknown export format %s' % fmt)
+    name = runId if fingerprint is None else '%s_%s' % (runId, fingerprint)
+    return os.path.join(exportDir, runId, 'YTPlus_%s_%s.%s' % (name, fmt, FORMATS[fmt]))
+
+
+def pruneExports(exportDir: str = EXPORT_DIR, maxAge: float = EXPORT_TTL):
+    """Delete the exports of runs whose directory was not touched for maxAge seconds."""
+    if not os.path.isdir(exportDir):
+        return
+    now = time.time()
+    for name in os.listdir(exportDir):
+        runDir = os.path.join(exportDir, name)
+        if os.path.isdir(runDir) and now - os.path.getmtime(runDir) > maxAge:
+            shutil.rmtree(runDir, ignore_errors=True)
+
+
+def exportRun(runId: str, sheets: dict, fmt: str = 'xlsx', exportDir: str = EXPORT_DIR) -> str:
+    """Export the sheets of a run once and return the file path.
+
+    Exports are keyed by runId and a fingerprint of the sheets: an export of
+    the same sheets in the same format is returned as is, so reruns of the
+    app cost nothing, while changed sheets are exported again and replace
+    the run's older export. Writing an export also prunes the exports of
+    runs older than EXPORT_TTL.
+
+    Args:
+        runId (str): run identifier, e.g. DatasetStore.write's
+        sheets (dict): sheet name -> DataFrame, e.g. workbookSheets(...)
+        fmt (str, optional): 'xlsx', 'parquet' (zip) or 'csv' (zip). Defaults to 'xlsx'.
+        exportDir (str, optional): directory of the exports. Defaults to EXPORT_DIR.
+
+    Returns:
+        str: path of the export
+    """
+    path = exportPath(runId, fmt, exportDir, sheetsFingerprint(sheets))
+    runDir = os.path.dirname(path)
+    if os.path.exists(path):
+        os.utime(runDir)
+        return path
+    pruneExports(exportDir)
+    os.makedirs(runDir, exist_ok=True)
+    tmpPath = path + '.tmp'
+    with currentTracer().span('export.' + fmt) as event:
+        if fmt == 'xlsx':
+            writeExcel(sheets, tmpPath)
+        else:
+            writeArchive(sheets, tmpPath, fmt)
+        event['items'] = sum(len(df) for df in sheets.values())
+        event['bytes'] = os.path.getsize(tmpPath)
+    suffix = '_%s.%s' % (fmt, FORMATS[fmt])
+    for name in os.listdir(runDir):
+        if name.endswith(suffix) and name != os.path.basename(path):
+            os.remove(os.path.join(runDir, name))
+    os.replace(tmpPath, path)
+    return path
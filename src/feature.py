@@ -1,22 +1,99 @@
+import threading
 import warnings
+from functools import lru_cache
 
 warnings.filterwarnings("ignore")
 
-import streamlit as st
-from keybert import KeyBERT
-from keyphrase_vectorizers import KeyphraseCountVectorizer
-from sentence_transformers import SentenceTransformer
+from src.embedding_cache import EmbeddingCache
 
-try:
-    en_model = SentenceTransformer("./model/all-mpnet-base-v2")
-except:
-    en_model = SentenceTransformer("./model/all-MiniLM-L6-v2")
+# sentence_transformers, KeyBERT and keyphrase_vectorizers are imported by
+# the loaders below on first use, so importing this module stays cheap.
+en_model_paths = ["./model/all-mpnet-base-v2", "./model/all-MiniLM-L6-v2"]
+_en_model = None
+_en_model_cache = None
+_model_lock = threading.Lock()
 
 
-@st.cache(suppress_st_warning=True)
-def extractKeywords(doc: str) -> list:
-    vectorizer = KeyphraseCountVectorizer()
-    kw_model = KeyBERT(model=en_model)
+def getSentenceModel():
+    """Return the sentence-transformer model and its embedding cache, loading them on first use."""
+    global _en_model, _en_model_cache
+    if _en_model is None:
+        with _model_lock:
+            if _en_model is None:
+                from sentence_transformers import SentenceTransformer
+                try:
+                    en_model_path = en_model_paths[0]
+                    en_model = SentenceTransformer(en_model_path)
+                except:
+                    en_model_path = en_model_paths[1]
+                    en_model = SentenceTransformer(en_model_path)
+                _en_model_cache = EmbeddingCache(
+                    en_model_path, en_model.get_sentence_embedding_dimension())
+                _en_model = en_model
+    return _en_model, _en_model_cache
+
+
+_vectorizer = None
+_kw_model = None
+_kw_lock = threading.Lock()
+
+
+def getVectorizer():
+    """Return the shared keyphrase vectorizer, loading its spaCy pipeline on first use."""
+    global _vectorizer
+    if _vectorizer is None:
+        with _kw_lock:
+            if _vectorizer is None:
+                from keyphrase_vectorizers import KeyphraseCountVectorizer
+                _vectorizer = KeyphraseCountVectorizer()
+    return _vectorizer
+
+
+def getKeywordModel():
+    """Return the shared KeyBERT model backed by the cached sentence-transformer."""
+    global _kw_model
+    if _kw_model is None:
+        with _kw_lock:
+            if _kw_model is None:
+                from keybert import KeyBERT
+                from src.keybert_backend import CachedSentenceTransformer
+                _kw_model = KeyBERT(model=CachedSentenceTransformer(
+                    *getSentenceModel()))
+    return _kw_model
 
-    keywords = kw_model.extract_keywords(doc, vectorizer=vectorizer, use_mmr = True)
-    return [item[0] for item in keywords]
+
+def extractKeywordsBatch(docs: list, batch_size: int = 1000, use_mmr: bool = True) -> list:
+    """Extract keyphrases for many documents at once.
+
+    Each batch is one vectorizer fit and one embedding pass over its
+    documents and candidate keyphrases, instead of one of each per document.
+
+    Args:
+        docs (list): titles, descriptions or other texts
+        batch_size (int, optional): documents per vectorizer fit. Defaults to 1000.
+        use_mmr (bool, optional): diversify keyphrases with Maximal Marginal Relevance. Defaults to True.
+
+    Returns:
+        list: list of keyphrases for each document, in input order
+    """
+    docs = list(docs)
+    kw_model = getKeywordModel()
+    vectorizer = getVectorizer()
+    results = []
+    for start in range(0, len(docs), batch_size):
+        batch = docs[start:start + batch_size]
+        # The vectorizer is refit on every call, so concurrent sessions
+        # must not share it mid-extraction.
+        with _kw_lock:
+            keywords = kw_model.extract_keywords(
+                batch, vectorizer=vectorizer, use_mmr=use_mmr)
+        if len(batch) == 1:
+            keywords = [keywords]
+        results.extend([[item[0] for item in docKeywords]
+                        for docKeywords in keywords])
+    return results
+
+
+@lru_cache(maxsize=256)
+def extractKeywords(doc: str) -> list:
+    return extractKeywordsBatch([doc])[0]
@@ -1,67 +1,512 @@
-from src.service import create_yt_service
+import contextlib
+import contextvars
+import hashlib
+import json
+import math
+import os
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+from googleapiclient.errors import HttpError
+
+from src.response_cache import ResponseCache
+from src.service import create_yt_service, thread_http
+from src.tracing import currentTracer, logEvent, traced
 from pytube import Channel
 
+try:
+    import fcntl
+except ImportError:  # Windows: the ledger is only serialised within the process
+    fcntl = None
+
 API_KEY = ""
 
-service = create_yt_service(API_KEY)
+
+def getService():
+    """Return the API client of the current run's key.
+
+    Clients are cached per key, so this is cheap, and each session's run
+    uses its own key whatever API_KEY holds now. A client is shared by every
+    thread; execute sends each request over the calling thread's transport.
+    """
+    return create_yt_service(planner.currentRun().apiKey)
+
+
+def initWorker(context: contextvars.Context = None):
+    """ThreadPoolExecutor initializer running each worker in the context of the thread creating the pool.
+
+    Args:
+        context (contextvars.Context, optional): context whose variables (the quota run and
+        tracer) are copied into the worker. Defaults to None.
+    """
+    if context is not None:
+        for variable, value in context.items():
+            variable.set(value)
+
+
+def workerPool(maxWorkers: int) -> ThreadPoolExecutor:
+    """Thread pool whose workers run in the caller's run context, see initWorker."""
+    return ThreadPoolExecutor(max_workers=maxWorkers, initializer=initWorker,
+                              initargs=(contextvars.copy_context(),))
+
+
+# Quota units per call: https://developers.google.com/youtube/v3/determine_quota_cost
+QUOTA_COSTS = {'search.list': 100,
+               'videos.list': 1,
+               'channels.list': 1,
+               'commentThreads.list': 1}
+DAILY_QUOTA = 10000
+QUOTA_LEDGER_DIR = './cache/quota'
+RESULTS_PER_PAGE = 50
+# Run budgets are set this much above the estimate: chunks of ids rarely
+# split evenly, and a search page may return ids already looked up.
+BUDGET_HEADROOM = 0.1
+
+
+class QuotaExceededError(Exception):
+    pass
+
+
+# 403 reasons of an exhausted API quota; other 403s (e.g. commentsDisabled)
+# only concern the one resource.
+QUOTA_ERROR_REASONS = {'quotaExceeded', 'dailyLimitExceeded'}
+
+
+def errorReasons(error: HttpError) -> set:
+    """Reasons ('quotaExceeded', 'keyInvalid', ...) given in the body of an API error."""
+    try:
+        errors = json.loads(error.content.decode('utf-8'))['error']['errors']
+    except (ValueError, KeyError, TypeError, AttributeError):
+        return set()
+    return {detail.get('reason') for detail in errors}
+
+
+def isQuotaError(error: Exception) -> bool:
+    """True for QuotaExceededError and for API 403 responses reporting an exhausted quota."""
+    if isinstance(error, QuotaExceededError):
+        return True
+    if not isinstance(error, HttpError) or error.resp.status != 403:
+        return False
+    return bool(errorReasons(error) & QUOTA_ERROR_REASONS)
+
+
+class QuotaRun:
+    """Calls and units of one run, charged to the daily ledger of its API key.
+
+    Args:
+        apiKey (str): key the run spends
+        runBudget (int, optional): units this run may spend. Defaults to None (no cap).
+    """
+
+    def __init__(self, apiKey: str, runBudget: int = None):
+        self.apiKey = apiKey
+        self.runBudget = runBudget
+        self.calls = Counter()
+        self.units = Counter()
+
+    def spent(self) -> int:
+        return sum(self.units.values())
+
+
+# The run of the calling context: each Streamlit session or CLI command
+# starts its own, and workerPool() hands it on to pool threads.
+_currentRun = contextvars.ContextVar('quotaRun', default=None)
+
+
+class QuotaPlanner:
+    """Accounts for the quota units of every API call.
+
+    Each call is charged before it is sent and refused with
+    QuotaExceededError once the run budget or the daily budget would be
+    exceeded. Daily spend is kept in a small ledger file per API key so
+    separate runs and processes using the same key share its daily budget;
+    the API resets quota at midnight Pacific time. Per-run accounting lives
+    in the QuotaRun of the calling context, see startRun and useRun.
+
+    Args:
+        dailyBudget (int, optional): units available per day for each key. Defaults to DAILY_QUOTA.
+        ledgerDir (str, optional): directory of the per-key ledger files. Defaults to QUOTA_LEDGER_DIR.
+    """
+
+    def __init__(self, dailyBudget: int = DAILY_QUOTA, ledgerDir: str = QUOTA_LEDGER_DIR):
+        self.dailyBudget = dailyBudget
+        self.ledgerDir = ledgerDir
+        self._lock = threading.Lock()
+        self._defaultRun = None
+
+    def startRun(self, runBudget: int = None, apiKey: str = None) -> QuotaRun:
+        """Start a run in the calling context, optionally capping the units it may spend.
+
+        Args:
+            runBudget (int, optional): units the run may spend. Defaults to None (no cap).
+            apiKey (str, optional): key the run spends. Defaults to API_KEY.
+
+        Returns:
+            QuotaRun: the run, to keep (e.g. in st.session_state) and resume with useRun
+        """
+        run = QuotaRun(API_KEY if apiKey is None else apiKey, runBudget)
+        _currentRun.set(run)
+        return run
+
+    @staticmethod
+    def useRun(run: QuotaRun):
+        """Make run the current run of the calling context."""
+        _currentRun.set(run)
+
+    def currentRun(self) -> QuotaRun:
+        """The run of the calling context, or a default run of API_KEY when none was started."""
+        run = _currentRun.get()
+        if run is None:
+            with self._lock:
+                if self._defaultRun is None or self._defaultRun.apiKey != API_KEY:
+                    self._defaultRun = QuotaRun(API_KEY)
+                run = self._defaultRun
+        return run
+
+    @staticmethod
+    def today() -> str:
+        return datetime.now(ZoneInfo('America/Los_Angeles')).strftime('%Y-%m-%d')
+
+    def ledgerPath(self, apiKey: str) -> str:
+        # Keys are not written to disk, only a digest naming their ledger.
+        return os.path.join(self.ledgerDir, hashlib.sha1(apiKey.encode('utf-8')).hexdigest()[:16] + '.json')
+
+    @contextlib.contextmanager
+    def _ledgerLock(self, apiKey: str):
+        """Hold an exclusive lock on the key's ledger against other processes, where fcntl exists."""
+        if fcntl is None:
+            yield
+            return
+        os.makedirs(self.ledgerDir, exist_ok=True)
+        with open(self.ledgerPath(apiKey) + '.lock', 'a') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _readLedger(self, apiKey: str) -> dict:
+        path = self.ledgerPath(apiKey)
+        if not os.path.exists(path):
+            return {}
+        with open(path, 'r') as f:
+            return json.load(f)
+
+    def dailySpent(self, apiKey: str = None) -> int:
+        """Units spent today with apiKey, by default the current run's key."""
+        if apiKey is None:
+            apiKey = self.currentRun().apiKey
+        return self._readLedger(apiKey).get(self.today(), 0)
+
+    def runSpent(self) -> int:
+        return self.currentRun().spent()
+
+    def remaining(self, apiKey: str = None) -> int:
+        """Units still available, the smaller of the run and daily allowance.
+
+        Args:
+            apiKey (str, optional): key to plan a new run for: only its daily allowance
+            counts. Defaults to None, the current run.
+        """
+        if apiKey is not None:
+            return max(self.dailyBudget - self.dailySpent(apiKey), 0)
+        run = self.currentRun()
+        remaining = self.dailyBudget - self.dailySpent(run.apiKey)
+        if run.runBudget is not None:
+            remaining = min(remaining, run.runBudget - run.spent())
+        return max(remaining, 0)
+
+    def charge(self, method: str):
+        """Record one call of method, raising QuotaExceededError if it does not fit the budget."""
+        cost = QUOTA_COSTS.get(method, 1)
+        run = self.currentRun()
+        with self._lock, self._ledgerLock(run.apiKey):
+            ledger = self._readLedger(run.apiKey)
+            today = self.today()
+            if run.runBudget is not None and run.spent() + cost > run.runBudget:
+                raise QuotaExceededError('Run budget of %i units reached (%s costs %i)' % (
+                    run.runBudget, method, cost))
+            if ledger.get(today, 0) + cost > self.dailyBudget:
+                raise QuotaExceededError('Daily budget of %i units reached (%s costs %i)' % (
+                    self.dailyBudget, method, cost))
+            run.calls[method] += 1
+            run.units[method] += cost
+            ledger = {today: ledger.get(today, 0) + cost}
+            path = self.ledgerPath(run.apiKey)
+            os.makedirs(self.ledgerDir, exist_ok=True)
+            tmpPath = path + '.tmp'
+            with open(tmpPath, 'w') as f:
+                json.dump(ledger, f)
+            os.replace(tmpPath, path)
+
+    def summary(self) -> dict:
+        run = self.currentRun()
+        return {'calls': dict(run.calls),
+                'units': dict(run.units),
+                'runSpent': run.spent(),
+                'dailySpent': self.dailySpent(run.apiKey),
+                'remaining': self.remaining()}
+
+
+planner = QuotaPlanner()
+
+
+def execute(request, method: str):
+    """Charge method against the quota planner, then send request, traced as 'api.<method>'.
+
+    The span records the units charged, the items returned and the size of
+    the response as JSON. The request is sent over the calling thread's
+    own transport, as httplib2 is not thread-safe.
+    """
+    planner.charge(method)
+    with currentTracer().span('api.' + method, units=QUOTA_COSTS.get(method, 1)) as event:
+        response = request.execute(http=thread_http())
+        event['items'] = len(response.get('items', []))
+        event['bytes'] = len(json.dumps(response))
+    return response
+
+
+API_ACCESS_OK = "API access successful"
+# Failed key checks that may pass later (quota, server or network errors)
+# are repeated after this many seconds rather than remembered.
+CHECK_RETRY_SECONDS = 60
+_checked = {}
+_checked_lock = threading.Lock()
+
+
+def check_api(apiKey: str):
+    """Validate apiKey with the cheapest list call, charged to the key's daily ledger.
+
+    Success and rejections of the key itself (400, e.g. keyInvalid) are
+    remembered for the life of the process; other failures for
+    CHECK_RETRY_SECONDS.
+
+    Returns:
+        API_ACCESS_OK, or the error raised by the call
+    """
+    with _checked_lock:
+        result, expiresAt = _checked.get(apiKey, (None, 0))
+    if expiresAt is None or time.time() < expiresAt:
+        return result
+
+    def validate():
+        # A run of its own, so the caller's run is neither used nor charged.
+        planner.startRun(apiKey=apiKey)
+        execute(create_yt_service(apiKey).videoCategories().list(part='id', regionCode='US'),
+                'videoCategories.list')
+
+    expiresAt = None
+    try:
+        contextvars.copy_context().run(validate)
+        result = API_ACCESS_OK
+    except HttpError as e:
+        result = e
+        if e.resp.status != 400:
+            expiresAt = time.time() + CHECK_RETRY_SECONDS
+    except Exception as e:
+        result = e
+        expiresAt = time.time() + CHECK_RETRY_SECONDS
+    with _checked_lock:
+        _checked[apiKey] = (result, expiresAt)
+    return result
+
+
+def estimateRunCost(searchPages: int = 0, videoCount: int = 0, channelCount: int = 0, commentPages: int = 0, seedCount: int = 0) -> int:
+    """Estimate the quota units of a planned run.
+
+    Args:
+        searchPages (int, optional): search().list pages (keyword, related and channel searches). Defaults to 0.
+        videoCount (int, optional): videos to look up, 50 per videos().list call. Defaults to 0.
+        channelCount (int, optional): channels to look up, 50 per channels().list call. Defaults to 0.
+        commentPages (int, optional): commentThreads().list pages. Defaults to 0.
+        seedCount (int, optional): seed videos looked up with the search results, as queryKeyword
+        adds the seed id to them; their channels are counted too. Defaults to 0.
+
+    Returns:
+        int: estimated quota units
+    """
+    return (searchPages * QUOTA_COSTS['search.list']
+            + math.ceil((videoCount + seedCount) / RESULTS_PER_PAGE) * QUOTA_COSTS['videos.list']
+            + math.ceil((channelCount + seedCount) / RESULTS_PER_PAGE) * QUOTA_COSTS['channels.list']
+            + commentPages * QUOTA_COSTS['commentThreads.list'])
+
+
+def runBudget(estimate: int, headroom: float = BUDGET_HEADROOM) -> int:
+    """Run budget for an estimateRunCost estimate, with headroom for uneven chunks."""
+    return math.ceil(estimate * (1 + headroom))
 
 
-def getVideoDetail(video_ids: list) -> str:
+def searchRunCost(searchPages: int, seedCount: int = 0) -> int:
+    """Estimate the quota units of a search run: its pages, the videos they return and their channels.
+
+    Args:
+        searchPages (int): search().list pages
+        seedCount (int, optional): seed videos looked up with the results. Defaults to 0.
+
+    Returns:
+        int: estimated quota units
+    """
+    videoCount = searchPages * RESULTS_PER_PAGE
+    return estimateRunCost(searchPages=searchPages, videoCount=videoCount, channelCount=videoCount, seedCount=seedCount)
+
+
+def planSearchPages(requests: dict, budget: int, decay: float = 0.7, seedCount: int = 0) -> dict:
+    """Decide how many search pages to fetch for each query within a budget.
+
+    Later pages of a search return more results already seen elsewhere, so
+    page p of a query is valued at decay ** p new videos per unit, and pages
+    are granted greedily, highest value first, while the run budget of the
+    plan (searchRunCost with runBudget headroom) fits the budget.
+
+    Args:
+        requests (dict): query name -> maximum pages wanted
+        budget (int): units available for the run
+        decay (float, optional): relative value of each further page. Defaults to 0.7.
+        seedCount (int, optional): seed videos looked up with the results. Defaults to 0.
+
+    Returns:
+        dict: query name -> pages to fetch
+    """
+    candidates = sorted(((decay ** page, name) for name, maxPages in requests.items()
+                         for page in range(maxPages)), key=lambda x: -x[0])
+    pages = {name: 0 for name in requests}
+    for _, name in candidates:
+        if runBudget(searchRunCost(sum(pages.values()) + 1, seedCount)) > budget:
+            break
+        pages[name] += 1
+    return pages
+
+
+responseCache = ResponseCache()
+
+
+def splitIds(ids) -> list:
+    return ids.split(',') if isinstance(ids, str) else list(ids)
+
+
+@traced('ingestion.getVideoDetail')
+def getVideoDetail(video_ids: list, maxAge: float = None) -> str:
+    """Call YT Videos API, serving fresh ids and parts from the response cache
+
+    Args:
+        video_ids (list): list (or comma-joined string) of video ids
+        maxAge (float, optional): override the cache TTLs in seconds, 0 refetches everything. Defaults to None.
+
+    Returns:
+        str: html return from api, containing video details, stated in part_string
+    """
     part_string = 'contentDetails,statistics,snippet,topicDetails,recordingDetails,localizations'
 
-    response = service.videos().list(
-        part=part_string,
-        id=video_ids
-    ).execute()
+    response = responseCache.list('videos', splitIds(video_ids), part_string.split(','), lambda ids, parts: execute(getService().videos().list(
+        part=parts,
+        id=ids
+    ), 'videos.list'), kind='youtube#video', maxAge=maxAge)
+
+    return response
+
+
+@traced('ingestion.getVideoStatistics')
+def getVideoStatistics(video_ids: list, maxAge: float = 0) -> dict:
+    """Call YT Videos API for the statistics part only (1 quota unit per 50 ids)
+
+    Args:
+        video_ids (list): list (or comma-joined string) of video ids
+        maxAge (float, optional): serve statistics cached for less than maxAge seconds. Defaults to 0 (always refetch).
+
+    Returns:
+        dict: response with the id and statistics of every video found
+    """
+    response = responseCache.list('videos', splitIds(video_ids), ['statistics'], lambda ids, parts: execute(getService().videos().list(
+        part=parts,
+        id=ids
+    ), 'videos.list'), kind='youtube#video', maxAge=maxAge)
 
     return response
 
 
-def getChannelDetail(channel_ids: list) -> str:
-    """Call YT Channel API
+@traced('ingestion.getChannelDetail')
+def getChannelDetail(channel_ids: list, maxAge: float = None) -> str:
+    """Call YT Channel API, serving fresh ids and parts from the response cache
 
     Args:
         channel_ids (list): list of channel details
+        maxAge (float, optional): override the cache TTLs in seconds, 0 refetches everything. Defaults to None.
 
     Returns:
         str: html return from api, containing channels details, stated in part_string
     """
     part_string = 'snippet,brandingSettings,statistics,topicDetails'
 
-    response = service.channels().list(
-        part=part_string,
-        id=channel_ids,
+    response = responseCache.list('channels', splitIds(channel_ids), part_string.split(','), lambda ids, parts: execute(getService().channels().list(
+        part=parts,
+        id=ids,
         maxResults=50
-    ).execute()
+    ), 'channels.list'), kind='youtube#channel', maxAge=maxAge)
 
     return response
 
-def getCommentDetail(videoId: str) -> str:
-    """Call YT Channel API
+
+def iterCommentPages(videoId: str, maxComments: int = None, maxPages: int = None):
+    """Call YT CommentThreads API, yielding each page as it arrives
 
     Args:
-        video_ids (list): a videoId that comments will be extracted from.
+        videoId (str): a videoId that comments will be extracted from.
+        maxComments (int, optional): stop after this many comment threads. Defaults to None (all).
+        maxPages (int, optional): stop after this many pages. Defaults to None (all).
 
-    Returns:
-        str: html return from api, containing comments details, stated in part_string
+    Yields:
+        list: comment thread items of one page, containing comments details, stated in part_string
     """
-    responses = []
     part_string = 'id, snippet'
     nextPageToken = ''
     pageNumber = 0
-    while (nextPageToken!= 'end' or pageNumber == 0):
-        pageNumber += 1
-        response = service.commentThreads().list(
+    fetched = 0
+    while True:
+        maxResults = 100 if maxComments is None else min(
+            100, maxComments - fetched)
+        if maxResults <= 0:
+            # The API rejects maxResults=0.
+            return
+        response = responseCache.page('commentThreads', '%s:%s:%i' % (videoId, nextPageToken, maxResults), lambda: execute(getService().commentThreads().list(
             part=part_string,
             videoId=videoId,
-            maxResults=100,
+            maxResults=maxResults,
             pageToken=nextPageToken,
-        ).execute()
-        nextPageToken = response.get('nextPageToken','end')
-        # Store the current page of results
-        responses = responses + response['items']
+        ), 'commentThreads.list'))
+        pageNumber += 1
+        items = response['items'][:maxResults]
+        fetched += len(items)
+        yield items
+        nextPageToken = response.get('nextPageToken')
+        if (nextPageToken is None
+                or (maxPages is not None and pageNumber >= maxPages)
+                or (maxComments is not None and fetched >= maxComments)):
+            return
+
+
+@traced('ingestion.getCommentDetail')
+def getCommentDetail(videoId: str, maxComments: int = None, maxPages: int = None) -> list:
+    """Call YT CommentThreads API for every page of a video
+
+    Args:
+        videoId (str): a videoId that comments will be extracted from.
+        maxComments (int, optional): stop after this many comment threads. Defaults to None (all).
+        maxPages (int, optional): stop after this many pages. Defaults to None (all).
+
+    Returns:
+        list: comment thread items, containing comments details, stated in part_string
+    """
+    responses = []
+    for page in iterCommentPages(videoId, maxComments, maxPages):
+        responses.extend(page)
     return responses
 
+
+@traced('ingestion.getRecentChannelVids')
 def getRecentChannelVids(channel_ids: list, recent_x: int) -> list:
     """Return list of channel vids ids (no API needed)
 
@@ -87,20 +532,30 @@ def getRecentChannelVids(channel_ids: list, recent_x: int) -> list:
     return result
 
 
-def getRelatedVideoIds(relatedToVideoId: str) -> list:
+@traced('ingestion.getRelatedVideoIds')
+def getRelatedVideoIds(relatedToVideoId: str, pageLimit: int = 2) -> list:
+    """Search videos related to a video, at 100 quota units per page
+
+    Args:
+        relatedToVideoId (str): seed video
+        pageLimit (int, optional): 50 max return per page. Defaults to 2.
+
+    Returns:
+        list: list of related video ids
+    """
     maxResults = 50
     pageCount = 0
     videoIdsList = []
     response = {}
 
-    while (response.get('nextPageToken') is not None or pageCount == 0):
-        response = service.search().list(
+    while (response.get('nextPageToken') is not None or pageCount == 0) and pageCount != pageLimit:
+        response = execute(getService().search().list(
             part='id',
             relatedToVideoId=relatedToVideoId,
             maxResults=maxResults,
             pageToken=response.get('nextPageToken'),
             type='video'
-        ).execute()
+        ), 'search.list')
         pageCount += 1
         # Store the current page of results
         for item in response['items']:
@@ -119,6 +574,7 @@ def getVideoListDetails(VideoIds: list) -> bool:
     return True
 
 
+@traced('ingestion.queryKeyword')
 def queryKeyword(keyword: str, seedId: str = None, order: str = 'relevance', videoCaption: str = "any", pageLimit=2) -> list:
     """Search youtube based on youtube search API
     Source: https://developers.google.com/youtube/v3/docs/search/list
@@ -156,7 +612,7 @@ def queryKeyword(keyword: str, seedId: str = None, order: str = 'relevance', vid
         videoCaption = 'closedCaption'
 
     while (response.get('nextPageToken') is not None or pageCount == 0) and pageCount != pageLimit:
-        response = service.search().list(
+        response = execute(getService().search().list(
             part='id,snippet',
             maxResults=maxResults,
             q=query,
@@ -164,9 +620,10 @@ def queryKeyword(keyword: str, seedId: str = None, order: str = 'relevance', vid
             type='video',
             order=order,
             videoCaption=videoCaption
-        ).execute()
+        ), 'search.list')
         pageCount += 1
-        print("Next page found, downloading", response.get('nextPageToken'))
+        logEvent('searchPage', query=query, page=pageCount,
+                 nextPageToken=response.get('nextPageToken'))
         # Store the current page of results
         for item in response['items']:
             videoIdsList.append(item['id']['videoId'])
@@ -175,19 +632,21 @@ def queryKeyword(keyword: str, seedId: str = None, order: str = 'relevance', vid
     return searchVideoIDs
 
 
+@traced('ingestion.queryChannelVidIds')
 def queryChannelVidIds(channelId: str, limit=2):
     maxResults = 50
     response = {}
     pageCount = 0
     while (response.get('nextPageToken') is not None or pageCount == 0) and pageCount != limit:
-        response = service.search().list(
+        response = execute(getService().search().list(
             part='snippet',
             maxResults=maxResults,
             order='date',
             channelId=channelId,
             pageToken=response.get('nextPageToken')
-        ).execute()
+        ), 'search.list')
         pageCount += 1
-        print("Next page found, downloading", response.get('nextPageToken'))
+        logEvent('searchPage', channelId=channelId, page=pageCount,
+                 nextPageToken=response.get('nextPageToken'))
 
     return response
@@ -0,0 +1,18 @@
+import numpy as np
+from keybert.backend import BaseEmbedder
+from sentence_transformers import SentenceTransformer
+
+from src.embedding_cache import EmbeddingCache
+
+
+class CachedSentenceTransformer(BaseEmbedder):
+    """KeyBERT backend that serves repeated documents and keyphrases from the embedding cache."""
+
+    def __init__(self, model: SentenceTransformer, cache: EmbeddingCache):
+        super().__init__()
+        self.embedding_model = model
+        self.cache = cache
+
+    def embed(self, documents, verbose: bool = False) -> np.ndarray:
+        return self.cache.encode(documents, lambda texts: self.embedding_model.encode(
+            texts, show_progress_bar=verbose))
@@ -0,0 +1,111 @@
+from datetime import datetime
+from typing import List
+
+import pandas as pd
+
+from src.ingestion import getVideoStatistics
+from src.process import ProgressCallback, noProgress, searchChunking
+from src.store import DatasetStore, getStore
+
+STATS_FRAME = 'videoStats'
+STATS_SEED = 'refresh'
+STAT_COLUMNS = ['viewCount', 'likeCount', 'commentCount', 'favoriteCount']
+
+
+def trackedVideoIds(store: DatasetStore = None) -> List[str]:
+    """Every video collected into the store so far."""
+    store = store or getStore()
+    videoDf = store.load('videoDf', columns=['videoId'])
+    if len(videoDf) == 0:
+        return []
+    return list(dict.fromkeys(videoDf.index))
+
+
+def statisticsSnapshot(videoIds: List[str], progress: ProgressCallback = noProgress) -> pd.DataFrame:
+    """Fetch the current counters of videos, part=statistics only, 50 ids per call.
+
+    Args:
+        videoIds (List[str]): videos to snapshot
+        progress (ProgressCallback, optional): called after each chunk. Defaults to noProgress.
+
+    Returns:
+        pd.DataFrame: videoId, collectDateTime and the counters, as nullable integers
+    """
+    rows = []
+    chunkList = searchChunking(list(dict.fromkeys(videoIds)))
+    for count, chunk in enumerate(chunkList):
+        response = getVideoStatistics(chunk)
+        collectDateTime = datetime.now()
+        for item in response['items']:
+            statistics = item.get('statistics') or {}
+            row = {'videoId': item['id'], 'collectDateTime': collectDateTime}
+            row.update({column: statistics.get(column) for column in STAT_COLUMNS})
+            rows.append(row)
+        progress(count + 1, len(chunkList), 'statistics')
+    snapshot = pd.DataFrame(rows, columns=['videoId', 'collectDateTime'] + STAT_COLUMNS)
+    snapshot[STAT_COLUMNS] = snapshot[STAT_COLUMNS].apply(
+        pd.to_numeric, errors='coerce').astype('Int64')
+    return snapshot
+
+
+def refreshStatistics(videoIds: List[str] = None, store: DatasetStore = None, progress: ProgressCallback = noProgress) -> pd.DataFrame:
+    """Append a statistics snapshot of tracked videos to the store's time series.
+
+    Only part=statistics is requested, so a refresh costs one quota unit per
+    50 videos and no transcripts, snippets or embeddings are touched.
+
+    Args:
+        videoIds (List[str], optional): videos to refresh. Defaults to every video in the store.
+        store (DatasetStore, optional): store holding the videos and the time series. Defaults to getStore().
+        progress (ProgressCallback, optional): called after each chunk. Defaults to noProgress.
+
+    Returns:
+        pd.DataFrame: the snapshot appended
+    """
+    store = store or getStore()
+    if videoIds is None:
+        videoIds = trackedVideoIds(store)
+    snapshot = statisticsSnapshot(videoIds, progress)
+    if len(snapshot) != 0:
+        store.write({STATS_FRAME: snapshot}, STATS_SEED,
+                    collectDate=snapshot['collectDateTime'].iloc[0].date().isoformat())
+    return snapshot
+
+
+def withDeltas(history: pd.DataFrame) -> pd.DataFrame:
+    """Add per-video changes since the previous snapshot: <counter>Delta and elapsedHours."""
+    history = history.sort_values(['videoId', 'collectDateTime'], ignore_index=True)
+    byVideo = history.groupby('videoId', sort=False)
+    for column in STAT_COLUMNS:
+        if column in history:
+            history[column + 'Delta'] = byVideo[column].diff()
+    history['elapsedHours'] = byVideo['collectDateTime'].diff().dt.total_seconds() / 3600
+    return history
+
+
+def statisticsHistory(videoIds: List[str] = None, since: str = None, store: DatasetStore = None, deltas: bool = True) -> pd.DataFrame:
+    """Load the statistics time series, oldest snapshot first for each video.
+
+    Args:
+        videoIds (List[str], optional): only these videos. Defaults to all.
+        since (str, optional): only snapshots collected on or after this ISO date. Defaults to all.
+        store (DatasetStore, optional): store holding the time series. Defaults to getStore().
+        deltas (bool, optional): add the changes between consecutive snapshots. Defaults to True.
+
+    Returns:
+        pd.DataFrame: videoId, collectDateTime, the counters and, with deltas, their changes
+    """
+    import pyarrow.dataset as ds
+    store = store or getStore()
+    filter = None
+    if videoIds is not None:
+        filter = ds.field('videoId').isin(list(videoIds))
+    if since is not None:
+        sinceFilter = ds.field('collectDate') >= since
+        filter = sinceFilter if filter is None else filter & sinceFilter
+    history = store.load(STATS_FRAME, columns=['videoId', 'collectDateTime'] + STAT_COLUMNS,
+                         filter=filter, seed=STATS_SEED)
+    if len(history) == 0:
+        return history
+    return withDeltas(history) if deltas else history.sort_values(
+        ['videoId', 'collectDateTime'], ignore_index=True)
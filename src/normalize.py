@@ -0,0 +1,84 @@
+import re
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, List
+
+import pandas as pd
+
+# Batches smaller than this are normalized in process: starting a pool and
+# pickling the texts costs more than it saves.
+PROCESS_POOL_MIN_ITEMS = 2000
+PROCESS_POOL_CHUNKSIZE = 256
+
+DESCRIPTIVE = re.compile(r" [\(\[].*?[\)\]]")
+REPEATED_WORD = re.compile(r'\b(\w+) \1\b', flags=re.IGNORECASE)
+# Runs of two or more: rewriting every single space as itself is the slow part.
+SPACES = re.compile('  +')
+REPEATED_SYMBOL = re.compile(r'(\W)(?=\1)')
+URL = re.compile(r'http\S+')
+WORD_CHARACTER = re.compile(r'\w')
+
+
+def firstGroup(match: re.Match) -> str:
+    # Same as the r'\1' template, without expanding it for every match.
+    return match.group(1)
+
+
+def normalizeCaption(transcript: List[dict]) -> str:
+    """Join transcript lines into one caption without [descriptions], stutters or extra spaces."""
+    caption = "".join([" " + line['text'] for line in transcript])
+    caption = DESCRIPTIVE.sub("", caption)
+    caption = REPEATED_WORD.sub(firstGroup, caption)
+    caption = caption.replace("\n", " ").replace(u'\xa0', u' ')
+    caption = SPACES.sub(' ', caption)
+    return caption[1:]
+
+
+def normalizeDescription(text: str) -> str:
+    """Keep the leading prose of a description, dropping links, mentions and calls to action."""
+    if (text == ""):
+        return ""
+    sentences = REPEATED_SYMBOL.sub('', text).split('\n')
+    processed = []
+    for index, sentence in enumerate(sentences):
+        previous = sentences[index - 1]
+        if(WORD_CHARACTER.search(sentence) is None or not sentence[0].isalpha() or len(previous) == 0):
+            break
+        url_search = URL.search(sentence)
+        if (url_search is None and '@' not in sentence):
+            processed.append(sentence)
+        elif(len(processed) > 1 and (url_search is not None and (url_search.end() - url_search.start()) == len(sentence)) or previous[-1] in [':', '-']):
+            if processed:
+                processed.pop()
+    return " ".join(processed)
+
+
+def normalizeBatch(function, texts: Iterable, workers: int = None):
+    """Apply a normalizer to every text, on a process pool when the batch is large.
+
+    Args:
+        function (Callable): normalizeCaption or normalizeDescription
+        texts (Iterable): transcripts or descriptions; a Series keeps its index
+        workers (int, optional): pool processes, None or 1 to stay in process. Defaults to None.
+
+    Returns:
+        list or pd.Series: normalized texts in input order
+    """
+    index = texts.index if isinstance(texts, pd.Series) else None
+    texts = list(texts)
+    if workers is not None and workers > 1 and len(texts) >= PROCESS_POOL_MIN_ITEMS:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            normalized = list(executor.map(
+                function, texts, chunksize=PROCESS_POOL_CHUNKSIZE))
+    else:
+        normalized = [function(text) for text in texts]
+    return normalized if index is None else pd.Series(normalized, index=index, dtype=object)
+
+
+def normalizeCaptions(transcripts: Iterable, workers: int = None):
+    """normalizeCaption over a batch of transcripts, see normalizeBatch."""
+    return normalizeBatch(normalizeCaption, transcripts, workers)
+
+
+def normalizeDescriptions(descriptions: Iterable, workers: int = None):
+    """normalizeDescription over a batch of descriptions, see normalizeBatch."""
+    return normalizeBatch(normalizeDescription, descriptions, workers)
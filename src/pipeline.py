@@ -0,0 +1,242 @@
+import logging
+import os
+from concurrent.futures import as_completed
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+import src.feature as feature
+import src.ingestion as ingestion
+import src.process as process
+import src.similarity as similarity
+from src.checkpoint import RUN_TTL, RunCheckpoint
+from src.dedup import duplicateRepresentatives
+from src.process import ProgressCallback, noProgress
+from src.store import DatasetStore
+from src.tracing import logEvent
+from src.vector_index import getIndex
+
+SEED_WORKERS = 4
+
+
+def embedCaptions(videoCaptionDf: pd.DataFrame) -> pd.DataFrame:
+    """Replace the caption text in the 'embedding' column with its vector and index it.
+
+    Near-duplicate captions (reuploads, mirror channels) are grouped first and
+    only the first caption of each group is embedded; the rest get a copy of
+    its vector. The 'duplicateGroup' column holds the videoId of that caption.
+    """
+    from src.semantic_similarity_lite import embed
+    if len(videoCaptionDf) == 0:
+        return videoCaptionDf
+    representatives = duplicateRepresentatives(videoCaptionDf['embedding'])
+    isRepresentative = representatives == np.arange(len(representatives))
+    vectors = embed(videoCaptionDf['embedding'][isRepresentative])
+    vectorOf = dict(zip(np.flatnonzero(isRepresentative), vectors))
+    videoCaptionDf['duplicateGroup'] = np.asarray(
+        videoCaptionDf.index)[representatives]
+    videoCaptionDf['embedding'] = [vectorOf[representative]
+                                   for representative in representatives]
+    getIndex().add(videoCaptionDf.index,
+                   videoCaptionDf['embedding'].to_list())
+    return videoCaptionDf
+
+
+def scoreVideos(videoDfs: dict, channelDfs: dict, videoId: str, channelId: str, seedText: str = None) -> pd.DataFrame:
+    """Score every collected video against the seed caption.
+
+    Adds 'Similarity %', 'seedvideo' and 'seedchannel' to videoDfs['videoDf']
+    in place, and returns the summary frame shown in the app. A seed without
+    a caption is scored with its vector from an earlier run, or with an
+    embedding of seedText.
+
+    Args:
+        videoDfs (dict): frames from process.videoDetails_df, with embedded captions
+        channelDfs (dict): frames from process.processChannelIds
+        videoId (str): seed video
+        channelId (str): channel of the seed video
+        seedText (str, optional): seed title and description, embedded when the seed has no caption. Defaults to None.
+
+    Returns:
+        pd.DataFrame: Similarity %, title, counts, URL and channel columns, most similar first
+    """
+    videoDf = videoDfs['videoDf']
+    videoCaptionDf = videoDfs['videoCaptionDf']
+    if len(videoCaptionDf) == 0:
+        videoCaptionDf = pd.DataFrame(
+            columns=['embedding'], index=pd.Index([], name='videoId'))
+    seed = similarity.seedVector(videoCaptionDf, videoId, seedText)
+    if seed is not None and len(videoCaptionDf) != 0:
+        videoCaptionDf['Similarity %'] = similarity.similarityMatrix(
+            seed[None, :], videoCaptionDf['embedding'])[0].astype(np.float64)
+    else:
+        logEvent('similaritySkipped', logging.WARNING, videoId=videoId, captions=len(videoCaptionDf))
+        videoCaptionDf['Similarity %'] = np.nan
+
+    videoProcessedDf = videoDf.join(
+        videoCaptionDf, how='outer')
+    videoProcessedDf = videoProcessedDf[~videoProcessedDf.index.duplicated(
+    )]
+    videoProcessedDf['Video URL'] = "https://www.youtube.com/watch?v=" + \
+        videoProcessedDf.index
+    videoProcessedDf = videoProcessedDf.join(channelDfs['channelInfo'].set_index(
+        'channelId'), rsuffix='_channel', on='channelId')
+    videoProcessedDf = videoProcessedDf[[
+        'Similarity %', 'title', 'viewCount', 'likeCount', 'commentCount', 'Video URL', 'Channel Name', 'Creation Date', 'Subscribers']]
+    videoProcessedDf.rename(
+        columns={"title": "Title", "viewCount": "Views", "likeCount": "Likes", "commentCount": "Comments"}, inplace=True)
+    videoProcessedDf.sort_values(
+        by=['Similarity %'], ascending=False, inplace=True)
+    cols = ['Views', "Likes", "Comments"]
+    videoProcessedDf[cols] = videoProcessedDf[cols].apply(
+        pd.to_numeric, downcast="integer", errors='coerce')
+    videoDf = videoDf.join(
+        videoProcessedDf, how='left', on='videoId')
+    videoDf.drop(['Title', 'Views', 'Likes', 'Channel Name', 'Creation Date', 'Subscribers',
+                  'Comments'], axis=1, inplace=True)
+    videoDf = videoDf[~videoDf.index.duplicated()]
+    videoDf.sort_values(
+        by=['Similarity %'], ascending=False, inplace=True)
+    videoDf['seedvideo'] = videoDf.index == videoId
+    videoDf['seedchannel'] = videoDf.channelId == channelId
+    videoDfs['videoDf'] = videoDf
+    videoProcessedDf['Similarity %'] = (
+        videoProcessedDf['Similarity %']*100).round(1)
+    return videoProcessedDf
+
+
+def seedDetails(seedId: str) -> dict:
+    """Return title, description and channelId of a seed video (1 quota unit, cached)."""
+    items = ingestion.getVideoDetail([seedId])['items']
+    if len(items) == 0:
+        raise ValueError('Video %s not found' % seedId)
+    snippet = items[0]['snippet']
+    return {'title': snippet['title'],
+            'description': snippet.get('description', ""),
+            'channelId': snippet['channelId']}
+
+
+def collectSeed(seedId: str, keywords: str = None, order: str = 'relevance', caption: str = 'Exclude', pages: int = 2, relatedPages: int = 0, progress: ProgressCallback = noProgress, checkpoint: RunCheckpoint = None) -> dict:
+    """Run seed → query → details → transcripts → channels → embeddings → similarity.
+
+    Args:
+        seedId (str): seed video id
+        keywords (str, optional): search query; the top extracted keyphrase of the seed when None. Defaults to None.
+        order (str, optional): search ordering, see ingestion.queryKeyword. Defaults to 'relevance'.
+        caption (str, optional): 'Include' or 'Exclude' non-caption videos. Defaults to 'Exclude'.
+        pages (int, optional): keyword search pages of 50 videos. Defaults to 2.
+        relatedPages (int, optional): related-video search pages of 50 videos. Defaults to 0.
+        progress (ProgressCallback, optional): called after each chunk of each stage. Defaults to noProgress.
+        checkpoint (RunCheckpoint, optional): resume an interrupted run, reusing its searches and
+        finished chunks. Defaults to a checkpoint under ./runs keyed on the arguments, finished
+        (removed) once the seed is collected.
+
+    Returns:
+        dict: 'keywords', 'videoDfs', 'channelDfs' and 'videoProcessedDf'
+    """
+    seed = seedDetails(seedId)
+    if keywords is None:
+        keywords = feature.extractKeywords(
+            seed['title'] + ". " + process.process_description(seed['description']))[0]
+    ownCheckpoint = checkpoint is None
+    if ownCheckpoint:
+        checkpoint = RunCheckpoint.forRun(
+            seedId, keywords, order, caption, pages, relatedPages)
+    progress(1, 1, 'seed')
+
+    # Searches cost 100 units a page, so their results are checkpointed too.
+    videoIds = checkpoint.memo('query', lambda: ingestion.queryKeyword(
+        keywords, seedId, order.lower(), caption, pageLimit=pages))
+    if relatedPages:
+        videoIds = list(dict.fromkeys(videoIds + checkpoint.memo(
+            'related', lambda: ingestion.getRelatedVideoIds(seedId, pageLimit=relatedPages))))
+    progress(1, 1, 'query')
+
+    videoLists = process.processVideoIds(
+        videoIds, progress=progress, checkpoint=checkpoint)
+    videoDfs = process.videoDetails_df(*videoLists)
+    channelDfs = process.processChannelIds(
+        videoDfs['videoDf']['channelId'].unique(), progress=progress, checkpoint=checkpoint)
+
+    embedCaptions(videoDfs['videoCaptionDf'])
+    progress(1, 1, 'embeddings')
+    videoProcessedDf = scoreVideos(
+        videoDfs, channelDfs, seedId, seed['channelId'],
+        seed['title'] + ". " + process.process_description(seed['description']))
+    progress(1, 1, 'similarity')
+    if ownCheckpoint:
+        checkpoint.finish()
+    return {'keywords': keywords,
+            'videoDfs': videoDfs,
+            'channelDfs': channelDfs,
+            'videoProcessedDf': videoProcessedDf}
+
+
+def resultFrames(result: dict) -> dict:
+    """Every frame of a collectSeed result by name."""
+    frames = {'similarity': result['videoProcessedDf']}
+    frames.update(result['videoDfs'])
+    frames.update(result['channelDfs'])
+    return frames
+
+
+def writeResult(result: dict, seedDir: str):
+    """Write every frame of a collectSeed result as CSV under seedDir."""
+    os.makedirs(seedDir, exist_ok=True)
+    for name, df in resultFrames(result).items():
+        if len(df) != 0:
+            df.to_csv(os.path.join(seedDir, name + '.csv'))
+
+
+def runSeeds(seeds: List[str], outDir: str, workers: int = SEED_WORKERS, progress: ProgressCallback = noProgress, store: DatasetStore = None, fresh: bool = False, maxAge: float = RUN_TTL, **options) -> dict:
+    """Collect many seeds in parallel, writing each result under outDir/<seedId>/.
+
+    A failing seed (quota, missing video, ...) is reported and does not stop
+    the others. Each seed checkpoints into outDir/<seedId>/checkpoint, so
+    rerunning the same command within maxAge resumes unfinished seeds and
+    skips finished ones; older checkpoints are discarded and collected again.
+
+    Args:
+        seeds (List[str]): seed video ids
+        outDir (str): output directory
+        workers (int, optional): seeds processed concurrently. Defaults to SEED_WORKERS.
+        progress (ProgressCallback, optional): receives per-seed stages as '<seedId> <stage>' and overall 'seeds' progress. Defaults to noProgress.
+        store (DatasetStore, optional): also write every result to this Parquet store. Defaults to None.
+        fresh (bool, optional): discard earlier checkpoints and collect every seed again. Defaults to False.
+        maxAge (float, optional): seconds a seed's checkpoint is kept. Defaults to RUN_TTL.
+        **options: passed on to collectSeed
+
+    Returns:
+        dict: seedId -> 'ok', 'done earlier' or the error message
+    """
+    seeds = list(dict.fromkeys(seeds))
+    statuses = {}
+
+    def runSeed(seedId):
+        seedDir = os.path.join(outDir, seedId)
+        checkpoint = RunCheckpoint(os.path.join(seedDir, 'checkpoint'))
+        if fresh or checkpoint.age() > maxAge:
+            checkpoint.clear()
+            checkpoint = RunCheckpoint(os.path.join(seedDir, 'checkpoint'))
+        if checkpoint.chunks('done'):
+            return 'done earlier'
+        result = collectSeed(seedId, progress=lambda done, total, stage: progress(
+            done, total, '%s %s' % (seedId, stage)), checkpoint=checkpoint, **options)
+        writeResult(result, seedDir)
+        if store is not None:
+            store.write(resultFrames(result), seedId)
+        checkpoint.save('done', {'ids': [seedId]})
+        return 'ok'
+
+    with ingestion.workerPool(workers) as executor:
+        futures = {executor.submit(runSeed, seedId): seedId for seedId in seeds}
+        for count, future in enumerate(as_completed(futures)):
+            seedId = futures[future]
+            try:
+                statuses[seedId] = future.result()
+            except Exception as e:
+                statuses[seedId] = str(e)
+                logEvent('seedFailed', logging.WARNING, seedId=seedId, error=str(e))
+            progress(count + 1, len(seeds), 'seeds')
+    return statuses
@@ -1,12 +1,38 @@
+import logging
+import queue
 import re
+import threading
+import time
+from concurrent.futures import TimeoutError as FutureTimeoutError
 from datetime import datetime
-from typing import List
+from typing import Callable, List
 
 import pandas as pd
-from youtube_transcript_api import YouTubeTranscriptApi
-import streamlit as st
+from youtube_transcript_api import (CouldNotRetrieveTranscript,
+                                    TooManyRequests, YouTubeTranscriptApi)
+
+from src.channel_registry import ChannelRegistry
+from src.checkpoint import RunCheckpoint
+from src.ingestion import (getChannelDetail, getVideoDetail, isQuotaError,
+                           iterCommentPages, workerPool)
+from src.normalize import normalizeCaption, normalizeDescription, normalizeDescriptions
+from src.tracing import logEvent, traced
+
+TRANSCRIPT_WORKERS = 8
+TRANSCRIPT_TIMEOUT = 60
+TRANSCRIPT_RETRIES = 2
+COMMENT_WORKERS = 4
+
+channelRegistry = ChannelRegistry()
+
+# progress(done, total, stage) is called after each chunk of a stage, so
+# the same stages can drive a Streamlit progress bar or a console log.
+ProgressCallback = Callable[[int, int, str], None]
+
+
+def noProgress(done: int, total: int, stage: str):
+    pass
 
-from src.ingestion import getChannelDetail, getVideoDetail, getCommentDetail
 
 def searchChunking(ids: List, size: int = 50):
     resultsChunks = [ids[i:i + size]
@@ -17,23 +43,7 @@ def searchChunking(ids: List, size: int = 50):
 
 
 def process_description(text):
-    if (text == ""):
-        return ""
-    sentences = re.sub(r'(\W)(?=\1)', '', text).split('\n')
-    processed = []
-    for index, sentence in enumerate(sentences):
-        url_search = re.search(r'http\S+', sentence)
-        at_search = re.search(r'@', sentence)
-        if(re.subn(r'\W', '', sentence)[1] == len(sentence) or not sentence[0].isalpha() or len(sentences[index-1]) == 0):
-            break
-        elif (url_search is None and at_search is None):
-            processed.append(sentence)
-        elif(len(processed) > 1 and (url_search is not None and len(url_search.span()) > 1 and (url_search.span()[1] - url_search.span()[0]) == len(sentence)) or sentences[index - 1][-1] in [':', '-']):
-            try:
-                processed.pop()
-            except:
-                print(processed)
-    return " ".join(processed)
+    return normalizeDescription(text)
 
 
 def durationSec(durationLs):
@@ -60,117 +70,251 @@ def extract_hashtags(text):
 
 
 def process_captions(transcriptdict):
-    preprocess_captions = ""
-    for line in transcriptdict:
-        preprocess_captions += " " + line['text']
-    removed_descriptive = re.sub(
-        " [\(\[].*?[\)\]]", "", preprocess_captions)
-    output = re.sub(r'\b(\w+) \1\b', r'\1',
-                    removed_descriptive, flags=re.IGNORECASE)
-    output = output.replace("\n", " ").replace(u'\xa0', u' ')
-    output = re.sub(' +', ' ', output)
-    return output[1:]
+    return normalizeCaption(transcriptdict)
 
 # @st.experimental_singleton
-def getLink(text: str):
-    raw_urls = re.findall(r'href=[\'"]?([^\'" >]+)', text)
-    return raw_urls
-
-def cleanLink(url: str):
-    hashtag = url.replace('http://www.youtube.com/results?search_query=%23','')
-    cleaned_url = None
-    if(len(hashtag)==len(url)):
-        cleaned_url = url.replace('https://www.youtube.com/watch?v=', 'https://youtu.be/').split('&',1)[0].split('?',1)[0]
-        hashtag = None
- 
-    return pd.Series([cleaned_url, hashtag])
-
-def processVideoIds(videoIds: List):
-    videoList, videoLocList, videoHashtagsList, videoCaptionList, videoTopicsList, videoTagsList = [], [], [], [], [], []
-    processBar = st.progress(0)
+LINK_PATTERN = r'''href=['"]?(?P<rawLink>[^'" >]+)'''
+HASHTAG_SEARCH_URL = 'http://www.youtube.com/results?search_query=%23'
+WATCH_URL = 'https://www.youtube.com/watch?v='
+SHORT_URL = 'https://youtu.be/'
+COMMENT_TIMEZONE = 'Singapore'
+
+
+def extractLinks(comments: pd.DataFrame) -> pd.DataFrame:
+    """Return commentId and rawLink of every href in textDisplay, indexed like comments."""
+    rawLink = comments['textDisplay'].str.extractall(LINK_PATTERN)['rawLink']
+    index = rawLink.index.droplevel('match')
+    return pd.DataFrame({'commentId': comments['commentId'].reindex(index).to_numpy(),
+                         'rawLink': rawLink.to_numpy()}, index=index)
+
+
+def cleanLinks(rawLink: pd.Series) -> pd.DataFrame:
+    """Split links into cleanLink (watch URLs shortened, query dropped) and hashtag (hashtag searches)."""
+    isHashtag = rawLink.str.contains(HASHTAG_SEARCH_URL, regex=False)
+    hashtag = rawLink.str.replace(HASHTAG_SEARCH_URL, '', regex=False)
+    # Everything from the first '&' or '?' is dropped.
+    cleanLink = rawLink.str.replace(WATCH_URL, SHORT_URL, regex=False).str.replace(
+        r'(?s)[&?].*', '', regex=True)
+    return pd.DataFrame({'cleanLink': cleanLink.where(~isHashtag),
+                         'hashtag': hashtag.where(isHashtag)}, index=rawLink.index)
+
+
+def toLocalTime(values: pd.Series) -> pd.Series:
+    """Parse API timestamps as UTC and return them as naive COMMENT_TIMEZONE times."""
+    return pd.to_datetime(values, utc=True).dt.tz_convert(COMMENT_TIMEZONE).dt.tz_localize(None)
+
+
+def captionBytes(row: dict) -> int:
+    """UTF-8 size of the caption and translation of a fetchCaption row."""
+    if row is None:
+        return 0
+    return sum(len(text.encode('utf-8')) for text in (row['caption'], row['translatedCaption']) if text)
+
+
+@traced('transcript.fetchCaption', items=lambda row: int(row is not None), bytes=captionBytes)
+def fetchCaption(videoId: str, retries: int = TRANSCRIPT_RETRIES, cancelled: threading.Event = None):
+    """Fetch and process the first transcript of a video, translated to English if needed.
+
+    Args:
+        videoId (str): video to fetch the transcript of
+        retries (int, optional): retries on network errors or rate limiting. Defaults to TRANSCRIPT_RETRIES.
+        cancelled (threading.Event, optional): once set, no further attempt is made. Defaults to None.
+
+    Returns:
+        dict: caption row for videoCaptionList, or None when the video has no usable transcript
+    """
+    for attempt in range(retries + 1):
+        if cancelled is not None and cancelled.is_set():
+            return None
+        try:
+            transcript = next(iter(YouTubeTranscriptApi.list_transcripts(videoId)), None)
+            if transcript is None:
+                return None
+            caption = process_captions(transcript.fetch())
+            translatedCaption = None
+            embedding = caption
+            if 'English' not in transcript.language:
+                translatedCaption = process_captions(
+                    transcript.translate('en').fetch())
+                embedding = translatedCaption
+            return {'videoId': videoId,
+                    'caption': caption,
+                    'lang': transcript.language,
+                    'translatedCaption': translatedCaption,
+                    'embedding': embedding}
+        except CouldNotRetrieveTranscript as e:
+            if not isinstance(e, TooManyRequests) or attempt == retries:
+                return None
+        except Exception:
+            if attempt == retries:
+                return None
+        time.sleep(2 ** attempt)
+
+
+def gatherCaptions(videoIds: List, futures: List, timeout: float = TRANSCRIPT_TIMEOUT, cancelled: threading.Event = None) -> list:
+    """Collect fetchCaption futures in submission order, dropping failed or timed-out videos.
+
+    All futures share one deadline, timeout seconds from now. Fetches still
+    queued then are cancelled; a request already running cannot be
+    interrupted, but setting cancelled stops it from retrying, so it frees
+    its worker once the request returns.
+
+    Args:
+        videoIds (List): video of each future
+        futures (List): fetchCaption futures
+        timeout (float, optional): seconds to wait for all of them together. Defaults to TRANSCRIPT_TIMEOUT.
+        cancelled (threading.Event, optional): event the fetches were submitted with. Defaults to None.
+
+    Returns:
+        list: caption rows in videoIds order, skipping videos without a transcript
+    """
+    deadline = time.monotonic() + timeout
+    videoCaptionList = []
+    timedOut = []
+    for videoId, future in zip(videoIds, futures):
+        try:
+            videoCaptionDict = future.result(timeout=max(deadline - time.monotonic(), 0))
+        except FutureTimeoutError:
+            timedOut.append(videoId)
+            future.cancel()
+            continue
+        if videoCaptionDict is not None:
+            videoCaptionList.append(videoCaptionDict)
+    if timedOut:
+        if cancelled is not None:
+            cancelled.set()
+        logEvent('transcriptTimeout', logging.WARNING, videoIds=timedOut, timeout=timeout)
+    return videoCaptionList
+
+
+def videoRecords(item: dict) -> dict:
+    """Parse one videos().list item into its video, location, hashtag, topic and tag rows."""
+    contentDetails = item['contentDetails']
+    snippet = item['snippet']
+    statistics = item.get('statistics') or {}
+    topicDetails = item.get('topicDetails')
+    recordingDetails = item.get('recordingDetails') or {}
+    recordingDate = recordingDetails.get('recordingDate')
+    hashtags = extract_hashtags(snippet.get('description', ""))
+    tags = snippet.get('tags', [])
+    records = {'video': [], 'loc': [], 'hashtags': [], 'topics': [], 'tags': []}
+    videoDict = {'videoId': item['id'],
+                 'publishedAt': (snippet['publishedAt']),
+                 'recordingDate': recordingDate,
+                 'collectDateTime': datetime.now(),
+                 'title': snippet['title'],
+                 'description': snippet.get('description'),
+                 # Filled in for the whole chunk by processVideoIds.
+                 'processedDescription': None,
+                 'duration': durationSec(re.findall(r'\d+', contentDetails['duration'])),
+                 'defaultAudioLanguage': snippet.get('defaultAudioLanguage'),
+                 'commentCount': statistics.get('commentCount'),
+                 'favoriteCount': statistics.get('favoriteCount'),
+                 'likeCount': statistics.get('likeCount'),
+                 'viewCount': statistics.get('viewCount'),
+                 'channelId': snippet['channelId']}
+    records['video'].append(videoDict)
+
+    if topicDetails:
+        for topic in topicDetails.get('topicCategories', []):
+            topicDict = {'videoId': item['id'],
+                         'topics': topic.split('/')[-1]}
+            records['topics'].append(topicDict)
+
+    if (recordingDetails.get('locationDescription') is not None):
+        videoLocDict = {'videoId': item['id'],
+                        'locationDescription': recordingDetails.get('locationDescription')}
+        records['loc'].append(videoLocDict)
+
+    if (len(tags) != 0):
+        for tag in tags:
+            videotagsDict = {'videoId': item['id'],
+                             'tag': tag}
+            records['tags'].append(videotagsDict)
+
+    if (len(hashtags) != 0):
+        for hashtag in hashtags:
+            videoHashtagsDict = {'videoId': item['id'],
+                                 'hashtags': hashtag}
+            records['hashtags'].append(videoHashtagsDict)
+    return records
+
+
+@traced('process.processVideoIds', items=lambda lists: len(lists[0]))
+def processVideoIds(videoIds: List, transcriptWorkers: int = TRANSCRIPT_WORKERS, transcriptTimeout: float = TRANSCRIPT_TIMEOUT, progress: ProgressCallback = noProgress, checkpoint: RunCheckpoint = None):
+    """Collect details and captions of videos, 50 ids per videos().list call.
+
+    Args:
+        videoIds (List): videos to collect
+        transcriptWorkers (int, optional): concurrent transcript requests. Defaults to TRANSCRIPT_WORKERS.
+        transcriptTimeout (float, optional): seconds to wait for the transcripts of a chunk of videos. Defaults to TRANSCRIPT_TIMEOUT.
+        progress (ProgressCallback, optional): called after each chunk. Defaults to noProgress.
+        checkpoint (RunCheckpoint, optional): saves every finished chunk and skips ids saved by an
+        earlier, interrupted run. Defaults to None.
+
+    Returns:
+        tuple: videoList, videoLocList, videoHashtagsList, videoCaptionList, videoTopicsList, videoTagsList
+    """
+    keys = ['video', 'loc', 'hashtags', 'captions', 'topics', 'tags']
+    results = {key: [] for key in keys}
+    if checkpoint is not None:
+        # Only chunks of the requested ids are reused: several calls (query
+        # and related videos) may share one run checkpoint.
+        requested = set(videoIds)
+        for saved in checkpoint.chunks('videos'):
+            if requested.issuperset(saved['ids']):
+                requested.difference_update(saved['ids'])
+                for key in keys:
+                    results[key].extend(saved[key])
+        videoIds = [videoId for videoId in videoIds if videoId in requested]
+
+    def finishChunk(chunk, chunkResults, captionIds, captionFutures, cancelled):
+        chunkResults['captions'] = gatherCaptions(
+            captionIds, captionFutures, transcriptTimeout, cancelled)
+        for key in keys:
+            results[key].extend(chunkResults[key])
+        if checkpoint is not None:
+            checkpoint.save('videos', dict(chunkResults, ids=chunk))
+
+    # Transcripts of a chunk are fetched on a thread pool while the next
+    # chunk's details are requested; a chunk is complete (and checkpointed)
+    # once its transcripts are in.
+    transcriptPool = workerPool(transcriptWorkers)
+    pending = None
     chunkList = searchChunking(videoIds)
     chunkLength = len(chunkList)
-    for count, chunk in enumerate(chunkList):
-        print("Processing videos %i / %i" %
-              (count + 1, chunkLength))
-        processBar.progress((count+1)/chunkLength)
-        videoIds_chunk = ",".join(chunk)
-        response = getVideoDetail(videoIds_chunk)
-
-        for item in response['items']:
-            contentDetails = item['contentDetails']
-            snippet = item['snippet']
-            statistics = item.get('statistics')
-            topicDetails = item.get('topicDetails')
-            recordingDetails = item.get('recordingDetails')
-            recordingDate = recordingDetails.get('recordingDate')
-            hashtags = extract_hashtags(snippet.get('description'))
-            tags = snippet.get('tags', [])
-            videoDict = {'videoId': item['id'],
-                         'publishedAt': (snippet['publishedAt']),
-                         'recordingDate': recordingDate,
-                         'collectDateTime': datetime.now(),
-                         'title': snippet['title'],
-                         'description': snippet.get('description'),
-                         'processedDescription': process_description(snippet.get('description', "")),
-                         'duration': durationSec(re.findall(r'\d+', contentDetails['duration'])),
-                         'defaultAudioLanguage': snippet.get('defaultAudioLanguage'),
-                         'commentCount': statistics.get('commentCount'),
-                         'favoriteCount': statistics['favoriteCount'],
-                         'likeCount': statistics.get('likeCount'),
-                         'viewCount': statistics.get('viewCount'),
-                         'channelId': snippet['channelId']}
-            videoList.append(videoDict)
-
-            if topicDetails:
-                for topic in topicDetails['topicCategories']:
-                    topicDict = {'videoId': item['id'],
-                                 'topics': topic.split('/')[-1]}
-                    videoTopicsList.append(topicDict)
-
-            if (recordingDetails.get('locationDescription') is not None):
-                videoLocDict = {'videoId': item['id'],
-                                'locationDescription': recordingDetails.get('locationDescription')}
-                videoLocList.append(videoLocDict)
-
-            if (len(tags) != 0):
-                for tag in tags:
-                    videotagsDict = {'videoId': item['id'],
-                                     'tag': tag}
-                    videoTagsList.append(videotagsDict)
-
-            if (len(hashtags) != 0):
-                for hashtag in hashtags:
-                    videoHashtagsDict = {'videoId': item['id'],
-                                         'hashtags': hashtag}
-                    videoHashtagsList.append(videoHashtagsDict)
-
-            try:
-                transcript_list = YouTubeTranscriptApi.list_transcripts(
-                    item['id'])
-                # iterate over all available transcripts
-                for index, transcript in enumerate(transcript_list):
-                    if(index == 0):
-                        caption = process_captions(transcript.fetch())
-                        lang = transcript.language
-                        translatedCaption = None
-                        embedding = caption
-                    if(index == 0 and 'English' not in transcript.language):
-                        translatedCaption = process_captions(
-                            transcript.translate('en').fetch())
-                        embedding = translatedCaption
-                videoCaptionDict = {'videoId': item['id'],
-                                    'caption': caption,
-                                    'lang': lang,
-                                    'translatedCaption': translatedCaption,
-                                    'embedding': embedding}
-                videoCaptionList.append(videoCaptionDict)
-            except:
-                next
-    processBar.empty()
-    return videoList, videoLocList, videoHashtagsList, videoCaptionList, videoTopicsList, videoTagsList
-
-
+    try:
+        for count, chunk in enumerate(chunkList):
+            logEvent('progress', stage='videos', done=count + 1, total=chunkLength)
+            progress(count + 1, chunkLength, 'videos')
+            videoIds_chunk = ",".join(chunk)
+            response = getVideoDetail(videoIds_chunk)
+
+            chunkResults = {key: [] for key in keys}
+            captionIds, captionFutures = [], []
+            cancelled = threading.Event()
+            for item in response['items']:
+                for key, rows in videoRecords(item).items():
+                    chunkResults[key].extend(rows)
+                captionIds.append(item['id'])
+                captionFutures.append(transcriptPool.submit(
+                    fetchCaption, item['id'], cancelled=cancelled))
+            processedDescriptions = normalizeDescriptions(
+                [video['description'] or "" for video in chunkResults['video']])
+            for video, processedDescription in zip(chunkResults['video'], processedDescriptions):
+                video['processedDescription'] = processedDescription
+            if pending is not None:
+                finishChunk(*pending)
+            pending = (chunk, chunkResults, captionIds, captionFutures, cancelled)
+        if pending is not None:
+            finishChunk(*pending)
+    finally:
+        # Do not block on a hung request, its result is already discarded.
+        transcriptPool.shutdown(wait=False, cancel_futures=True)
+    return tuple(results[key] for key in keys)
+
+
+@traced('process.videoDetails_df', items=lambda dfs: len(dfs['videoDf']))
 def videoDetails_df(videoList, videoLocList, videoHashtagsList, videoCaptionList, videoTopicsList, videoTagsList):
     allDf = {}
     videoDf = pd.DataFrame(videoList)
@@ -208,96 +352,244 @@ def videoDetails_df(videoList, videoLocList, videoHashtagsList, videoCaptionList
     return allDf
 
 
-def processChannelIds(channelIds: List):
-    channelsList, channelTopicsList, localizationsList = [], [], []
-    processBar = st.progress(0)
-    chunkList = searchChunking(channelIds)
+CHANNEL_COLUMNS = ['channelId', 'Channel Name', 'description', 'Creation Date', 'defaultLanguage',
+                   'country', 'viewCount', 'Subscribers', 'videoCount', 'trackingAccountId']
+
+
+def channelRecord(item: dict) -> dict:
+    """Parse one channels().list item into its channel, topic and locale rows."""
+    snippet = item['snippet']
+    statistics = item.get('statistics', {})
+    topicDetails = item.get('topicDetails')
+    localizations = item.get('localizations')
+    brandSettings = item.get('brandingSettings',{})
+
+    channelDict = {'channelId': item['id'],
+                   'Channel Name': snippet.get('title'),
+                   'description': snippet.get('description'),
+                   'Creation Date': snippet.get('publishedAt'),
+                   'defaultLanguage': snippet.get('defaultLanguage'),
+                   'country': brandSettings.get('channel',{}).get('country'),
+                   'viewCount': statistics.get('viewCount'),
+                   'Subscribers': statistics.get('subscriberCount'),
+                   'videoCount': statistics.get('videoCount'),
+                   'trackingAccountId': brandSettings.get('channel',{}).get('trackingAnalyticsAccountId'),
+                   }
+    channelTopicsList, localizationsList = [], []
+    if topicDetails:
+        for topic in topicDetails.get('topicCategories', []):
+            topicDict = {'channelId': item['id'],
+                         'topics': topic.split('/')[-1]}
+            channelTopicsList.append(topicDict)
+    if localizations:
+        for key in localizations.keys():
+            localeDict = {'channelId': item['id'],
+                          'locale': key,
+                          'title': localizations[key].get('title'),
+                          'description': localizations[key].get('description')}
+            localizationsList.append(localeDict)
+    return {'channel': channelDict, 'topics': channelTopicsList, 'locales': localizationsList}
+
+
+@traced('process.processChannelIds', items=lambda dfs: len(dfs['channelInfo']))
+def processChannelIds(channelIds: List, maxAge: float = None, progress: ProgressCallback = noProgress, checkpoint: RunCheckpoint = None):
+    """Return channel frames, fetching only channels missing from the registry.
+
+    Args:
+        channelIds (List): channel ids, duplicates and empty ids are ignored
+        maxAge (float, optional): override the registry TTL in seconds, 0 refetches everything. Defaults to None.
+        progress (ProgressCallback, optional): called after each fetched chunk. Defaults to noProgress.
+        checkpoint (RunCheckpoint, optional): saves every fetched chunk and reuses the chunks of an
+        earlier, interrupted run. Defaults to None.
+
+    Returns:
+        dict: 'channelInfo' and, when present, 'channelTopics' and 'channelLocale' frames
+    """
+    channelIds = list(dict.fromkeys(
+        channelId for channelId in channelIds if channelId))
+    records = channelRegistry.lookup(channelIds, maxAge)
+    if checkpoint is not None:
+        for saved in checkpoint.chunks('channels'):
+            records.update(saved['records'])
+    chunkList = searchChunking(
+        [channelId for channelId in channelIds if channelId not in records])
     chunkLength = len(chunkList)
     for count, chunk in enumerate(chunkList):
-        print("Processing channels info %i / %i" %
-              (count + 1, chunkLength))
-        processBar.progress((count+1)/chunkLength)
+        logEvent('progress', stage='channels', done=count + 1, total=chunkLength)
+        progress(count + 1, chunkLength, 'channels')
         channelIds_chunk = ",".join(chunk)
-        response = getChannelDetail(channelIds_chunk)
-        for item in response['items']:
-            snippet = item['snippet']
-            statistics = item.get('statistics')
-            topicDetails = item.get('topicDetails')
-            localizations = item.get('localizations')
-            brandSettings = item.get('brandingSettings',{})
-
-            channelDict = {'channelId': item['id'],
-                           'Channel Name': snippet.get('title'),
-                           'description': snippet.get('description'),
-                           'Creation Date': snippet.get('publishedAt'),
-                           'defaultLanguage': snippet.get('defaultLanguage'),
-                           'country': brandSettings.get('channel',{}).get('country'),
-                           'viewCount': statistics.get('viewCount'),
-                           'Subscribers': statistics.get('subscriberCount'),
-                           'videoCount': statistics.get('videoCount'),
-                           'trackingAccountId': brandSettings.get('channel',{}).get('trackingAnalyticsAccountId'),
-                           }
-
-            channelsList.append(channelDict)
-            if topicDetails:
-                for topic in topicDetails['topicCategories']:
-                    topicDict = {'channelId': item['id'],
-                                 'topics': topic.split('/')[-1]}
-                    channelTopicsList.append(topicDict)
-            if localizations:
-                for key in localizations.keys():
-                    localeDict = {'channelId': item['id'],
-                                  'locale': key,
-                                  'title': localizations[key].get('title'),
-                                  'description': localizations[key].get('description')}
-                    localizationsList.append(localeDict)
-
-        channelDfDict = {'channelInfo': pd.DataFrame(channelsList)}
-        if(channelTopicsList != []):
-            channelDfDict.update(
-                {'channelTopics': pd.DataFrame(channelTopicsList)})
-        if(localizationsList != []):
-            channelDfDict.update(
-                {'channelLocale': pd.DataFrame(localizationsList)})
+        response = getChannelDetail(channelIds_chunk, maxAge=maxAge)
+        fetched = {item['id']: channelRecord(item)
+                   for item in response['items']}
+        channelRegistry.store(fetched)
+        records.update(fetched)
+        if checkpoint is not None:
+            checkpoint.save('channels', {'ids': chunk, 'records': fetched})
+
+    channelsList, channelTopicsList, localizationsList = [], [], []
+    for channelId in channelIds:
+        if channelId in records:
+            channelsList.append(records[channelId]['channel'])
+            channelTopicsList.extend(records[channelId]['topics'])
+            localizationsList.extend(records[channelId]['locales'])
+    channelDfDict = {'channelInfo': pd.DataFrame(
+        channelsList, columns=CHANNEL_COLUMNS)}
+    if(channelTopicsList != []):
+        channelDfDict.update(
+            {'channelTopics': pd.DataFrame(channelTopicsList)})
+    if(localizationsList != []):
+        channelDfDict.update(
+            {'channelLocale': pd.DataFrame(localizationsList)})
     return channelDfDict
 
-def processVideosComments(videoIds: list):
-    commentsResponses = []
-    for videoId in videoIds:
-        commentsResponses += getCommentDetail(videoId)
-    return processComments(commentsResponses)
 
-def processComments(commentsResponses):
-    resultsDfs = {}
-    commentsList = [{'commentId': comment.get('id'),
-                    'videoId': comment['snippet']['videoId'],
-                     'textDisplay': comment['snippet']['topLevelComment']['snippet']['textDisplay'],
-                     'textOriginal': comment['snippet']['topLevelComment']['snippet']['textOriginal'],
-                     'authorDisplayName': comment['snippet']['topLevelComment']['snippet']['authorDisplayName'],
-                     'authorChannelId': comment['snippet']['topLevelComment']['snippet']['authorChannelId']['value'],
-                     'likeCount': comment['snippet']['topLevelComment']['snippet'].get('likeCount'),
-                     'publishedAt': comment['snippet']['topLevelComment']['snippet'].get('publishedAt'),
-                     'updatedAt': comment['snippet']['topLevelComment']['snippet'].get('updatedAt')} for comment in commentsResponses]
+def iterVideosComments(videoIds: list, maxComments: int = None, maxPages: int = None, maxWorkers: int = COMMENT_WORKERS, checkpoint: RunCheckpoint = None):
+    """Page through the comments of many videos on a bounded worker pool.
+
+    Pages are yielded as soon as any worker receives them; a small queue
+    keeps workers from running far ahead of the consumer. A video whose
+    comments cannot be read (e.g. comments disabled) is skipped, but running
+    out of quota (QuotaExceededError or an API quota 403) is raised to the
+    consumer.
+
+    Args:
+        videoIds (list): videos to collect comments from
+        maxComments (int, optional): comment threads per video. Defaults to None (all).
+        maxPages (int, optional): pages per video. Defaults to None (all).
+        maxWorkers (int, optional): videos paged concurrently. Defaults to COMMENT_WORKERS.
+        checkpoint (RunCheckpoint, optional): saves every page; videos completed by an earlier,
+        interrupted run are replayed from it instead of being fetched. Defaults to None.
+
+    Yields:
+        list: comment thread items of one page
+    """
+    pages = queue.Queue(maxsize=maxWorkers * 2)
+    stop = threading.Event()
+    videoDone = object()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                pages.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+
+    def pageVideo(videoId):
+        try:
+            for pageNumber, page in enumerate(iterCommentPages(videoId, maxComments, maxPages)):
+                if stop.is_set():
+                    return
+                if checkpoint is not None:
+                    checkpoint.save('comments', {'videoId': videoId, 'page': page},
+                                    name='%s-%06d' % (videoId, pageNumber))
+                put(page)
+            if checkpoint is not None:
+                checkpoint.save('commentsDone', {'ids': [videoId]})
+        except Exception as e:
+            if isQuotaError(e):
+                put(e)
+            else:
+                logEvent('commentsUnavailable', logging.WARNING, videoId=videoId, error=repr(e))
+        finally:
+            put(videoDone)
+
+    if checkpoint is not None:
+        doneIds = checkpoint.doneIds('commentsDone')
+        for saved in checkpoint.chunks('comments'):
+            if saved['videoId'] in doneIds:
+                yield saved['page']
+        videoIds = [videoId for videoId in videoIds if videoId not in doneIds]
+
+    executor = workerPool(maxWorkers)
+    for videoId in videoIds:
+        executor.submit(pageVideo, videoId)
+    remaining = len(videoIds)
+    try:
+        while remaining:
+            item = pages.get()
+            if item is videoDone:
+                remaining -= 1
+            elif isinstance(item, Exception):
+                raise item
+            else:
+                yield item
+    finally:
+        stop.set()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def processVideosComments(videoIds: list, maxComments: int = None, maxPages: int = None, progress: ProgressCallback = noProgress, checkpoint: RunCheckpoint = None):
+    return processComments(iterVideosComments(videoIds, maxComments, maxPages, checkpoint=checkpoint), progress, checkpoint)
+
+
+def commentRows(page: list) -> list:
+    rows = []
+    for comment in page:
+        snippet = comment['snippet']
+        topSnippet = snippet['topLevelComment']['snippet']
+        rows.append({'commentId': comment.get('id'),
+                     'videoId': snippet['videoId'],
+                     'textDisplay': topSnippet['textDisplay'],
+                     'textOriginal': topSnippet['textOriginal'],
+                     'authorDisplayName': topSnippet['authorDisplayName'],
+                     'authorChannelId': topSnippet['authorChannelId']['value'],
+                     'likeCount': topSnippet.get('likeCount'),
+                     'publishedAt': topSnippet.get('publishedAt'),
+                     'updatedAt': topSnippet.get('updatedAt')})
+    return rows
+
+
+@traced('process.processComments', items=lambda dfs: len(dfs['Comments']))
+def processComments(commentsResponses, progress: ProgressCallback = noProgress, checkpoint: RunCheckpoint = None):
+    """Build the comment frames from comment thread items.
+
+    Args:
+        commentsResponses (iterable): pages of comment thread items (as yielded by
+        iterVideosComments), or a flat list of items. Pages are flattened as they
+        are consumed, so raw API responses are not all held at once.
+        progress (ProgressCallback, optional): passed on to processChannelIds for the comment authors. Defaults to noProgress.
+        checkpoint (RunCheckpoint, optional): passed on to processChannelIds for the comment authors. Defaults to None.
+
+    Returns:
+        dict: 'Comments', 'Comments Author' and, when present, 'Comments Links' and 'Comments Hashtags' frames
+    """
+    commentsList = []
+    for page in commentsResponses:
+        commentsList.extend(commentRows(
+            page if isinstance(page, list) else [page]))
     commentsDf = pd.DataFrame(commentsList)
     authorInfoDf = processChannelIds(
-        commentsDf['authorChannelId'].unique())['channelInfo']
+        commentsDf['authorChannelId'].unique(), progress=progress, checkpoint=checkpoint)['channelInfo']
+    return commentFrames(commentsDf, authorInfoDf)
+
+
+def commentFrames(commentsDf: pd.DataFrame, authorInfoDf: pd.DataFrame) -> dict:
+    """Join comments with their authors and extract their links and hashtags, column-wise.
+
+    Args:
+        commentsDf (pd.DataFrame): rows of commentRows
+        authorInfoDf (pd.DataFrame): 'channelInfo' frame of the comment authors
+
+    Returns:
+        dict: 'Comments', 'Comments Author' and, when present, 'Comments Links' and 'Comments Hashtags' frames
+    """
+    resultsDfs = {}
     commentsProcessedDf = pd.merge(commentsDf, authorInfoDf[[
                                    'channelId', 'Creation Date']], left_on='authorChannelId', right_on='channelId').drop_duplicates(ignore_index = True)
-    commentsProcessedDf[['publishedAt', 'updatedAt', 'Creation Date']] = commentsProcessedDf[[
-        'publishedAt', 'updatedAt', 'Creation Date']].apply(pd.to_datetime).apply(lambda x: x.dt.tz_convert('Singapore')).apply(lambda x: x.dt.tz_localize(None))
+    for column in ['publishedAt', 'updatedAt', 'Creation Date']:
+        commentsProcessedDf[column] = toLocalTime(commentsProcessedDf[column])
     commentsProcessedDf['Account age when commenting (days)'] = (
         commentsProcessedDf['publishedAt'] - commentsProcessedDf['Creation Date']).dt.days
     commentsProcessedDf = commentsProcessedDf.join(commentsProcessedDf[['authorChannelId', 'videoId', 'commentId', 'likeCount']].groupby(by='authorChannelId').agg(
         No_Unique_Videos = ('videoId', 'nunique'), No_Comments_Made=('commentId', 'count'), Total_Likes=('likeCount', 'sum')), on='authorChannelId')
-    commentsProcessedDf.drop(columns = 'channelId', axis = 1, inplace=True)
+    commentsProcessedDf.drop(columns = 'channelId', inplace=True)
     resultsDfs.update(
         {'Comments': commentsProcessedDf,
          'Comments Author': authorInfoDf})
-    linksDf = commentsDf[['commentId']].join(
-        commentsDf.textDisplay.apply(getLink).explode().rename('rawLink')).dropna()
+    linksDf = extractLinks(commentsDf).dropna()
     if(len(linksDf) != 0):
-        linksDf = linksDf.join(linksDf.rawLink.apply(
-            cleanLink).rename({0: 'cleanLink', 1: 'hashtag'}, axis=1))
+        linksDf = linksDf.join(cleanLinks(linksDf.rawLink))
         cleanLinksDf = linksDf.drop(
             labels='hashtag', axis=1).dropna().drop_duplicates()
         hashtagsDf = linksDf.drop(
@@ -310,6 +602,7 @@ def processComments(commentsResponses):
                 {'Comments Hashtags': hashtagsDf})
     return resultsDfs
 
+@traced('process.summarisedComments')
 def summarisedComments(resultDfs : dict):
     commentSummarisedDfDict = {'Comments Summary 🗯️' : resultDfs['Comments'][['authorDisplayName', 'authorChannelId', 'No_Unique_Videos', 'No_Comments_Made', 'Total_Likes']].sort_values(
     by=['No_Unique_Videos'], ascending = False).drop_duplicates(ignore_index = True)}
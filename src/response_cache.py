@@ -0,0 +1,135 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Callable, List
+
+CACHE_PATH = './cache/responses.sqlite'
+HOUR = 3600
+DAY = 24 * HOUR
+# Snippets, channel metadata and topics barely change; counters do.
+PART_TTLS = {'statistics': 6 * HOUR,
+             'liveStreamingDetails': 6 * HOUR,
+             'page': DAY}
+DEFAULT_TTL = 7 * DAY
+
+
+def chunked(ids: List, size: int):
+    return [ids[i:i + size] for i in range(0, len(ids), size)]
+
+
+class ResponseCache:
+    """SQLite-backed cache of YouTube list responses, stored per id and per part.
+
+    Each resource part (snippet, statistics, ...) of each id is stored as its
+    own row with the time it was fetched, so a batched request only asks the
+    API for the ids and parts that are missing or older than their TTL and
+    merges the rest from the cache.
+
+    Args:
+        path (str, optional): SQLite database file. Defaults to CACHE_PATH.
+        ttls (dict, optional): seconds each part stays fresh. Defaults to PART_TTLS.
+        defaultTtl (int, optional): TTL of parts not in ttls. Defaults to DEFAULT_TTL.
+    """
+
+    def __init__(self, path: str = CACHE_PATH, ttls: dict = PART_TTLS, defaultTtl: int = DEFAULT_TTL):
+        self.path = path
+        self.ttls = ttls
+        self.defaultTtl = defaultTtl
+        self._lock = threading.Lock()
+        self._connection = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            self._connection = sqlite3.connect(
+                self.path, check_same_thread=False)
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS responses ('
+                'resource TEXT, id TEXT, part TEXT, fetchedAt REAL, body TEXT, '
+                'PRIMARY KEY (resource, id, part))')
+        return self._connection
+
+    def ttl(self, part: str) -> float:
+        return self.ttls.get(part, self.defaultTtl)
+
+    def lookup(self, resource: str, ids: List[str], parts: List[str], maxAge: float = None) -> dict:
+        """Return {id: {part: value}} for the fresh cached parts of ids."""
+        now = time.time()
+        found = {}
+        with self._lock:
+            connection = self._connect()
+            for idsChunk in chunked(ids, 500):
+                rows = connection.execute(
+                    'SELECT id, part, fetchedAt, body FROM responses WHERE resource = ? AND id IN (%s)' % ','.join(
+                        '?' * len(idsChunk)),
+                    [resource] + list(idsChunk)).fetchall()
+                for itemId, part, fetchedAt, body in rows:
+                    age = now - fetchedAt
+                    if part in parts and age < (self.ttl(part) if maxAge is None else maxAge):
+                        found.setdefault(itemId, {})[part] = json.loads(body)
+        return found
+
+    def store(self, resource: str, items: List[dict], parts: List[str]):
+        """Store each requested part of each item; parts the API left out are stored as null."""
+        now = time.time()
+        rows = [(resource, item['id'], part, now, json.dumps(item.get(part)))
+                for item in items for part in parts]
+        with self._lock:
+            connection = self._connect()
+            connection.executemany(
+                'INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)', rows)
+            connection.commit()
+
+    def list(self, resource: str, ids: List[str], parts: List[str], fetch: Callable[[str, str], dict], kind: str = None, maxAge: float = None, batchSize: int = 50) -> dict:
+        """Serve a list call from the cache, fetching only missing or stale ids and parts.
+
+        Args:
+            resource (str): API resource, e.g. 'videos' or 'channels'
+            ids (List[str]): ids to return
+            parts (List[str]): parts wanted for every id
+            fetch (Callable): fetch(idsString, partString) performing the API call for one batch
+            kind (str, optional): 'kind' of the returned items. Defaults to None.
+            maxAge (float, optional): override every part's TTL, 0 forces a refetch. Defaults to None.
+            batchSize (int, optional): ids per API call. Defaults to 50.
+
+        Returns:
+            dict: response-shaped {'items': [...]} in ids order, leaving out ids the API did not return
+        """
+        ids = list(dict.fromkeys(ids))
+        cached = self.lookup(resource, ids, parts, maxAge)
+        stale = {}
+        for itemId in ids:
+            missingParts = tuple(
+                part for part in parts if part not in cached.get(itemId, {}))
+            if missingParts:
+                stale.setdefault(missingParts, []).append(itemId)
+
+        for missingParts, staleIds in stale.items():
+            for idsChunk in chunked(staleIds, batchSize):
+                response = fetch(",".join(idsChunk), ",".join(missingParts))
+                items = response.get('items', [])
+                self.store(resource, items, missingParts)
+                for item in items:
+                    cached.setdefault(item['id'], {}).update(
+                        {part: item.get(part) for part in missingParts})
+
+        items = []
+        for itemId in ids:
+            if itemId not in cached or any(part not in cached[itemId] for part in parts):
+                continue
+            item = {'kind': kind, 'id': itemId}
+            item.update({part: value for part, value in cached[itemId].items()
+                         if value is not None})
+            items.append(item)
+        return {'items': items}
+
+    def page(self, resource: str, key: str, fetch: Callable[[], dict], maxAge: float = None) -> dict:
+        """Serve one paginated response (e.g. a commentThreads page) from the cache."""
+        cached = self.lookup(resource, [key], ['page'], maxAge)
+        if key in cached:
+            return cached[key]['page']
+        response = fetch()
+        self.store(resource, [{'id': key, 'page': response}], ['page'])
+        return response
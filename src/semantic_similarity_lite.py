@@ -1,67 +1,206 @@
-import streamlit as st
+import threading
+
 import numpy as np
-import sentencepiece as spm
-import os
-import tensorflow.compat.v1 as tf
-import tensorflow_hub as hub
-tf.disable_eager_execution()
-print('Lite Universal sentences encoder(v2) loaded...')
-sp = spm.SentencePieceProcessor()
+
+from src.embedding_cache import EmbeddingCache
+from src.tracing import logEvent, traced
+
+# TensorFlow, tensorflow_hub and SentencePiece are imported on first use
+# (getSentencePiece / getEngine) so importing this module stays cheap.
 spm_path = './model/universal_encoder_8k_spm.model'
-with tf.io.gfile.GFile(spm_path, mode="rb") as f:
-    sp.LoadFromSerializedProto(f.read())
-print("SentencePiece model loaded at {}.".format(spm_path))
-# g = tf.Graph()
-# with g.as_default():
-#     input_placeholder = tf.sparse_placeholder(tf.int64, shape=[None, None])
-#     module = hub.Module(
-#     "https://tfhub.dev/google/universal-sentence-encoder-lite/2")
+module_path = './model/universal-sentence-encoder-lite_2'
+_sp = None
+_sp_lock = threading.Lock()
+
+
+def getSentencePiece():
+    """Return the SentencePiece processor of USE-lite, loading it on first use."""
+    global _sp
+    if _sp is None:
+        with _sp_lock:
+            if _sp is None:
+                import sentencepiece as spm
+                sp = spm.SentencePieceProcessor()
+                with open(spm_path, mode="rb") as f:
+                    sp.LoadFromSerializedProto(f.read())
+                logEvent('sentencePieceLoaded', path=spm_path)
+                _sp = sp
+    return _sp
 
-# g.finalize() # not mandatory, but a nice practice, especially in multithreaded environment
+EMBEDDING_DIM = 512
+MAX_TOKENS_PER_BATCH = 32768
+MAX_SENTENCES_PER_BATCH = 64
+
+
+def ids_to_sparse_format(ids):
+    # Packs already-encoded sentences into tf.SparseTensor-similar format:
+    # (values, indices, dense_shape), built with NumPy rather than one
+    # Python list per token.
+    lengths = np.fromiter((len(x) for x in ids), dtype=np.int64, count=len(ids))
+    total = int(lengths.sum())
+    if total == 0:
+        values = np.zeros(0, dtype=np.int64)
+    else:
+        values = np.concatenate(
+            [np.asarray(x, dtype=np.int64) for x in ids])
+    rows = np.repeat(np.arange(len(ids), dtype=np.int64), lengths)
+    starts = np.repeat(np.cumsum(lengths) - lengths, lengths)
+    cols = np.arange(total, dtype=np.int64) - starts
+    indices = np.stack([rows, cols], axis=1)
+    dense_shape = (len(ids), int(lengths.max()) if len(ids) else 0)
+    return (values, indices, dense_shape)
 
 
-@st.cache(suppress_st_warning=True)
 def process_to_IDs_in_sparse_format(sp, sentences):
     # An utility method that processes sentences with the sentence piece processor
     # 'sp' and returns the results in tf.SparseTensor-similar format:
     # (values, indices, dense_shape)
-    ids = [sp.EncodeAsIds(x) for x in sentences]
-    max_len = max(len(x) for x in ids)
-    dense_shape = (len(ids), max_len)
-    values = [item for sublist in ids for item in sublist]
-    indices = [[row, col]
-               for row in range(len(ids)) for col in range(len(ids[row]))]
-    return (values, indices, dense_shape)
+    return ids_to_sparse_format(sp.encode(list(sentences), out_type=int))
+
+
+def length_buckets(lengths, max_tokens: int = MAX_TOKENS_PER_BATCH, max_batch_size: int = MAX_SENTENCES_PER_BATCH):
+    """Group sentence positions into batches of similar token length.
+
+    Positions are sorted by length and a batch is closed once its padded
+    size (rows x longest row) would exceed max_tokens, so one long transcript
+    never pads a batch of short ones. A sentence longer than max_tokens gets
+    a batch of its own.
+
+    Args:
+        lengths (list): token count of each sentence
+        max_tokens (int, optional): cap on padded tokens per batch. Defaults to MAX_TOKENS_PER_BATCH.
+        max_batch_size (int, optional): cap on sentences per batch. Defaults to MAX_SENTENCES_PER_BATCH.
+
+    Returns:
+        list: batches, each a list of positions into lengths
+    """
+    batches, batch = [], []
+    for position in np.argsort(lengths, kind='stable'):
+        padded = (len(batch) + 1) * max(lengths[position], 1)
+        if batch and (padded > max_tokens or len(batch) == max_batch_size):
+            batches.append(batch)
+            batch = []
+        batch.append(int(position))
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+class EmbeddingEngine:
+    """USE-lite encoder that builds its graph and session once.
+
+    The hub module is loaded into a finalized graph and kept alive in a
+    long-lived session, so every call after the first only pays for
+    inference. Use getEngine() to share one instance across the app and
+    batch jobs.
+    """
+
+    def __init__(self, module_path: str = module_path):
+        import tensorflow.compat.v1 as tf
+        import tensorflow_hub as hub
+        tf.disable_eager_execution()
+        logEvent('embeddingEngineLoading', path=module_path)
+        self.module_path = module_path
+        self._lock = threading.Lock()
+        self.graph = tf.Graph()
+        with self.graph.as_default():
+            self.input_placeholder = tf.sparse_placeholder(
+                tf.int64, shape=[None, None])
+            module = hub.Module(module_path)
+            self.encodings = module(
+                inputs=dict(
+                    values=self.input_placeholder.values,
+                    indices=self.input_placeholder.indices,
+                    dense_shape=self.input_placeholder.dense_shape))
+            init_op = tf.group(tf.global_variables_initializer(),
+                               tf.tables_initializer())
+        self.graph.finalize()
+        self.session = tf.Session(graph=self.graph)
+        self.session.run(init_op)
+        logEvent('embeddingEngineReady', path=module_path)
+
+    def _run(self, ids):
+        values, indices, dense_shape = ids_to_sparse_format(ids)
+        # Session.run is safe to call concurrently, the lock only keeps
+        # one padded batch in memory at a time.
+        with self._lock:
+            return self.session.run(
+                self.encodings,
+                feed_dict={self.input_placeholder.values: values,
+                           self.input_placeholder.indices: indices,
+                           self.input_placeholder.dense_shape: dense_shape})
+
+    def encode_stream(self, texts, max_tokens: int = MAX_TOKENS_PER_BATCH, batch_size: int = MAX_SENTENCES_PER_BATCH):
+        """Embed texts in length buckets, yielding vectors in input order.
+
+        Args:
+            texts (iterable): sentences or captions to embed
+            max_tokens (int, optional): cap on padded tokens per session.run. Defaults to MAX_TOKENS_PER_BATCH.
+            batch_size (int, optional): cap on sentences per session.run. Defaults to MAX_SENTENCES_PER_BATCH.
+
+        Yields:
+            np.ndarray: float32 vector of length EMBEDDING_DIM for each text
+        """
+        ids = [np.asarray(x, dtype=np.int32)
+               for x in getSentencePiece().encode(list(texts), out_type=int)]
+        pending = {}
+        next_position = 0
+        for batch in length_buckets([len(x) for x in ids], max_tokens, batch_size):
+            vectors = self._run([ids[position] for position in batch])
+            for position, vector in zip(batch, vectors):
+                pending[position] = vector.astype(np.float32)
+                ids[position] = None
+            while next_position in pending:
+                yield pending.pop(next_position)
+                next_position += 1
+
+    def encode(self, texts, batch_size: int = MAX_SENTENCES_PER_BATCH, max_tokens: int = MAX_TOKENS_PER_BATCH) -> np.ndarray:
+        """Embed texts with the shared session.
+
+        Args:
+            texts (iterable): sentences or captions to embed
+            batch_size (int, optional): cap on sentences per session.run. Defaults to MAX_SENTENCES_PER_BATCH.
+            max_tokens (int, optional): cap on padded tokens per session.run. Defaults to MAX_TOKENS_PER_BATCH.
+
+        Returns:
+            np.ndarray: float32 matrix of shape (len(texts), EMBEDDING_DIM)
+        """
+        vectors = list(self.encode_stream(texts, max_tokens, batch_size))
+        if len(vectors) == 0:
+            return np.zeros((0, EMBEDDING_DIM), dtype=np.float32)
+        return np.stack(vectors)
+
+    def close(self):
+        self.session.close()
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def getEngine() -> EmbeddingEngine:
+    """Return the process-wide embedding engine, building it on first use."""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = EmbeddingEngine()
+    return _engine
+
+
+_cache = None
+
 
-# Compute a representation for each message, showing various lengths supported.
+def getEmbeddingCache() -> EmbeddingCache:
+    """Return the on-disk cache holding USE-lite caption vectors."""
+    global _cache
+    if _cache is None:
+        with _engine_lock:
+            if _cache is None:
+                _cache = EmbeddingCache(module_path, EMBEDDING_DIM)
+    return _cache
 
 
-@st.cache(suppress_st_warning=True)
+@traced('embed')
 def embed(doc):
-    g = tf.Graph()
-    with g.as_default():
-        input_placeholder = tf.sparse_placeholder(tf.int64, shape=[None, None])
-        module = hub.Module(
-            "./model/universal-sentence-encoder-lite_2")
-        encodings = module(
-            inputs=dict(
-                values=input_placeholder.values,
-                indices=input_placeholder.indices,
-                dense_shape=input_placeholder.dense_shape))
-
-        messages = doc
-        with tf.Session(graph=g) as session:
-            session.run(tf.global_variables_initializer())
-            session.run(tf.tables_initializer())
-            values, indices, dense_shape = process_to_IDs_in_sparse_format(
-                sp, messages)
-
-            message_embeddings = session.run(
-                encodings,
-                feed_dict={input_placeholder.values: values,
-                           input_placeholder.indices: indices,
-                           input_placeholder.dense_shape: dense_shape})
-
-    g.finalize()  # not mandatory, but a nice practice, especially in multithreaded environment
-
-    return np.array(message_embeddings).tolist()
+    return getEmbeddingCache().encode(doc, lambda texts: getEngine().encode(texts)).tolist()
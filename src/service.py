@@ -1,5 +1,11 @@
-from googleapiclient.discovery import build
+from googleapiclient import discovery_cache
+from googleapiclient.discovery import build, build_from_document
+import httplib2
+import json
 import logging
+import threading
+
+from src.tracing import logEvent
 
 logging.getLogger('googleapiclient.discovery_cache').setLevel(logging.ERROR)
 
@@ -7,25 +13,58 @@ SCOPES = ["https://www.googleapis.com/auth/youtube.force-ssl"]
 
 API_SERVICE_NAME = 'youtube'
 API_VERSION = 'v3'
+HTTP_TIMEOUT = 60
+
+_discovery_document = None
+_discovery_lock = threading.Lock()
+_clients = {}
+_clients_lock = threading.Lock()
+_local = threading.local()
+
+
+def discovery_document():
+    # The discovery document bundled with google-api-python-client, read and
+    # parsed once per process instead of on every build.
+    global _discovery_document
+    with _discovery_lock:
+        if _discovery_document is None:
+            document = discovery_cache.get_static_doc(
+                API_SERVICE_NAME, API_VERSION)
+            if document is not None:
+                _discovery_document = json.loads(document)
+    return _discovery_document
+
+
+def thread_http():
+    # httplib2 connections must not be shared across threads, so requests
+    # are sent with the calling thread's own Http: request.execute(http=thread_http()).
+    http = getattr(_local, 'http', None)
+    if http is None:
+        http = _local.http = httplib2.Http(timeout=HTTP_TIMEOUT)
+    return http
 
 
 def create_yt_service(api_key):
-    try:
-        # Get credentials and create an API client
-        service = build(API_SERVICE_NAME, API_VERSION, developerKey=api_key)
-        print(API_SERVICE_NAME, 'service created successfully')
-        return service
-    except Exception as e:
-        print('Unable to connect.')
-        print(e)
-        return None
-
-
-def check_api(api_key):
-    try:
-        # Get credentials and create an API client
-        build(API_SERVICE_NAME, API_VERSION, developerKey=api_key)
-        return "API access successful"
-    except Exception as e:
-        print('Unable to connect.')
-        return e
\ No newline at end of file
+    # One client per API key for the whole process: Streamlit runs every
+    # rerun on a new thread, so a per-thread cache would never be hit.
+    # Clients are safe to share as long as each thread passes its own
+    # transport when executing, see thread_http.
+    with _clients_lock:
+        if api_key in _clients:
+            return _clients[api_key]
+        try:
+            # Get credentials and create an API client
+            document = discovery_document()
+            http = httplib2.Http(timeout=HTTP_TIMEOUT)
+            if document is not None:
+                service = build_from_document(
+                    document, developerKey=api_key, http=http)
+            else:
+                service = build(API_SERVICE_NAME, API_VERSION,
+                                developerKey=api_key, http=http)
+            logEvent('serviceCreated', service=API_SERVICE_NAME, version=API_VERSION)
+            _clients[api_key] = service
+            return service
+        except Exception as e:
+            logEvent('serviceFailed', logging.ERROR, service=API_SERVICE_NAME, error=repr(e))
+            return None
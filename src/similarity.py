@@ -0,0 +1,211 @@
+from typing import Iterable, Iterator, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.vector_index import VectorIndex, getIndex, top_k
+
+# Bytes of scores held at once; each block is a slice of whole rows of the
+# (N, M) score matrix, so the matmul temporaries stay under the cap.
+MEMORY_CAP = 256 * 2 ** 20
+TOP_K = 10
+CLUSTER_THRESHOLD = 0.8
+
+
+def asMatrix(vectors) -> np.ndarray:
+    """(n, dim) float32 matrix of a matrix, a list of vectors or a Series of vectors."""
+    if isinstance(vectors, pd.Series):
+        vectors = vectors.to_list()
+    if isinstance(vectors, np.ndarray) and vectors.ndim == 2:
+        return np.ascontiguousarray(vectors, dtype=np.float32)
+    if len(vectors) == 0:
+        return np.zeros((0, 0), dtype=np.float32)
+    return np.asarray([np.asarray(vector, dtype=np.float32) for vector in vectors], dtype=np.float32)
+
+
+def blockRows(columns: int, memoryCap: int = MEMORY_CAP) -> int:
+    """Score rows per block so that a (rows, columns) float32 block fits in memoryCap bytes."""
+    return max(1, memoryCap // (4 * max(columns, 1)))
+
+
+def iterScoreBlocks(seeds, candidates, memoryCap: int = MEMORY_CAP) -> Iterator[Tuple[int, np.ndarray]]:
+    """Inner products of seeds against candidates, a block of seed rows at a time.
+
+    Args:
+        seeds (array-like): (N, dim) seed vectors
+        candidates (array-like): (M, dim) candidate vectors
+        memoryCap (int, optional): bytes per score block. Defaults to MEMORY_CAP.
+
+    Yields:
+        tuple: (first seed row, (rows, M) float32 scores)
+    """
+    seeds, candidates = asMatrix(seeds), asMatrix(candidates)
+    step = blockRows(len(candidates), memoryCap)
+    for start in range(0, len(seeds), step):
+        yield start, seeds[start:start + step] @ candidates.T
+
+
+def similarityMatrix(seeds, candidates, memoryCap: int = MEMORY_CAP, out: np.ndarray = None) -> np.ndarray:
+    """(N, M) scores of N seeds against M candidates, computed in blocks.
+
+    Args:
+        seeds (array-like): (N, dim) seed vectors
+        candidates (array-like): (M, dim) candidate vectors
+        memoryCap (int, optional): bytes per score block. Defaults to MEMORY_CAP.
+        out (np.ndarray, optional): (N, M) float32 array to fill, e.g. a np.memmap when
+        the result itself does not fit in memory. Defaults to a new array.
+
+    Returns:
+        np.ndarray: (N, M) float32 scores
+    """
+    seeds, candidates = asMatrix(seeds), asMatrix(candidates)
+    if out is None:
+        out = np.empty((len(seeds), len(candidates)), dtype=np.float32)
+    for start, scores in iterScoreBlocks(seeds, candidates, memoryCap):
+        out[start:start + len(scores)] = scores
+    return out
+
+
+def allPairsTopK(vectors, k: int = TOP_K, memoryCap: int = MEMORY_CAP) -> Tuple[np.ndarray, np.ndarray]:
+    """k nearest neighbours of every vector among the others.
+
+    Args:
+        vectors (array-like): (M, dim) candidate pool
+        k (int, optional): neighbours per vector. Defaults to TOP_K.
+        memoryCap (int, optional): bytes per score block. Defaults to MEMORY_CAP.
+
+    Returns:
+        tuple: (rows, scores), both (M, <=k), best first
+    """
+    vectors = asMatrix(vectors)
+    k = min(k, max(len(vectors) - 1, 0))
+    rows = np.zeros((len(vectors), k), dtype=np.int64)
+    scores = np.zeros((len(vectors), k), dtype=np.float32)
+    for start, block in iterScoreBlocks(vectors, vectors, memoryCap):
+        diagonal = np.arange(len(block))
+        block[diagonal, start + diagonal] = -np.inf
+        best = top_k(block, k)
+        rows[start:start + len(block)] = best
+        scores[start:start + len(block)] = np.take_along_axis(block, best, axis=1)
+    return rows, scores
+
+
+def connectedComponents(count: int, sources: np.ndarray, targets: np.ndarray) -> np.ndarray:
+    """Component of every node of an undirected graph, numbered by first node."""
+    labels = np.arange(count)
+    while len(sources):
+        low = np.minimum(labels[sources], labels[targets])
+        merged = labels.copy()
+        np.minimum.at(merged, sources, low)
+        np.minimum.at(merged, targets, low)
+        merged = merged[merged]
+        if np.array_equal(merged, labels):
+            break
+        labels = merged
+    return np.unique(labels, return_inverse=True)[1].reshape(-1)
+
+
+def similarityClusters(vectors, threshold: float = CLUSTER_THRESHOLD, memoryCap: int = MEMORY_CAP) -> np.ndarray:
+    """Cluster vectors linked by a chain of pairs scoring at least threshold.
+
+    Args:
+        vectors (array-like): (M, dim) candidate pool
+        threshold (float, optional): score linking two vectors. Defaults to CLUSTER_THRESHOLD.
+        memoryCap (int, optional): bytes per score block. Defaults to MEMORY_CAP.
+
+    Returns:
+        np.ndarray: cluster number of each vector, 0 for the cluster of the first vector
+    """
+    vectors = asMatrix(vectors)
+    sources, targets = [], []
+    for start, block in iterScoreBlocks(vectors, vectors, memoryCap):
+        blockSources, blockTargets = np.nonzero(block >= threshold)
+        blockSources += start
+        upper = blockSources < blockTargets
+        sources.append(blockSources[upper])
+        targets.append(blockTargets[upper])
+    if len(vectors) == 0:
+        return np.zeros(0, dtype=np.int64)
+    return connectedComponents(len(vectors), np.concatenate(sources), np.concatenate(targets))
+
+
+def indexVectors(videoIds: Iterable[str], index: VectorIndex = None) -> pd.Series:
+    """Embeddings of the videoIds found in the vector index, by videoId."""
+    index = getIndex() if index is None else index
+    found = [videoId for videoId in dict.fromkeys(videoIds) if videoId in index]
+    return pd.Series([index.get(videoId) for videoId in found], index=pd.Index(found, name='videoId'), dtype=object)
+
+
+def similarityFrame(seeds: pd.Series, candidates: pd.Series, memoryCap: int = MEMORY_CAP) -> pd.DataFrame:
+    """Scores of seed videos (rows) against candidate videos (columns).
+
+    Args:
+        seeds (pd.Series): seed embeddings by videoId, e.g. every video of a channel
+        candidates (pd.Series): candidate embeddings by videoId
+        memoryCap (int, optional): bytes per score block. Defaults to MEMORY_CAP.
+
+    Returns:
+        pd.DataFrame: (N, M) scores
+    """
+    return pd.DataFrame(similarityMatrix(seeds, candidates, memoryCap),
+                        index=seeds.index, columns=candidates.index)
+
+
+def neighboursFrame(vectors: pd.Series, k: int = TOP_K, memoryCap: int = MEMORY_CAP) -> pd.DataFrame:
+    """Top-k neighbours of every video of a pool, one row per (video, neighbour).
+
+    Returns:
+        pd.DataFrame: videoId, rank (1 is the closest), neighbour and score
+    """
+    rows, scores = allPairsTopK(vectors, k, memoryCap)
+    ids = np.asarray(vectors.index)
+    return pd.DataFrame({'videoId': np.repeat(ids, rows.shape[1]),
+                         'rank': np.tile(np.arange(1, rows.shape[1] + 1), len(ids)),
+                         'neighbour': ids[rows.reshape(-1)],
+                         'score': scores.reshape(-1)})
+
+
+def clusterFrame(vectors: pd.Series, threshold: float = CLUSTER_THRESHOLD, memoryCap: int = MEMORY_CAP) -> pd.DataFrame:
+    """Threshold clusters of a pool, by videoId, with each cluster's size."""
+    clusters = pd.Series(similarityClusters(vectors, threshold, memoryCap),
+                         index=vectors.index, name='cluster')
+    return clusters.to_frame().assign(clusterSize=clusters.map(clusters.value_counts()))
+
+
+def seedVector(videoCaptionDf: pd.DataFrame, videoId: str, fallbackText: str = None, index: VectorIndex = None):
+    """Embedding to score candidates against, for a seed that may have no caption.
+
+    Uses the seed's caption row, then its vector from an earlier run in the
+    index, then an embedding of fallbackText (its title and description).
+
+    Returns:
+        np.ndarray: seed embedding, or None when none of the three is available
+    """
+    if videoId in videoCaptionDf.index:
+        return np.asarray(videoCaptionDf.loc[[videoId], 'embedding'].iloc[0], dtype=np.float32)
+    index = getIndex() if index is None else index
+    if videoId in index:
+        return index.get(videoId)
+    if fallbackText:
+        from src.semantic_similarity_lite import embed
+        return np.asarray(embed([fallbackText])[0], dtype=np.float32)
+    return None
+
+
+def pastSimilar(videoId: str, seedText: str = None, k: int = TOP_K, index: VectorIndex = None) -> pd.DataFrame:
+    """Most similar videos from earlier runs, for a seed that need not be indexed itself.
+
+    An indexed seed is searched with its own vector, any other seed with an
+    embedding of seedText (its caption, or its title and description).
+
+    Returns:
+        pd.DataFrame: videoId and score, most similar first; empty when the index is
+        empty or there is nothing to search with
+    """
+    index = getIndex() if index is None else index
+    vector = None
+    if len(index) != 0:
+        vector = seedVector(pd.DataFrame(columns=['embedding']), videoId, seedText, index)
+    if vector is None:
+        return pd.DataFrame(columns=['videoId', 'score'])
+    return pd.DataFrame(index.search(vector, k=k, exclude=[videoId]), columns=['videoId', 'score'])
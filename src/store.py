@@ -0,0 +1,200 @@
+import os
+import threading
+import uuid
+from datetime import date
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+STORE_DIR = './data'
+PARTITION_COLUMNS = ['collectDate', 'seed']
+EMBEDDING_COLUMNS = ['embedding']
+INDEX_KEY = b'ytplus.index'
+
+
+def newRunId() -> str:
+    return uuid.uuid4().hex[:12]
+
+
+def embeddingArray(values, pa):
+    """Fixed-size float32 list array from a column of equal-length vectors."""
+    matrix = np.asarray([np.asarray(value, dtype=np.float32)
+                         for value in values], dtype=np.float32)
+    return pa.FixedSizeListArray.from_arrays(
+        pa.array(matrix.reshape(-1), type=pa.float32()), matrix.shape[1])
+
+
+def isEmbedded(column: pd.Series) -> bool:
+    # Caption frames hold the caption text in 'embedding' until they are embedded.
+    return len(column) != 0 and all(isinstance(value, (list, np.ndarray)) for value in column)
+
+
+def frameToTable(df: pd.DataFrame):
+    """Arrow table of a frame, keeping a named index as a column and embeddings as float32 lists."""
+    import pyarrow as pa
+    index = df.index.name
+    if index is not None:
+        df = df.reset_index()
+    df = df.loc[:, ~df.columns.duplicated()]
+    columns, fields = [], []
+    for name in df.columns:
+        column = df[name]
+        if name in EMBEDDING_COLUMNS and isEmbedded(column):
+            array = embeddingArray(column, pa)
+        else:
+            array = pa.Array.from_pandas(column)
+        columns.append(array)
+        fields.append(pa.field(str(name), array.type))
+    metadata = {INDEX_KEY: index.encode('utf-8')} if index else None
+    return pa.Table.from_arrays(columns, schema=pa.schema(fields, metadata=metadata))
+
+
+class DatasetStore:
+    """Columnar store of collected frames as Parquet datasets.
+
+    Every frame name ('videoDf', 'channelInfo', 'Comments', ...) is its own
+    hive-partitioned dataset, root/<name>/collectDate=<date>/seed=<seed>/,
+    holding one file per run. Embedding columns are written as fixed-size
+    float32 lists. Loads read only the requested columns and push filters
+    down to the partitions and row-group statistics, so a past run is
+    reloaded without parsing any other run.
+
+    Args:
+        root (str, optional): store directory. Defaults to STORE_DIR.
+    """
+
+    def __init__(self, root: str = STORE_DIR):
+        self.root = root
+        self._lock = threading.Lock()
+
+    def write(self, frames: dict, seed: str, collectDate: str = None, runId: str = None) -> str:
+        """Write every non-empty frame of a run under its seed and collection date.
+
+        Args:
+            frames (dict): frame name -> DataFrame, e.g. videoDetails_df or processComments output
+            seed (str): seed of the run, e.g. the seed video id
+            collectDate (str, optional): ISO collection date. Defaults to today.
+            runId (str, optional): file name of this run in each partition; writing the same
+            runId again replaces it. Defaults to a new id.
+
+        Returns:
+            str: the run id
+        """
+        import pyarrow.parquet as pq
+        collectDate = collectDate or date.today().isoformat()
+        runId = runId or newRunId()
+        for name, df in frames.items():
+            if df is None or len(df) == 0:
+                continue
+            partition = os.path.join(self.root, name, 'collectDate=%s' % collectDate,
+                                     'seed=%s' % seed)
+            path = os.path.join(partition, '%s.parquet' % runId)
+            table = frameToTable(df)
+            with self._lock:
+                os.makedirs(partition, exist_ok=True)
+            pq.write_table(table, path + '.tmp')
+            os.replace(path + '.tmp', path)
+        return runId
+
+    def names(self) -> List[str]:
+        """Frame names present in the store."""
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(name for name in os.listdir(self.root)
+                      if os.path.isdir(os.path.join(self.root, name)))
+
+    def runs(self, name: str = 'videoDf') -> pd.DataFrame:
+        """List the stored (collectDate, seed, runId, writtenAt) of a frame, newest first."""
+        rows = []
+        frameDir = os.path.join(self.root, name)
+        for dirPath, _, fileNames in os.walk(frameDir):
+            parts = dict(part.split('=', 1) for part in os.path.relpath(
+                dirPath, frameDir).split(os.sep) if '=' in part)
+            for fileName in fileNames:
+                if fileName.endswith('.parquet') and len(parts) == len(PARTITION_COLUMNS):
+                    rows.append(dict(parts, runId=fileName[:-len('.parquet')],
+                                     writtenAt=os.path.getmtime(os.path.join(dirPath, fileName))))
+        runs = pd.DataFrame(rows, columns=PARTITION_COLUMNS + ['runId', 'writtenAt'])
+        return runs.sort_values('writtenAt', ascending=False, ignore_index=True)
+
+    def dataset(self, name: str, runId: str = None, seed=None, collectDate=None):
+        """The pyarrow dataset of the matching runs of a frame, with their schemas unified, or None."""
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+        partitionSchema = pa.schema(
+            [(column, pa.string()) for column in PARTITION_COLUMNS])
+        partitioning = ds.partitioning(partitionSchema, flavor='hive')
+        frameDir = os.path.join(self.root, name)
+        runs = self.runs(name)
+        # Partitions are pruned here, before any file footer is read.
+        for column, value in (('runId', runId), ('seed', seed), ('collectDate', collectDate)):
+            if value is not None:
+                runs = runs[runs[column].isin([value] if isinstance(value, str) else list(value))]
+        paths = [os.path.join(frameDir, 'collectDate=%s' % run.collectDate, 'seed=%s' % run.seed,
+                              '%s.parquet' % run.runId) for run in runs.itertuples()]
+        if len(paths) == 0:
+            return None
+        dataset = ds.dataset(paths, format='parquet', partitioning=partitioning,
+                             partition_base_dir=frameDir)
+        # Columns that were all null in one run are typed null there; unify
+        # with the other runs so they keep their real type.
+        schemas = [fragment.physical_schema for fragment in dataset.get_fragments()]
+        if len(schemas) <= 1:
+            return dataset
+        schema = pa.unify_schemas(schemas + [partitionSchema])
+        return ds.dataset(paths, schema=schema, format='parquet', partitioning=partitioning,
+                          partition_base_dir=frameDir)
+
+    def load(self, name: str, columns: List[str] = None, filter=None, seed=None, collectDate=None, runId: str = None) -> pd.DataFrame:
+        """Load a frame across runs, reading only the columns and partitions needed.
+
+        Args:
+            name (str): frame name, e.g. 'videoDf'
+            columns (List[str], optional): columns to read. Defaults to all.
+            filter (pyarrow.dataset.Expression, optional): row filter, e.g.
+            ds.field('viewCount') > '1000'. Defaults to None.
+            seed (str or list, optional): only these seeds. Defaults to all.
+            collectDate (str or list, optional): only these ISO dates. Defaults to all.
+            runId (str, optional): only this run. Defaults to all.
+
+        Returns:
+            pd.DataFrame: rows of the matching runs, indexed like the written frame
+            when its index column is read
+        """
+        dataset = self.dataset(name, runId, seed, collectDate)
+        if dataset is None:
+            return pd.DataFrame()
+        table = dataset.to_table(columns=columns, filter=filter)
+        df = table.to_pandas()
+        index = (dataset.schema.metadata or {}).get(INDEX_KEY)
+        if index is not None and index.decode('utf-8') in df.columns:
+            df = df.set_index(index.decode('utf-8'))
+        return df
+
+    def loadRun(self, seed: str, collectDate: str = None, runId: str = None, names: List[str] = None) -> dict:
+        """Load every frame of one seed's run, the latest one when collectDate and runId are not given."""
+        if collectDate is None and runId is None:
+            runs = self.runs()
+            runs = runs[runs.seed == seed]
+            if len(runs) == 0:
+                return {}
+            runId = runs.runId.iloc[0]
+        frames = {}
+        for name in names or self.names():
+            df = self.load(name, seed=seed, collectDate=collectDate, runId=runId)
+            if len(df) != 0:
+                frames[name] = df.drop(columns=PARTITION_COLUMNS, errors='ignore')
+        return frames
+
+
+_store = None
+_storeLock = threading.Lock()
+
+
+def getStore() -> DatasetStore:
+    global _store
+    with _storeLock:
+        if _store is None:
+            _store = DatasetStore()
+    return _store
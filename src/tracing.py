@@ -0,0 +1,175 @@
+import contextlib
+import contextvars
+import functools
+import json
+import logging
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import Callable
+
+LOGGER_NAME = 'ytplus'
+METRICS = ['calls', 'seconds', 'items', 'units', 'bytes', 'errors']
+
+logger = logging.getLogger(LOGGER_NAME)
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, event and the event's fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        event = {'time': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+                 'level': record.levelname,
+                 'event': record.getMessage()}
+        event.update(getattr(record, 'fields', {}))
+        return json.dumps(event, default=str)
+
+
+def configureLogging(path: str = None, level: int = logging.INFO) -> logging.Handler:
+    """Send ytplus events to path (or stderr) as JSON lines, replacing an earlier handler.
+
+    Args:
+        path (str, optional): log file, appended to. Defaults to None (stderr).
+        level (int, optional): lowest level written. Defaults to logging.INFO.
+
+    Returns:
+        logging.Handler: the handler installed
+    """
+    handler = logging.FileHandler(path) if path else logging.StreamHandler()
+    handler.setFormatter(JsonFormatter())
+    for previous in list(logger.handlers):
+        logger.removeHandler(previous)
+        previous.close()
+    logger.addHandler(handler)
+    logger.setLevel(level)
+    logger.propagate = False
+    return handler
+
+
+def logEvent(event: str, level: int = logging.INFO, **fields):
+    """Log a structured event; fields become keys of its JSON line."""
+    if logger.isEnabledFor(level):
+        logger.log(level, event, extra={'fields': fields})
+
+
+class Tracer:
+    """Accounts for the time, calls, items, quota units and bytes of every traced stage.
+
+    Stages are named '<module>.<function>' (e.g. 'process.processVideoIds',
+    'api.search.list'); totals are kept per stage and each finished span is
+    also logged as a 'span' event. Each run gets its own Tracer, see
+    startTracing.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.totals = defaultdict(lambda: dict.fromkeys(METRICS, 0))
+        self.started = time.time()
+
+    def record(self, stage: str, seconds: float, items: int = 0, units: int = 0, bytes: int = 0, error: bool = False):
+        with self._lock:
+            total = self.totals[stage]
+            total['calls'] += 1
+            total['seconds'] += seconds
+            total['items'] += items
+            total['units'] += units
+            total['bytes'] += bytes
+            total['errors'] += int(error)
+
+    @contextlib.contextmanager
+    def span(self, stage: str, **fields):
+        """Time a block as one call of stage.
+
+        The block may fill in 'items', 'units' and 'bytes' of the yielded
+        dict; other keys are only logged.
+        """
+        event = dict(fields)
+        start = time.perf_counter()
+        error = None
+        try:
+            yield event
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            seconds = time.perf_counter() - start
+            self.record(stage, seconds, event.get('items', 0), event.get('units', 0),
+                        event.get('bytes', 0), error is not None)
+            if error is not None:
+                event['error'] = repr(error)
+            logEvent('span', logging.WARNING if error is not None else logging.INFO,
+                     stage=stage, seconds=round(seconds, 6), **event)
+
+    def summary(self):
+        """Per-stage totals of the run as a DataFrame, slowest stage first."""
+        import pandas as pd
+        with self._lock:
+            totals = {stage: dict(total) for stage, total in self.totals.items()}
+        summary = pd.DataFrame.from_dict(totals, orient='index', columns=METRICS)
+        summary.index.name = 'stage'
+        return summary.sort_values('seconds', ascending=False)
+
+
+# Spans outside any run (e.g. at import) go to this tracer.
+tracer = Tracer()
+# The tracer of the calling context: each Streamlit session or CLI command
+# traces its own run, and ingestion.workerPool() hands it on to pool threads.
+_currentTracer = contextvars.ContextVar('tracer', default=None)
+
+
+def currentTracer() -> Tracer:
+    """The tracer of the run in the calling context, or the module tracer outside any run."""
+    current = _currentTracer.get()
+    return tracer if current is None else current
+
+
+def startTracing() -> Tracer:
+    """Start tracing a new run in the calling context.
+
+    Returns:
+        Tracer: the run's tracer, to keep (e.g. in st.session_state) and resume with useTracer
+    """
+    runTracer = Tracer()
+    _currentTracer.set(runTracer)
+    return runTracer
+
+
+def useTracer(runTracer: Tracer):
+    """Make runTracer the tracer of the calling context."""
+    _currentTracer.set(runTracer)
+
+
+def countItems(result) -> int:
+    """Items in a traced function's result: a response's items, a list, a frame or a dict of them."""
+    if isinstance(result, dict):
+        if 'items' in result:
+            return len(result['items'])
+        return sum(countItems(value) for value in result.values())
+    if isinstance(result, tuple):
+        return countItems(result[0]) if result else 0
+    try:
+        return len(result)
+    except TypeError:
+        return 0
+
+
+def traced(stage: str, items: Callable = countItems, bytes: Callable = None):
+    """Decorator recording each call of a function as a span of stage.
+
+    Args:
+        stage (str): stage name, e.g. 'process.processVideoIds'
+        items (Callable, optional): items(result) counted for the call. Defaults to countItems.
+        bytes (Callable, optional): bytes(result) counted for the call. Defaults to None (not counted).
+    """
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with currentTracer().span(stage) as event:
+                result = function(*args, **kwargs)
+                event['items'] = items(result)
+                if bytes is not None:
+                    event['bytes'] = bytes(result)
+            return result
+        return wrapper
+    return decorator
@@ -0,0 +1,291 @@
+import contextlib
+import os
+import threading
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: adds are only serialised within the process
+    fcntl = None
+
+INDEX_DIR = './cache/vector_index'
+BLOCK_ROWS = 16384
+APPROX_MIN_ROWS = 50000
+
+
+def top_k(scores: np.ndarray, k: int):
+    """Return the column positions of the k largest scores of each row, best first."""
+    k = min(k, scores.shape[1])
+    if k == 0:
+        return np.zeros((scores.shape[0], 0), dtype=np.int64)
+    part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    order = np.argsort(-np.take_along_axis(scores, part, axis=1), axis=1, kind='stable')
+    return np.take_along_axis(part, order, axis=1)
+
+
+def blocked_top_k(queries: np.ndarray, vectors: np.ndarray, k: int, rows: np.ndarray = None, block_rows: int = BLOCK_ROWS):
+    """Exact inner-product top-k, scoring block_rows vectors at a time.
+
+    Args:
+        queries (np.ndarray): (q, dim) query matrix
+        vectors (np.ndarray): (n, dim) matrix, may be a memmap
+        k (int): neighbours to return per query
+        rows (np.ndarray, optional): restrict the search to these rows of vectors. Defaults to all rows.
+        block_rows (int, optional): rows scored per matmul. Defaults to BLOCK_ROWS.
+
+    Returns:
+        tuple: (rows, scores), both (q, <=k), best first
+    """
+    total = len(vectors) if rows is None else len(rows)
+    best_rows = np.zeros((len(queries), 0), dtype=np.int64)
+    best_scores = np.zeros((len(queries), 0), dtype=np.float32)
+    for start in range(0, total, block_rows):
+        if rows is None:
+            block_ids = np.arange(start, min(start + block_rows, total))
+            block = vectors[start:start + block_rows]
+        else:
+            block_ids = rows[start:start + block_rows]
+            block = vectors[block_ids]
+        scores = np.concatenate(
+            [best_scores, queries @ np.asarray(block, dtype=np.float32).T], axis=1)
+        candidates = np.concatenate(
+            [best_rows, np.broadcast_to(block_ids, (len(queries), len(block_ids)))], axis=1)
+        keep = top_k(scores, k)
+        best_rows = np.take_along_axis(candidates, keep, axis=1)
+        best_scores = np.take_along_axis(scores, keep, axis=1)
+    return best_rows, best_scores
+
+
+def spherical_kmeans(data: np.ndarray, n_clusters: int, iterations: int = 10, seed: int = 0) -> np.ndarray:
+    """Cluster unit-length rows by cosine similarity; returns (n_clusters, dim) centroids."""
+    rng = np.random.default_rng(seed)
+    centroids = data[rng.choice(len(data), n_clusters, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = assign_lists(data, centroids)
+        order = np.argsort(assignment, kind='stable')
+        clusters, starts = np.unique(assignment[order], return_index=True)
+        sums = np.add.reduceat(data[order], starts, axis=0)
+        empty = np.setdiff1d(np.arange(n_clusters), clusters)
+        centroids[clusters] = sums
+        centroids[empty] = data[rng.choice(len(data), len(empty), replace=False)]
+        centroids /= np.maximum(np.linalg.norm(centroids,
+                                axis=1, keepdims=True), 1e-12)
+    return centroids
+
+
+def assign_lists(vectors: np.ndarray, centroids: np.ndarray, block_rows: int = BLOCK_ROWS) -> np.ndarray:
+    """Return the nearest centroid of each vector, computed in blocks."""
+    assignment = np.zeros(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), block_rows):
+        block = np.asarray(vectors[start:start + block_rows], dtype=np.float32)
+        assignment[start:start + block_rows] = np.argmax(
+            block @ centroids.T, axis=1)
+    return assignment
+
+
+class VectorIndex:
+    """Persistent index of every caption embedding computed so far.
+
+    Vectors are appended to a raw float32 file and video ids are kept in a
+    text file alongside it, so adds are incremental and the matrix is
+    memory-mapped on load. The ids file is the commit record: it is replaced
+    atomically after the vectors are written, and rows past it (left by an
+    interrupted add) are dropped by the next add, so row i is always the
+    vector of ids[i]. An add builds the new ids and positions aside and
+    publishes them after the remapped vectors, so readers never see an id
+    past the vectors they hold. Queries use an exact blocked matmul, or an
+    inverted-file (IVF) index of spherical k-means lists once the corpus is
+    large.
+
+    Args:
+        path (str, optional): directory holding the index files. Defaults to INDEX_DIR.
+        dim (int, optional): embedding dimension. Defaults to 512.
+    """
+
+    def __init__(self, path: str = INDEX_DIR, dim: int = 512):
+        self.path = path
+        self.dim = dim
+        self.vectors_path = os.path.join(path, 'vectors.f32')
+        self.ids_path = os.path.join(path, 'ids.txt')
+        self.centroids_path = os.path.join(path, 'centroids.npy')
+        self.lists_path = os.path.join(path, 'lists.npy')
+        self.lock_path = os.path.join(path, 'lock')
+        self._lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+        self.centroids, self.lists = None, None
+        if os.path.exists(self.centroids_path) and os.path.exists(self.lists_path):
+            self.centroids = np.load(self.centroids_path)
+            self.lists = np.load(self.lists_path)
+        self._publish(*self._read_ids())
+
+    def _read_ids(self):
+        ids = []
+        if os.path.exists(self.ids_path):
+            with open(self.ids_path, 'r') as f:
+                ids = f.read().splitlines()
+        return ids, {videoId: row for row, videoId in enumerate(ids)}
+
+    def _write_ids(self, ids):
+        tmp_path = self.ids_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write("".join(videoId + "\n" for videoId in ids))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.ids_path)
+
+    @contextlib.contextmanager
+    def _file_lock(self):
+        """Hold an exclusive lock on the index files against other processes, where fcntl exists."""
+        if fcntl is None:
+            yield
+            return
+        with open(self.lock_path, 'a') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _map(self, rows: int) -> np.ndarray:
+        if rows == 0:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        return np.memmap(self.vectors_path, dtype=np.float32, mode='r', shape=(rows, self.dim))
+
+    def _publish(self, ids, positions):
+        # Vectors first: ids only grow, so a reader holding older ids or
+        # positions still finds each of their rows in the newer vectors.
+        self.vectors = self._map(len(ids))
+        self.ids = ids
+        self.positions = positions
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, videoId):
+        return videoId in self.positions
+
+    def get(self, videoId: str) -> np.ndarray:
+        # Positions before vectors, the reverse of the order add publishes them in.
+        positions, vectors = self.positions, self.vectors
+        return np.array(vectors[positions[videoId]])
+
+    def add(self, videoIds, vectors):
+        """Add or replace vectors for videoIds.
+
+        Args:
+            videoIds (iterable): video ids, one per row of vectors
+            vectors (array-like): (n, dim) embeddings
+        """
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        with self._lock, self._file_lock():
+            # Pick up ids committed by other processes since this one loaded.
+            ids, positions = self._read_ids()
+            pending, updates = {}, {}
+            for videoId, vector in zip(videoIds, vectors):
+                if videoId in positions:
+                    updates[positions[videoId]] = vector
+                else:
+                    pending[videoId] = vector
+            new_ids = list(pending)
+            if updates:
+                existing = np.memmap(self.vectors_path, dtype=np.float32,
+                                     mode='r+', shape=(len(ids), self.dim))
+                for row, vector in updates.items():
+                    existing[row] = vector
+                existing.flush()
+            if new_ids:
+                with open(self.vectors_path, 'ab') as f:
+                    # Drop rows of an add that never committed its ids.
+                    f.truncate(len(ids) * self.dim * 4)
+                    f.write(np.stack(list(pending.values())).tobytes())
+                    f.flush()
+                    os.fsync(f.fileno())
+                for videoId in new_ids:
+                    positions[videoId] = len(ids)
+                    ids.append(videoId)
+                self._write_ids(ids)
+            self._publish(ids, positions)
+            if self.centroids is not None:
+                if len(self.ids) > 2 * len(self.lists):
+                    self._build_lists()
+                else:
+                    known = len(self.lists)
+                    changed = np.union1d(np.array(sorted(updates), dtype=np.int64),
+                                         np.arange(known, len(self.ids)))
+                    self.lists = np.concatenate(
+                        [self.lists, np.zeros(len(self.ids) - known, dtype=np.int32)])
+                    self.lists[changed] = assign_lists(
+                        self.vectors[changed], self.centroids)
+                    np.save(self.lists_path, self.lists)
+
+    def build_lists(self, n_lists: int = None, sample: int = 100000):
+        """Train IVF centroids on a sample of the corpus and assign every vector to a list."""
+        with self._lock:
+            self._build_lists(n_lists, sample)
+
+    def _build_lists(self, n_lists: int = None, sample: int = 100000):
+        n_lists = n_lists or max(1, int(np.sqrt(len(self.ids))))
+        rng = np.random.default_rng(0)
+        rows = np.sort(rng.choice(len(self.ids), min(
+            sample, len(self.ids)), replace=False))
+        training = np.asarray(self.vectors[rows], dtype=np.float32)
+        training /= np.maximum(np.linalg.norm(training,
+                               axis=1, keepdims=True), 1e-12)
+        centroids = spherical_kmeans(
+            training, min(n_lists, len(training))).astype(np.float32)
+        lists = assign_lists(self.vectors, centroids)
+        np.save(self.centroids_path, centroids)
+        np.save(self.lists_path, lists)
+        self.centroids, self.lists = centroids, lists
+
+    def search(self, query, k: int = 10, method: str = 'auto', n_probe: int = 8, exclude=()):
+        """Return the k most similar indexed videos.
+
+        Args:
+            query (array-like): (dim,) vector or (q, dim) matrix
+            k (int, optional): results per query. Defaults to 10.
+            method (str, optional): 'exact', 'ivf' or 'auto' (IVF once the corpus reaches APPROX_MIN_ROWS). Defaults to 'auto'.
+            n_probe (int, optional): IVF lists scanned per query. Defaults to 8.
+            exclude (iterable, optional): video ids to leave out, e.g. the seed itself. Defaults to ().
+
+        Returns:
+            list: [(videoId, score), ...] for a single query, or one such list per query row
+        """
+        query = np.asarray(query, dtype=np.float32)
+        single = query.ndim == 1
+        queries = query.reshape(-1, self.dim)
+        exclude = set(exclude)
+        if method == 'auto':
+            method = 'ivf' if len(self.ids) >= APPROX_MIN_ROWS else 'exact'
+        if method == 'ivf' and self.centroids is None:
+            self.build_lists()
+
+        # Lists before vectors, which are published first, so every listed row is mapped.
+        centroids, lists = self.centroids, self.lists
+        vectors, ids = self.vectors, self.ids
+        fetch = k + len(exclude)
+        results = []
+        for q in queries:
+            rows = None
+            if method == 'ivf':
+                probes = top_k((q @ centroids.T)[None, :], n_probe)[0]
+                rows = np.flatnonzero(np.isin(lists, probes))
+            best_rows, best_scores = blocked_top_k(q[None, :], vectors, fetch, rows)
+            results.append([(ids[row], float(score)) for row, score in zip(best_rows[0], best_scores[0])
+                            if ids[row] not in exclude][:k])
+        return results[0] if single else results
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def getIndex() -> VectorIndex:
+    """Return the process-wide caption vector index."""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = VectorIndex()
+    return _index
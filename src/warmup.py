@@ -0,0 +1,46 @@
+import threading
+import time
+
+import src.feature as feature
+import src.semantic_similarity_lite as semantic_similarity_lite
+
+# Loaded in this order: the keyword models are needed as soon as a seed
+# video is entered, the caption encoder only once a search has run.
+MODELS = [('Keyphrase vectorizer', feature.getVectorizer),
+          ('Keyword model', feature.getKeywordModel),
+          ('SentencePiece', semantic_similarity_lite.getSentencePiece),
+          ('Caption encoder', semantic_similarity_lite.getEngine)]
+
+_status = {name: 'pending' for name, _ in MODELS}
+_thread = None
+_thread_lock = threading.Lock()
+
+
+def _warmup():
+    for name, loader in MODELS:
+        _status[name] = 'loading'
+        start = time.perf_counter()
+        try:
+            loader()
+            _status[name] = 'ready (%.1fs)' % (time.perf_counter() - start)
+        except Exception as e:
+            _status[name] = 'failed: %s' % e
+
+
+def startWarmup():
+    """Load the heavy models on a background thread, once per process."""
+    global _thread
+    with _thread_lock:
+        if _thread is None:
+            _thread = threading.Thread(
+                target=_warmup, name='model-warmup', daemon=True)
+            _thread.start()
+
+
+def warmupStatus() -> dict:
+    """Return {model name: 'pending' | 'loading' | 'ready (...)' | 'failed: ...'}."""
+    return dict(_status)
+
+
+def isReady() -> bool:
+    return all(status.startswith('ready') for status in _status.values())
@@ -1,22 +1,27 @@
-from io import BytesIO
+import os
 
-import numpy as np
 import pandas as pd
 import streamlit as st
 from pytube import Channel, YouTube
 from st_aggrid import AgGrid, GridOptionsBuilder, GridUpdateMode, JsCode
-from youtube_transcript_api import YouTubeTranscriptApi
 #from streamlit_custom_slider import st_custom_slider
 import src.feature as feature
 import src.ingestion as ingestion
+import src.pipeline as pipeline
+import src.export as export
 import src.process as process
+import src.similarity as similarity
+import src.warmup as warmup
+from src.checkpoint import RunCheckpoint
+from src.store import getStore
+from src.tracing import configureLogging, logger, startTracing, useTracer
 
-try:
-    from src.semantic_similarity import embed
-except:
-    from src.semantic_similarity_lite import embed
 
-from src.service import check_api
+EXPORT_FORMATS = {'Excel': 'xlsx', 'Parquet': 'parquet', 'CSV': 'csv'}
+
+# Pipeline events are written as JSON lines, to stderr unless YTPLUS_LOG names a file.
+if not logger.handlers:
+    configureLogging(os.environ.get('YTPLUS_LOG'))
 
 st.set_page_config(
     page_title="Youtube+",
@@ -40,29 +45,19 @@ st.markdown(
 )
 
 
-@st.experimental_memo(suppress_st_warning=True)
-def to_excel(dfs: dict, captionDf: pd.DataFrame, processeddf: pd.DataFrame = pd.DataFrame(), channelDfDict: dict = {}, commentSummarisedDfDict: dict = {}, commentsResultDfDict: dict = {}) -> BytesIO:
-    output = BytesIO()
-    with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-        if(len(pd.DataFrame()) != 0):
-            processeddf.to_excel(writer, sheet_name='similarity')
-        dfs['videoDf'].to_excel(writer, sheet_name='stats')
-        dfs['videoLocDf'].to_excel(writer, sheet_name='loc')
-        dfs['videoHashtagsDf'].to_excel(writer, sheet_name='hashtags')
-        dfs['videoTopicsDf'].to_excel(writer, sheet_name='topics')
-        dfs['videoTagsDf'].to_excel(writer, sheet_name='tags')
-        captionDf.to_excel(writer, sheet_name='captions')
-        for df_name, df in channelDfDict.items():
-            df.to_excel(writer, sheet_name=df_name)
-        if(len(commentSummarisedDfDict) != 0):
-            for df_name, df in commentSummarisedDfDict.items():
-                df.to_excel(writer, sheet_name=df_name)
-        if(len(commentsResultDfDict) != 0):
-            for df_name, df in commentsResultDfDict.items():
-                df.to_excel(writer, sheet_name=df_name)
-    processed_data = output.getvalue()
-
-    return processed_data
+class StreamlitProgress:
+    """process.ProgressCallback drawing a progress bar, cleared when a stage completes."""
+
+    def __init__(self):
+        self.bar = None
+
+    def __call__(self, done: int, total: int, stage: str):
+        if self.bar is None:
+            self.bar = st.progress(0)
+        self.bar.progress(done/total if total else 1.0)
+        if done >= total:
+            self.bar.empty()
+            self.bar = None
 
 
 def create_gb(df: pd.DataFrame, linkColumn: str = "", selection: bool = False):
@@ -94,18 +89,27 @@ with st.expander(label='Similar Video', expanded=True):
     def api_callback():
         if len(st.session_state.api_input) < 39:
             st.warning("API key too short")
-        elif check_api(st.session_state.api_input) == "API access successful":
-            st.success(check_api(st.session_state.api_input))
+        elif ingestion.check_api(st.session_state.api_input) == ingestion.API_ACCESS_OK:
+            st.success(ingestion.check_api(st.session_state.api_input))
         else:
-            st.warning(check_api(st.session_state.api_input))
+            st.warning(ingestion.check_api(st.session_state.api_input))
 
-    ingestion.API_KEY = st.text_input(
+    # A local, not ingestion.API_KEY, which every session would overwrite.
+    apiKey = st.text_input(
         label='API', placeholder='YOUR_API_KEY',
         help='Instruction to obtain API Key: https://developers.google.com/youtube/v3/getting-started',
         on_change=api_callback, max_chars=39, key='api_input')
 
-    ingestion.service = ingestion.create_yt_service(ingestion.API_KEY)
+    # Quota runs and tracers are per session (ingestion.planner is shared by
+    # every session); each rerun resumes this session's run.
+    if st.session_state.get('quotaRun') is None or st.session_state.quotaRun.apiKey != apiKey:
+        st.session_state.quotaRun = ingestion.planner.startRun(apiKey=apiKey)
+    else:
+        ingestion.planner.useRun(st.session_state.quotaRun)
+    if st.session_state.get('tracer') is not None:
+        useTracer(st.session_state.tracer)
 
+    dl_btn_label = "📥Download Videos + Channels Data"
     tabMain1, tabMain2 = st.tabs(['Seed Videos', 'List of Videos'])
     with tabMain1:
         col1, col2 = st.columns([3, 1])
@@ -134,11 +138,13 @@ with st.expander(label='Similar Video', expanded=True):
             video_info = YouTube(video_url)
             video_id = video_info.video_id
             channel_id = video_info.channel_id
-            try:
-                YouTubeTranscriptApi.list_transcripts(video_id)
-            except:
+            # The seed's caption is fetched once per seed, not on every rerun.
+            if st.session_state.get('seedCaption', (None, None))[0] != video_id:
+                st.session_state['seedCaption'] = (video_id, process.fetchCaption(video_id))
+            seedCaption = st.session_state['seedCaption'][1]
+            if seedCaption is None:
                 st.warning(
-                    'Please choose another video! Fail to load video caption needed for similarity check.')
+                    'This video has no caption. Similarity will be based on its title and description.')
             video_title = st.text_input(label='Title', value=video_info.title)
 
             col2_1, col2_2 = st.columns([1, 1])
@@ -149,6 +155,25 @@ with st.expander(label='Similar Video', expanded=True):
                 processed_Description = st.text_area(
                     label="Processed Description (beta)", value=process.process_description(video_info.description), height=300, help='Removed call-to-action texts (beta)')
 
+            # Embedding a seed that is not indexed needs the caption encoder, which
+            # would block the page on TensorFlow until the warmup has loaded it.
+            pastIndex = similarity.getIndex()
+            if video_id in pastIndex or warmup.isReady():
+                pastSimilar = similarity.pastSimilar(
+                    video_id, seedCaption['embedding'] if seedCaption is not None else video_title + ". " + processed_Description)
+            else:
+                pastSimilar = pd.DataFrame(columns=['videoId', 'score'])
+                if len(pastIndex) != 0:
+                    st.caption('Similar videos from past runs will show once the caption encoder has loaded.')
+            if len(pastSimilar) != 0:
+                pastSimilar = pastSimilar.rename(columns={'score': 'Similarity %'})
+                pastSimilar['Similarity %'] = (
+                    pastSimilar['Similarity %']*100).round(1)
+                pastSimilar['Video URL'] = "https://www.youtube.com/watch?v=" + \
+                    pastSimilar['videoId']
+                st.write('Similar videos from past runs')
+                st.dataframe(pastSimilar)
+
             keywords_extracted = feature.extractKeywords(
                 video_title + ". " + processed_Description)
             st.write('Suggested Query Keywords: ' +
@@ -177,79 +202,69 @@ with st.expander(label='Similar Video', expanded=True):
             #         "Channels data",
             #         ('Include', 'Exclude'), index=0, help='Utalising Youtube Related API: https://developers.google.com/youtube/v3/docs/channels/list, include all videos channel information')
 
-            download = st.button(label='Call data from YT APIs', disabled=(check_api(
-                st.session_state.api_input) != "API access successful"), help=str(check_api(st.session_state.api_input)), key="download")
+            download = st.button(label='Call data from YT APIs', disabled=(ingestion.check_api(
+                st.session_state.api_input) != ingestion.API_ACCESS_OK), help=str(ingestion.check_api(st.session_state.api_input)), key="download")
             st.write('Estimated time to collect: %i minutes' %
                      (query_max/50*2.5))
+            plannedPages = ingestion.planSearchPages(
+                {'keyword': query_max//50, 'related': 2 if related == 'Include' else 0}, ingestion.planner.remaining(apiKey), seedCount=1)
+            estimatedUnits = ingestion.searchRunCost(
+                sum(plannedPages.values()), seedCount=1)
+            st.write('Estimated API quota: %i units (%i remaining today)' %
+                     (estimatedUnits, ingestion.planner.remaining(apiKey)))
+            if plannedPages['keyword'] < query_max//50:
+                st.warning('Remaining quota only covers %i of %i search pages' % (
+                    plannedPages['keyword'], query_max//50))
 
             if(st.session_state.download):
-                with st.spinner(text='Collecting queried video info (title, description, captions, etc.)...'):
-                    query_vid_ids = ingestion.queryKeyword(
-                        selected_keywords, video_id, queryOrder.lower(), caption, pageLimit=st.session_state.slider1//50)
-                    videoList, videoLocList, videoHashtagsList, videoCaptionList, videoTopicsList, videoTagsList = process.processVideoIds(
-                        query_vid_ids)
-                if(related == 'Include'):
-                    with st.spinner(text='Collecting related video info (title, description, captions, etc.)...'):
-                        related_vid_ids = ingestion.getRelatedVideoIds(
-                            video_id)
-                        videoList2, videoLocList2, videoHashtagsList2, videoCaptionList2, videoTopicsList2, videoTagsList2 = process.processVideoIds(
-                            related_vid_ids)
-                        videoList.extend(videoList2)
-                        videoLocList.extend(videoLocList2)
-                        videoHashtagsList.extend(videoHashtagsList2)
-                        videoCaptionList.extend(videoCaptionList2)
-                        videoTopicsList.extend(videoTopicsList2)
-                        videoTagsList.extend(videoTagsList2)
-                with st.spinner(text='Collecting channel info (channel name, description, creation date, etc.)...'):
-                    channelIds = pd.DataFrame(videoList)['channelId'].unique()
-                    channelDfs = process.processChannelIds(channelIds)
-                with st.spinner(text='Calculating similarity (based on english captions)...'):
-                    videoDfs = process.videoDetails_df(
-                        videoList, videoLocList, videoHashtagsList, videoCaptionList, videoTopicsList, videoTagsList)
-
-                    videoDf = videoDfs['videoDf']
-                    videoCaptionDf = videoDfs['videoCaptionDf']
-
-                    videoCaptionDf['embedding'] = embed(
-                        videoCaptionDf['embedding'])
-
-                    videoCaptionDf['Similarity %'] = np.inner(videoCaptionDf[videoCaptionDf.index == video_id].embedding.values[0],
-                                                              videoCaptionDf['embedding'].to_list())
-
-                    videoProcessedDf = videoDf.join(
-                        videoCaptionDf, how='outer')
-                    videoProcessedDf = videoProcessedDf[~videoProcessedDf.index.duplicated(
-                    )]
-                    videoProcessedDf['Video URL'] = "https://www.youtube.com/watch?v=" + \
-                        videoProcessedDf.index
-                    videoProcessedDf = videoProcessedDf.join(channelDfs['channelInfo'].set_index(
-                        'channelId'), rsuffix='_channel', on='channelId')
-                    videoProcessedDf = videoProcessedDf[[
-                        'Similarity %', 'title', 'viewCount', 'likeCount', 'commentCount', 'Video URL', 'Channel Name', 'Creation Date', 'Subscribers']]
-                    videoProcessedDf.rename(
-                        columns={"title": "Title", "viewCount": "Views", "likeCount": "Likes", "commentCount": "Comments"}, inplace=True)
-                    videoProcessedDf.sort_values(
-                        by=['Similarity %'], ascending=False, inplace=True)
-                    cols = ['Views', "Likes", "Comments"]
-                    videoProcessedDf[cols] = videoProcessedDf[cols].apply(
-                        pd.to_numeric, downcast="integer", errors='coerce')
-                    videoDf = videoDf.join(
-                        videoProcessedDf, how='left', on='videoId')
-                    videoDf.drop(['Title', 'Views', 'Likes', 'Channel Name', 'Creation Date', 'Subscribers',
-                                  'Comments'], axis=1, inplace=True)
-                    videoDf = videoDf[~videoDf.index.duplicated()]
-                    videoDf.sort_values(
-                        by=['Similarity %'], ascending=False, inplace=True)
-                    videoDf['seedvideo'] = videoDf.index == video_id
-                    videoDf['seedchannel'] = videoDf.channelId == channel_id
-                    videoDfs['videoDf'] = videoDf
-                    videoProcessedDf['Similarity %'] = (
-                        videoProcessedDf['Similarity %']*100).round(1)
-                    st.session_state['videoProcessedDf'] = videoProcessedDf
-                    st.session_state['videoDfs'] = videoDfs
-                    st.session_state['videoCaptionDf'] = videoCaptionDf
-                    st.session_state['channelDfs'] = channelDfs
-                st.success('Done!')
+                st.session_state.quotaRun = ingestion.planner.startRun(
+                    ingestion.runBudget(estimatedUnits), apiKey=apiKey)
+                st.session_state.tracer = startTracing()
+                try:
+                    # Rerunning the same download after an error resumes it.
+                    checkpoint = RunCheckpoint.forRun(
+                        'app', video_id, selected_keywords, queryOrder, caption, plannedPages)
+                    with st.spinner(text='Collecting queried video info (title, description, captions, etc.)...'):
+                        query_vid_ids = checkpoint.memo('query', lambda: ingestion.queryKeyword(
+                            selected_keywords, video_id, queryOrder.lower(), caption, pageLimit=plannedPages['keyword']))
+                        videoList, videoLocList, videoHashtagsList, videoCaptionList, videoTopicsList, videoTagsList = process.processVideoIds(
+                            query_vid_ids, progress=StreamlitProgress(), checkpoint=checkpoint)
+                    if(related == 'Include'):
+                        with st.spinner(text='Collecting related video info (title, description, captions, etc.)...'):
+                            related_vid_ids = checkpoint.memo('related', lambda: ingestion.getRelatedVideoIds(
+                                video_id, pageLimit=plannedPages['related']))
+                            videoList2, videoLocList2, videoHashtagsList2, videoCaptionList2, videoTopicsList2, videoTagsList2 = process.processVideoIds(
+                                related_vid_ids, progress=StreamlitProgress(), checkpoint=checkpoint)
+                            videoList.extend(videoList2)
+                            videoLocList.extend(videoLocList2)
+                            videoHashtagsList.extend(videoHashtagsList2)
+                            videoCaptionList.extend(videoCaptionList2)
+                            videoTopicsList.extend(videoTopicsList2)
+                            videoTagsList.extend(videoTagsList2)
+                    with st.spinner(text='Collecting channel info (channel name, description, creation date, etc.)...'):
+                        channelIds = pd.DataFrame(videoList)['channelId'].unique()
+                        channelDfs = process.processChannelIds(
+                            channelIds, progress=StreamlitProgress(), checkpoint=checkpoint)
+                    with st.spinner(text='Calculating similarity (based on english captions)...'):
+                        videoDfs = process.videoDetails_df(
+                            videoList, videoLocList, videoHashtagsList, videoCaptionList, videoTopicsList, videoTagsList)
+
+                        videoCaptionDf = pipeline.embedCaptions(
+                            videoDfs['videoCaptionDf'])
+                        videoProcessedDf = pipeline.scoreVideos(
+                            videoDfs, channelDfs, video_id, channel_id, video_title + ". " + processed_Description)
+                        st.session_state['videoProcessedDf'] = videoProcessedDf
+                        st.session_state['videoDfs'] = videoDfs
+                        st.session_state['videoCaptionDf'] = videoCaptionDf
+                        st.session_state['channelDfs'] = channelDfs
+                        st.session_state['seed'] = video_id
+                        st.session_state['runId'] = getStore().write(
+                            dict(videoDfs, similarity=videoProcessedDf, **channelDfs), video_id,
+                            runId=os.path.basename(checkpoint.runDir))
+                    checkpoint.finish()
+                    st.success('Done!')
+                except ingestion.QuotaExceededError as e:
+                    st.error('Stopped, out of API quota: %s. Run again once quota is available to resume.' % e)
                 # videoProcessDf = videoDfs['videoDf'].join(
                 #     videoDfs['videoEmbedDf'], how='other')
             if (st.session_state.get('videoProcessedDf') is not None):
@@ -275,24 +290,33 @@ with st.expander(label='Similar Video', expanded=True):
                     videoProcessedDf, gridOptions, update_mode=GridUpdateMode.MANUAL, enable_enterprise_modules=True, allow_unsafe_jscode=True)
     #            st.warning('Result will be cleared when data downloaded.')
                 if st.session_state['load_example'] == False:
-                    st.session_state['export'] = to_excel(
+                    st.session_state['exportRunId'] = st.session_state['runId']
+                    st.session_state['exportSheets'] = export.workbookSheets(
                         videoDfs, videoCaptionDf, videoProcessedDf, channelDfs)
                 else:
-                    output = BytesIO()
-                    with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-                        for df_name, df in st.session_state['example'].items():
-                            df.to_excel(
-                                writer, sheet_name=df_name, index=False)
-                    st.session_state.export = output.getvalue()
+                    st.session_state['exportRunId'] = 'example'
+                    st.session_state['exportSheets'] = st.session_state['example']
                 response = grid_response['selected_rows']
 
                 comments_btn = st.button("Load %s Comments of %s Video Selected" % (sum(d.get(
                     'Comments', 0) for d in response), len(response)), disabled=len(response) == 0)
                 if(comments_btn):
                     # grid_response.update()
-                    commentsResultDfDict = process.processVideosComments([row['Video URL'].split('=')[-1]
-                                                                          for row in grid_response['selected_rows']])
-                    st.session_state.commentsResultDfDict = commentsResultDfDict
+                    st.session_state.quotaRun = ingestion.planner.startRun(apiKey=apiKey)
+                    st.session_state.tracer = startTracing()
+                    try:
+                        selectedIds = [row['Video URL'].split('=')[-1]
+                                       for row in grid_response['selected_rows']]
+                        commentsCheckpoint = RunCheckpoint.forRun('comments', sorted(selectedIds))
+                        commentsResultDfDict = process.processVideosComments(
+                            selectedIds, progress=StreamlitProgress(), checkpoint=commentsCheckpoint)
+                        st.session_state.commentsResultDfDict = commentsResultDfDict
+                        st.session_state['commentsRunId'] = os.path.basename(commentsCheckpoint.runDir)
+                        getStore().write(commentsResultDfDict, st.session_state.get('seed', 'example'),
+                                         runId=st.session_state.get('runId'))
+                        commentsCheckpoint.finish()
+                    except ingestion.QuotaExceededError as e:
+                        st.error('Stopped, out of API quota: %s. Run again once quota is available to resume.' % e)
                 dl_btn_label = "📥Download Videos + Channels Data"
 
     with tabMain2:
@@ -300,21 +324,35 @@ with st.expander(label='Similar Video', expanded=True):
             "Enter Video Ids seperated by comma (,)").replace('\n', "").split(',')
         start = st.button('Call YT API for data')
         if start:
-            videoList, videoLocList, videoHashtagsList, videoCaptionList, videoTopicsList, videoTagsList = process.processVideoIds(
-                videoIds)
-
-            videoDfs = process.videoDetails_df(
-                videoList, videoLocList, videoHashtagsList, videoCaptionList, videoTopicsList, videoTagsList)
-            channelIds = pd.DataFrame(videoList)['channelId'].unique()
-            channelDfs = process.processChannelIds(channelIds)
-            videoCaptionDf = videoDfs['videoCaptionDf']
-            st.session_state.videoDfs = videoDfs
-            st.session_state.videoCaptionDf = videoDfs['videoCaptionDf']
-            st.session_state.videoProcessedDf = pd.DataFrame()
-            st.session_state.channelDfs = channelDfs
-            commentsResultDfDict = process.processVideosComments(videoIds)
-
-            st.session_state.commentsResultDfDict = commentsResultDfDict
+            st.session_state.quotaRun = ingestion.planner.startRun(apiKey=apiKey)
+            st.session_state.tracer = startTracing()
+            try:
+                checkpoint = RunCheckpoint.forRun('videos', videoIds)
+                videoList, videoLocList, videoHashtagsList, videoCaptionList, videoTopicsList, videoTagsList = process.processVideoIds(
+                    videoIds, progress=StreamlitProgress(), checkpoint=checkpoint)
+
+                videoDfs = process.videoDetails_df(
+                    videoList, videoLocList, videoHashtagsList, videoCaptionList, videoTopicsList, videoTagsList)
+                channelIds = pd.DataFrame(videoList)['channelId'].unique()
+                channelDfs = process.processChannelIds(
+                    channelIds, progress=StreamlitProgress(), checkpoint=checkpoint)
+                videoCaptionDf = videoDfs['videoCaptionDf']
+                st.session_state.videoDfs = videoDfs
+                st.session_state.videoCaptionDf = videoDfs['videoCaptionDf']
+                st.session_state.videoProcessedDf = pd.DataFrame()
+                st.session_state.channelDfs = channelDfs
+                commentsResultDfDict = process.processVideosComments(
+                    videoIds, progress=StreamlitProgress(), checkpoint=checkpoint)
+
+                st.session_state.commentsResultDfDict = commentsResultDfDict
+                st.session_state['commentsRunId'] = 'all'
+                st.session_state['seed'] = 'videoList'
+                st.session_state['runId'] = getStore().write(
+                    dict(videoDfs, **channelDfs, **commentsResultDfDict), 'videoList',
+                    runId=os.path.basename(checkpoint.runDir))
+                checkpoint.finish()
+            except ingestion.QuotaExceededError as e:
+                st.error('Stopped, out of API quota: %s. Run again once quota is available to resume.' % e)
 
     if(st.session_state.get('commentsResultDfDict') is not None):
         dl_btn_label = "📥Download Videos + Channels + Comments Data"
@@ -364,24 +402,55 @@ with st.expander(label='Similar Video', expanded=True):
             videoCaptionDf = st.session_state.videoCaptionDf
             videoProcessedDf = st.session_state.get('videoProcessedDf', pd.DataFrame())
             channelDfs = st.session_state.channelDfs
-            st.session_state['export'] = to_excel(
+            st.session_state['exportRunId'] = '%s-comments-%s' % (
+                st.session_state['runId'], st.session_state['commentsRunId'])
+            st.session_state['exportSheets'] = export.workbookSheets(
                 videoDfs, videoCaptionDf, videoProcessedDf, channelDfs, commentSummarisedDfDict, commentsResultDfDict)
         else:
-            output = BytesIO()
-            with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-                for df_name, df in st.session_state['example'].items():
-                    df.to_excel(writer, sheet_name=df_name, index=False)
-            st.session_state.export = output.getvalue()
-        if(st.session_state.get('export') is not None):
-            st.download_button(
-                label=dl_btn_label,
-                data=st.session_state.export,
-                file_name='YTPlus_SimilarVideos_data.xlsx',
-                help='Include full data of video stats, locations, hashtags, captions and embeddings.'
-            )
+            st.session_state['exportRunId'] = 'example'
+            st.session_state['exportSheets'] = st.session_state['example']
+    if(st.session_state.get('exportSheets') is not None):
+        exportFormat = st.radio('Export format', list(EXPORT_FORMATS), horizontal=True,
+                                help='Parquet and CSV come as one file per table in a zip archive.')
+        fmt = EXPORT_FORMATS[exportFormat]
+        # Built once per run, sheets and format, on demand, instead of on every rerun.
+        exportKey = (st.session_state['exportRunId'], fmt)
+        exportPaths = st.session_state.setdefault('exportPaths', {})
+        if st.button('Prepare %s export' % exportFormat, key='prepare_export'):
+            with st.spinner(text='Writing export...'):
+                exportPaths[exportKey] = export.exportRun(
+                    st.session_state['exportRunId'], st.session_state['exportSheets'], fmt)
+        exportPath = exportPaths.get(exportKey)
+        if exportPath is not None and os.path.exists(exportPath):
+            with open(exportPath, 'rb') as f:
+                st.download_button(
+                    label=dl_btn_label,
+                    data=f,
+                    file_name='YTPlus_%s.%s' % (st.session_state['exportRunId'], export.FORMATS[fmt]),
+                    help='Include full data of video stats, locations, hashtags, captions and embeddings.'
+                )
     st.write("Credit to [KeyBERT](https://maartengr.github.io/KeyBERT/index.html) for keywords extraction and [Google's Universal Sentence Encoder](https://www.tensorflow.org/hub/tutorials/semantic_similarity_with_tf_hub_universal_encoder) for caption embedding")
 
 
+with st.sidebar:
+    st.subheader('Models')
+    for modelName, modelStatus in warmup.warmupStatus().items():
+        st.caption('%s: %s' % (modelName, modelStatus))
+    if not warmup.isReady():
+        st.button('Refresh model status', key='warmup_refresh')
+    runSummary = st.session_state['tracer'].summary() if st.session_state.get('tracer') is not None else []
+    if len(runSummary) != 0:
+        st.subheader('Last run')
+        st.caption('%i quota units in %i API calls. Seconds add up the calls of each stage; stages nest and overlap.' % (
+            runSummary.loc[runSummary.index.str.startswith('api.'), 'units'].sum(),
+            runSummary.loc[runSummary.index.str.startswith('api.'), 'calls'].sum()))
+        st.dataframe(runSummary.round({'seconds': 2}))
+
+# Started after the page has been laid out, so the first paint does not wait
+# for TensorFlow or the keyword models.
+warmup.startWarmup()
+
+
 # with st.expander(label='Channel Suggestion', expanded=False):
 #     st.write("""
 #     Suggest channels that produce similar type of contents.""")
@@ -0,0 +1,60 @@
+"""Golden check of src.normalize against the original caption and description code.
+
+normalizeCaption and normalizeDescription must return exactly what the
+original process_captions and process_description returned, kept in
+benchmarks.bench_normalize, on synthetic inputs built to hit every branch
+and on the descriptions of the example workbook when it can be read.
+
+Run from the repository root:
+
+    python -m pytest tests
+"""
+import contextlib
+import io
+import random
+
+import pandas as pd
+import pytest
+
+from benchmarks.bench_normalize import (example_descriptions,
+                                        legacy_process_captions,
+                                        legacy_process_description,
+                                        synthetic_descriptions,
+                                        synthetic_transcripts)
+from src.normalize import (normalizeCaption, normalizeCaptions,
+                           normalizeDescription, normalizeDescriptions)
+
+COUNT = 2000
+
+
+def legacy(fn, texts: list) -> list:
+    # The original description code prints on some inputs; keep it quiet.
+    with contextlib.redirect_stdout(io.StringIO()):
+        return [fn(text) for text in texts]
+
+
+@pytest.fixture(scope='module')
+def transcripts() -> list:
+    return synthetic_transcripts(COUNT // 10, random.Random(0))
+
+
+@pytest.fixture(scope='module')
+def descriptions() -> list:
+    return synthetic_descriptions(COUNT, random.Random(1)) + example_descriptions()
+
+
+def test_captions_match_legacy(transcripts):
+    expected = legacy(legacy_process_captions, transcripts)
+    assert [normalizeCaption(transcript) for transcript in transcripts] == expected
+
+
+def test_descriptions_match_legacy(descriptions):
+    expected = legacy(legacy_process_description, descriptions)
+    assert [normalizeDescription(text) for text in descriptions] == expected
+
+
+def test_batches_match_legacy(transcripts, descriptions):
+    assert normalizeCaptions(pd.Series(transcripts), workers=2).tolist() == legacy(
+        legacy_process_captions, transcripts)
+    assert normalizeDescriptions(pd.Series(descriptions), workers=2).tolist() == legacy(
+        legacy_process_description, descriptions)